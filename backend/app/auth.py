@@ -52,7 +52,8 @@ def decode_token(token: str):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Erro na validação do token")
 
 def require_role(required_roles):
-    def role_checker(token: str = Depends(oauth2_scheme)):
+    # async: só decodifica o JWT, não precisa ocupar uma thread do threadpool
+    async def role_checker(token: str = Depends(oauth2_scheme)):
         # Validar se token foi fornecido
         if not token:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de acesso obrigatório")
@@ -0,0 +1,373 @@
+"""
+Cache de respostas do catálogo público.
+
+    GET /watches/marketplace, /watches/search, /watches/filter, /watches/{id}
+
+Essas rotas não dependem do usuário e repetem as mesmas consultas milhares
+de vezes entre uma escrita e outra. O `CatalogCacheMiddleware` guarda o
+corpo das respostas 200 por rota + parâmetros normalizados e responde com
+ETag / Last-Modified, devolvendo 304 quando o cliente (ou o nginx) revalida
+com If-None-Match / If-Modified-Since.
+
+- Invalidação por geração: `invalidate_catalog()` incrementa um contador e
+  as entradas da geração anterior deixam de ser lidas (e saem do LRU por
+  idade). É chamada no commit de qualquer sessão que inseriu, alterou ou
+  removeu um `Watch` (criação, compra, revenda, registro na Stellar,
+  worker de jobs) e explicitamente onde o catálogo muda sem tocar em
+  `watches` (favoritos, conclusão de avaliação).
+- Last-Modified é o instante da última invalidação.
+- Backend local: LRU em memória por processo (CATALOG_CACHE_MAX_ENTRIES).
+  Com CATALOG_CACHE_REDIS_URL (pacote `redis` instalado), geração e
+  entradas ficam no Redis e valem para todos os workers; o LRU local
+  continua na frente, por geração.
+- CATALOG_CACHE_TTL limita a idade de uma entrada, para cobrir escritas
+  feitas fora da aplicação (ou em outro processo, sem Redis).
+
+As demais respostas GET ganham ETag pelo `ETagMiddleware` (hash do corpo,
+304 com If-None-Match), sem cache no servidor.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from app.models import Watch
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1000"))
+CATALOG_CACHE_REDIS_URL = os.getenv("CATALOG_CACHE_REDIS_URL")
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Maior corpo que o ETagMiddleware segura na memória para calcular o hash
+ETAG_MAX_BYTES = int(os.getenv("ETAG_MAX_BYTES", str(2 * 1024 * 1024)))
+
+CACHE_STATUS_HEADER = "X-Cache"
+CACHE_CONTROL = "public, no-cache"  # Pode guardar, mas revalida sempre (304 se nada mudou)
+
+# Rotas cacheadas e, para cada uma, os parâmetros que são listas separadas por vírgula sem ordem
+CACHED_ROUTES = [
+    (re.compile(r"^/watches/marketplace/?$"), {"brand", "category", "condition"}),
+    (re.compile(r"^/watches/search/?$"), set()),
+    (re.compile(r"^/watches/filter/?$"), set()),
+    (re.compile(r"^/watches/\d+/?$"), set()),
+]
+
+# Headers da resposta original que voltam junto com o corpo cacheado
+REPLAYED_HEADERS = ("content-type", "x-next-cursor")
+
+
+def cache_key(path: str, query_params, list_params=()) -> str:
+    """Rota + parâmetros em ordem, sem vazios; listas sem ordem viram conjuntos ordenados"""
+    items = []
+    for name, value in query_params.multi_items():
+        value = value.strip()
+        if not value:
+            continue
+        if name in list_params:
+            value = ",".join(sorted({part.strip().lower() for part in value.split(",") if part.strip()}))
+        items.append((name, value))
+    return path.rstrip("/") + "?" + "&".join(f"{k}={v}" for k, v in sorted(items))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class CachedResponse:
+    __slots__ = ("body", "headers", "etag", "last_modified", "stored_at")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], etag: str, last_modified: float,
+                 stored_at: Optional[float] = None):
+        self.body = body
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    def to_json(self) -> str:
+        return json.dumps({"body": self.body.decode("latin-1"), "headers": self.headers, "etag": self.etag,
+                           "last_modified": self.last_modified, "stored_at": self.stored_at})
+
+    @classmethod
+    def from_json(cls, raw) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(data["body"].encode("latin-1"), data["headers"], data["etag"],
+                   data["last_modified"], data["stored_at"])
+
+
+class RedisCacheBackend:
+    """Geração e entradas compartilhadas entre processos"""
+
+    def __init__(self, url: str, prefix: str = "catalog", ttl: float = CATALOG_CACHE_TTL, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.generation_key = f"{prefix}:generation"
+
+    def generation(self) -> Tuple[int, float]:
+        generation, modified = self.client.hmget(self.generation_key, "generation", "modified")
+        if generation is None:
+            now = time.time()
+            self.client.hsetnx(self.generation_key, "generation", 0)
+            self.client.hsetnx(self.generation_key, "modified", now)
+            return self.generation()
+        return int(generation), float(modified)
+
+    def bump(self) -> Tuple[int, float]:
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.hincrby(self.generation_key, "generation", 1)
+        pipe.hset(self.generation_key, "modified", now)
+        generation, _ = pipe.execute()
+        return int(generation), now
+
+    def get(self, generation: int, key: str) -> Optional[CachedResponse]:
+        raw = self.client.get(self._entry_key(generation, key))
+        return CachedResponse.from_json(raw) if raw is not None else None
+
+    def set(self, generation: int, key: str, entry: CachedResponse):
+        self.client.set(self._entry_key(generation, key), entry.to_json(), ex=max(int(self.ttl), 1))
+
+    def _entry_key(self, generation: int, key: str) -> str:
+        return f"{self.prefix}:{generation}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+class ResponseCache:
+    """LRU local por geração, com backend compartilhado opcional atrás dele"""
+
+    def __init__(self, max_entries: int = CATALOG_CACHE_MAX_ENTRIES, ttl: float = CATALOG_CACHE_TTL,
+                 backend: Optional[RedisCacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[Tuple[int, str], CachedResponse]" = OrderedDict()
+        self._generation = 0
+        self._modified = time.time()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> Tuple[int, float]:
+        if self.backend is not None:
+            return self.backend.generation()
+        return self._generation, self._modified
+
+    def invalidate(self):
+        if self.backend is not None:
+            self.backend.bump()
+        with self._lock:
+            self._generation += 1
+            self._modified = time.time()
+            self._entries.clear()
+
+    def get(self, generation: int, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get((generation, key))
+            if entry is not None and time.time() - entry.stored_at < self.ttl:
+                self._entries.move_to_end((generation, key))
+                self.hits += 1
+                return entry
+        if self.backend is not None:
+            entry = self.backend.get(generation, key)
+            if entry is not None:
+                self._store_local(generation, key, entry)
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def set(self, generation: int, key: str, entry: CachedResponse):
+        self._store_local(generation, key, entry)
+        if self.backend is not None:
+            self.backend.set(generation, key, entry)
+
+    def _store_local(self, generation: int, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[(generation, key)] = entry
+            self._entries.move_to_end((generation, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+catalog_cache = ResponseCache(
+    backend=RedisCacheBackend(CATALOG_CACHE_REDIS_URL) if CATALOG_CACHE_REDIS_URL else None
+)
+
+
+def invalidate_catalog():
+    """Descarta as respostas cacheadas do catálogo (todas as rotas)"""
+    catalog_cache.invalidate()
+
+
+# ========================= INVALIDAÇÃO NO COMMIT =========================
+
+_DIRTY_FLAG = "catalog_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_watch_changes(session, flush_context):
+    if any(isinstance(obj, Watch) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        invalidate_catalog()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_DIRTY_FLAG, None)
+
+
+# ========================= MIDDLEWARE =========================
+
+def _not_modified(request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+
+def _validators(entry: CachedResponse, status: str) -> Dict[str, str]:
+    return {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+        CACHE_STATUS_HEADER: status,
+    }
+
+
+def _respond(request, entry: CachedResponse, status: str) -> Response:
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=_validators(entry, status))
+    return Response(entry.body, headers={**entry.headers, **_validators(entry, status)})
+
+
+class CatalogCacheMiddleware(BaseHTTPMiddleware):
+    """Serve as rotas do catálogo do cache, com validação condicional (304)"""
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET" or not CATALOG_CACHE_ENABLED:
+            return await call_next(request)
+        route = next((params for pattern, params in CACHED_ROUTES if pattern.match(request.url.path)), None)
+        if route is None:
+            return await call_next(request)
+
+        key = cache_key(request.url.path, request.query_params, route)
+        generation, modified = catalog_cache.generation()
+        entry = catalog_cache.get(generation, key)
+        if entry is not None:
+            return _respond(request, entry, "HIT")
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        entry = CachedResponse(body, headers, make_etag(body), modified)
+        # Só guarda se nenhuma escrita aconteceu enquanto a resposta era montada
+        if catalog_cache.generation()[0] == generation:
+            catalog_cache.set(generation, key, entry)
+        return _respond(request, entry, "MISS")
+
+
+class ETagMiddleware:
+    """
+    ETag para as demais respostas GET 200: hash do corpo e 304 quando bate
+    com If-None-Match. Economiza banda, não processamento (a rota roda do
+    mesmo jeito). Respostas que já têm ETag (catálogo, arquivos estáticos)
+    ou maiores que ETAG_MAX_BYTES passam direto.
+    """
+
+    def __init__(self, app, max_bytes: int = ETAG_MAX_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start = None
+        chunks = []
+        size = 0
+        passthrough = False
+
+        async def send_with_etag(message):
+            nonlocal start, size, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or "etag" in headers or "content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > self.max_bytes:
+                # Grande demais para segurar na memória: segue sem ETag
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks),
+                            "more_body": message.get("more_body", False)})
+                return
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            etag = make_etag(body)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["ETag"] = etag
+            if if_none_match is not None and etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+                for name in ("content-length", "content-type"):
+                    if name in headers:
+                        del headers[name]
+                await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
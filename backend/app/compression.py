@@ -0,0 +1,107 @@
+"""
+Compressão das respostas HTTP: brotli quando o cliente aceita e o pacote
+`brotli` está instalado, senão gzip; abaixo de COMPRESSION_MIN_BYTES a
+resposta sai como está.
+
+Reaproveita os responders do GZipMiddleware do Starlette (que já tratam
+streaming, Content-Length, Vary e tipos já comprimidos como imagens) e só
+escolhe a codificação. Quando a resposta é comprimida, um ETag forte vira
+fraco (W/...), já que os bytes enviados não são os que geraram o hash; a
+comparação de If-None-Match em app/cache.py ignora o prefixo W/.
+"""
+
+import os
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só gzip
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Corpos maiores que isso são comprimidos fora do event loop
+THREAD_MIN_BYTES = 128 * 1024
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codificações aceitas pelo cliente (q > 0)"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MIN_BYTES:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware com brotli e ETag fraco nas respostas comprimidas"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, compresslevel: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel,
+                         thread_minimum_size=THREAD_MIN_BYTES)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality,
+                                        exclude_content_types=self.exclude_content_types)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size,
+                                      exclude_content_types=self.exclude_content_types)
+        else:
+            # Sem compressão, mas com Vary: Accept-Encoding para caches intermediários
+            responder = IdentityResponder(self.app, self.minimum_size, exclude_content_types=self.exclude_content_types)
+
+        encoding = getattr(responder, "content_encoding", None)
+
+        async def send_with_weak_etag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                # 304 repete o ETag que a resposta completa (comprimida) teria
+                compressed = headers.get("content-encoding") == encoding or message["status"] == 304
+                if encoding and etag and not etag.startswith("W/") and compressed:
+                    headers["ETag"] = "W/" + etag
+            await send(message)
+
+        await responder(scope, receive, send_with_weak_etag)
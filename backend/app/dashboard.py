@@ -0,0 +1,84 @@
+"""
+Agregações dos dashboards administrativos.
+
+Os números vêm da tabela `marketplace_stats` (ver app/stats.py), mantida
+incrementalmente a cada escrita: o custo de montar o dashboard não cresce
+com o histórico. Só as ofertas de revenda pendentes são contadas ao vivo
+(pelo índice de status), porque o fluxo de revenda usa atualizações em massa.
+Usado por `/admin/dashboard` e `/admin/dashboard/detailed`.
+"""
+
+from sqlalchemy.orm import Session
+
+from app import stats
+from app.models import Commission, ResellOffer
+
+USER_ROLES = ("admin", "store", "evaluator", "user")
+WATCH_STATUSES = ("registered", "evaluated", "for_sale", "sold", "tokenized")
+
+
+def snapshot(db: Session) -> dict:
+    """Totais pré-computados: {métrica: (count, amount_brl)} (1 query)"""
+    return stats.read_totals(db)
+
+
+def _count(totals: dict, metric: str) -> int:
+    return totals.get(metric, (0, 0.0))[0]
+
+
+def _amount(totals: dict, metric: str) -> float:
+    return totals.get(metric, (0, 0.0))[1]
+
+
+def users_summary(totals: dict) -> dict:
+    """Usuários por papel e saldo total da plataforma"""
+    by_role = {role: 0 for role in USER_ROLES}
+    for metric, (count, _) in totals.items():
+        if metric.startswith("users.role.") and count:
+            by_role[metric[len("users.role."):]] = count
+
+    return {
+        "by_role": by_role,
+        "total": sum(by_role.values()),
+        "balance_brl": _amount(totals, "users.balance_brl"),
+        "balance_xlm": _amount(totals, "users.balance_xlm"),
+    }
+
+
+def watches_by_status(totals: dict) -> dict:
+    """Relógios por status, com total"""
+    by_status = {status: 0 for status in WATCH_STATUSES}
+    total = 0
+    for metric, (count, _) in totals.items():
+        if metric.startswith("watches.status.") and count:
+            by_status[metric[len("watches.status."):]] = count
+            total += count
+    by_status["total"] = total
+    return by_status
+
+
+def platform_totals(db: Session, totals: dict) -> dict:
+    """Lojas, avaliadores, transferências, comissões e ofertas pendentes (1 query)"""
+    transfers = sum(count for metric, (count, _) in totals.items() if metric.startswith("transfers."))
+    return {
+        "total_stores": _count(totals, "stores.new"),
+        "active_stores": _count(totals, "stores.credentialed"),
+        "active_evaluators": _count(totals, "evaluators.active"),
+        "total_transfers": transfers,
+        "sales": _count(totals, "transfers.sale"),
+        "gifts": _count(totals, "transfers.gift"),
+        "pending_offers": db.query(ResellOffer).filter(ResellOffer.status == "pending").count(),
+        "total_commissions": _amount(totals, "commissions"),
+    }
+
+
+def recent_commissions(db: Session, limit: int = 5) -> list:
+    """Últimas comissões, formatadas para o dashboard"""
+    commissions = db.query(Commission).order_by(Commission.created_at.desc()).limit(limit).all()
+    return [{
+        "id": comm.id,
+        "amount_brl": comm.amount_brl or 0,
+        "description": comm.description or "Comissão de transação",
+        "transaction_type": comm.transaction_type or "sale",
+        "created_at": comm.created_at.isoformat()
+    } for comm in commissions]
@@ -1,16 +1,151 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
+from app.replicas import REPLICA_URLS, ReplicaSet, WritePins, request_user_id
+from app.metrics import TimedQueuePool, TimedAsyncQueuePool
+import app.stats  # registra a atualização incremental de marketplace_stats
+import app.cache  # invalida o cache do catálogo em commits que alteram relógios
 import os
 
-# Configuração do banco de dados (SQLite para MVP)
+# Configuração do banco de dados (SQLite para MVP, Postgres em produção)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./marketplace.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+# Pool de conexões (Postgres e SQLite em arquivo)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Segundos; abaixo do idle timeout do servidor/proxy
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "no")
+
+# Limite do SELECT 1 do /health/ready (segundos)
+HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", "2"))
+
+# PRAGMAs do SQLite: WAL deixa leitores rodarem durante a escrita e
+# synchronous=NORMAL (seguro com WAL) tira um fsync de cada commit
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+def normalize_database_url(url: str) -> str:
+    """Aceita o formato `postgres://` (Heroku, Render, Supabase) além de `postgresql://`"""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+def create_db_engine(url: str = DATABASE_URL, **overrides):
+    """
+    Engine com pool configurável por ambiente (DB_POOL_*) e pre-ping.
+    SQLite recebe os PRAGMAs de concorrência em cada conexão nova.
+    """
+    url = normalize_database_url(url)
+    backend = make_url(url).get_backend_name()
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    if backend == "sqlite":
+        database = make_url(url).database
+        options["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if database and database != ":memory:":
+            options.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                           pool_timeout=DB_POOL_TIMEOUT)
+        options.update(overrides)
+        engine = create_engine(url, **options)
+        if database and database != ":memory:":
+            event.listen(engine, "connect", _sqlite_pragmas)
+        return engine
+
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    options.update(overrides)
+    return create_engine(url, **options)
+
+# Drivers assíncronos equivalentes aos síncronos (psycopg 3 atende os dois modos)
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "psycopg"}
+
+def async_database_url(url: str) -> str:
+    """Mesmo banco de `url`, com o driver assíncrono (sqlite+aiosqlite, postgresql+psycopg)"""
+    parsed = make_url(normalize_database_url(url))
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Sem driver assíncrono configurado para {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def create_async_db_engine(url: str = DATABASE_URL, **overrides):
+    """
+    Engine assíncrona com o mesmo pool e os mesmos PRAGMAs da síncrona.
+    Usada pelas rotas de leitura mais acessadas, que aguardam o banco sem
+    ocupar uma thread do threadpool.
+    """
+    url = async_database_url(url)
+    parsed = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    if parsed.get_backend_name() == "sqlite":
+        file_backed = parsed.database and parsed.database != ":memory:"
+        options["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if file_backed:
+            options.update(poolclass=TimedAsyncQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                           pool_timeout=DB_POOL_TIMEOUT)
+        options.update(overrides)
+        engine = create_async_engine(url, **options)
+        if file_backed:
+            event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+        return engine
+
+    options.update(
+        poolclass=TimedAsyncQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Criar tabelas
-Base.metadata.create_all(bind=engine)
+async_engine = create_async_db_engine()
+# expire_on_commit=False: objetos continuam legíveis depois do commit sem novo round-trip (lazy load não existe em async)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Réplicas de leitura (DATABASE_REPLICA_URLS); vazio = tudo no primário
+read_replicas = ReplicaSet(REPLICA_URLS, create_db_engine, create_async_db_engine)
+write_pins = WritePins()
+
+def _read_replica(request):
+    if not read_replicas or write_pins.is_pinned(request_user_id(request)):
+        return None
+    return read_replicas.pick()
+
+def init_db():
+    """
+    Cria tabelas, índices e rollups. Chamado no startup da aplicação e pelos
+    scripts, não na importação (importar o módulo não toca no banco).
+    """
+    from app.migrations import run_migrations
+    run_migrations(engine)
 
 def get_db():
     db = SessionLocal()
@@ -18,3 +153,48 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def ping_database(timeout: float = HEALTH_DB_TIMEOUT) -> dict:
+    """SELECT 1 no primário pela engine assíncrona, com limite de tempo (não ocupa o threadpool)"""
+    async def select_one():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(select_one(), timeout)
+    except Exception as e:
+        # Só a classe do erro: a mensagem do driver expõe host/socket a quem chama sem autenticação
+        error = "timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+        return {"ok": False, "latency_ms": round((time.perf_counter() - started) * 1000, 1), "error": error}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+def get_read_db(request: Request):
+    """
+    Sessão para rotas só de leitura: réplica em round-robin, ou o primário
+    quando não há réplica saudável ou o usuário escreveu há pouco.
+    """
+    replica = _read_replica(request)
+    db = replica.session_factory() if replica else SessionLocal()
+    try:
+        yield db
+    except OperationalError as e:
+        if replica:
+            replica.mark_down(e)
+        raise
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    replica = _read_replica(request)
+    async with (replica.async_session_factory() if replica else AsyncSessionLocal()) as db:
+        try:
+            yield db
+        except OperationalError as e:
+            if replica:
+                replica.mark_down(e)
+            raise
@@ -0,0 +1,196 @@
+"""
+Consultas SQL e tempo de banco por requisição.
+
+- `DBMetricsMiddleware` abre um `RequestDBStats` por requisição (num
+  ContextVar, que acompanha a requisição no threadpool e nas sessões
+  assíncronas) e devolve o resultado no header `Server-Timing`:
+
+      Server-Timing: db;dur=12.4;desc="7 queries", app;dur=31.0
+
+  (aparece na aba Network/Timing do navegador).
+- Os eventos `before_cursor_execute`/`after_cursor_execute` valem para
+  todas as Engines: primário, réplicas e as engines síncronas por trás
+  das AsyncEngines.
+- Consultas acima de SLOW_QUERY_MS vão para o logger `app.slow_queries`
+  (stderr, ou SLOW_QUERY_LOG_FILE) com a rota que as chamou; as últimas
+  SLOW_QUERY_KEEP ficam em memória. Os parâmetros só entram com
+  SLOW_QUERY_LOG_PARAMS=1, e nunca os de consultas que tocam colunas
+  sensíveis (SENSITIVE_COLUMNS: hash de senha, segredos Stellar, CPF).
+- `endpoint_db_stats` acumula requisições, consultas e tempo de banco por
+  rota (método + caminho do template); `GET /admin/db-stats` mostra as
+  rotas que mais gastam banco.
+
+Os números são por processo: com vários workers, cada um tem os seus.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # <= 0 desliga o log
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE")
+SLOW_QUERY_LOG_PARAMS = os.getenv("SLOW_QUERY_LOG_PARAMS", "0").lower() in ("1", "true", "yes")
+SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", "100"))
+
+# Limite do texto de consulta/parâmetros guardado por consulta lenta
+MAX_LOGGED_CHARS = 2000
+
+# Consultas que citam estas colunas nunca têm os parâmetros logados
+# (jobs.checkpoint guarda os segredos das contas emissoras e de escrow)
+SENSITIVE_COLUMNS = ("password_hash", "stellar_secret", "escrow_secret_key", "checkpoint", "cpf")
+
+slow_query_logger = logging.getLogger("app.slow_queries")
+if SLOW_QUERY_LOG_FILE:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG_FILE)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_query_logger.addHandler(_handler)
+
+
+class RequestDBStats:
+    """Consultas e tempo de banco de uma requisição"""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        """Método + template da rota (`GET /watches/{watch_id}`), depois do roteamento"""
+        route = self.scope.get("route")
+        path = getattr(route, "path", None)
+        return f"{self.scope['method']} {path}" if path else None
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+                f"app;dur={total_seconds * 1000:.1f}")
+
+
+class EndpointDBStats:
+    """Totais por rota desde o início do processo (ou do último reset)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._totals: Dict[str, List[float]] = {}  # rota -> [requisições, consultas, segundos, máx]
+            self.since = datetime.utcnow()
+
+    def record(self, endpoint: str, queries: int, db_seconds: float):
+        with self._lock:
+            totals = self._totals.setdefault(endpoint, [0, 0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += queries
+            totals[2] += db_seconds
+            totals[3] = max(totals[3], db_seconds)
+
+    def top(self, limit: int = 20) -> List[dict]:
+        with self._lock:
+            items = sorted(self._totals.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [{
+            "endpoint": endpoint,
+            "requests": requests,
+            "queries": queries,
+            "queries_per_request": round(queries / requests, 2),
+            "db_ms_total": round(seconds * 1000, 1),
+            "db_ms_avg": round(seconds * 1000 / requests, 2),
+            "db_ms_max": round(max_seconds * 1000, 1),
+        } for endpoint, (requests, queries, seconds, max_seconds) in items]
+
+
+_current_request: ContextVar[Optional[RequestDBStats]] = ContextVar("db_request_stats", default=None)
+endpoint_db_stats = EndpointDBStats()
+recent_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+
+
+def current_request_stats() -> Optional[RequestDBStats]:
+    return _current_request.get()
+
+
+def _truncate(value: str) -> str:
+    return value if len(value) <= MAX_LOGGED_CHARS else value[:MAX_LOGGED_CHARS] + "..."
+
+
+def _loggable_parameters(statement: str, parameters) -> str:
+    if not SLOW_QUERY_LOG_PARAMS:
+        return "(omitidos)"
+    lowered = statement.lower()
+    if any(column in lowered for column in SENSITIVE_COLUMNS):
+        return "(omitidos: colunas sensíveis)"
+    return _truncate(repr(parameters))
+
+
+def _log_slow_query(statement, parameters, elapsed: float, stats: Optional[RequestDBStats]):
+    route = (stats.endpoint or f"{stats.scope['method']} {stats.scope['path']}") if stats else "(fora de requisição)"
+    params = _loggable_parameters(statement, parameters)
+    sql = _truncate(" ".join(statement.split()))
+    recent_slow_queries.append({
+        "at": datetime.utcnow().isoformat(),
+        "duration_ms": round(elapsed * 1000, 1),
+        "route": route,
+        "statement": sql,
+        "parameters": params,
+    })
+    slow_query_logger.warning("Consulta lenta (%.1f ms) em %s: %s | parâmetros: %s", elapsed * 1000, route, sql, params)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._db_metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_db_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if 0 < SLOW_QUERY_MS <= elapsed * 1000:
+        _log_slow_query(statement, parameters, elapsed, stats)
+
+
+class DBMetricsMiddleware:
+    """Conta consultas e tempo de banco de cada requisição e devolve em Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDBStats(scope)
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            # Sem rota = não chegou a uma rota (hit do cache do catálogo, 404, estáticos)
+            endpoint = stats.endpoint
+            if endpoint is not None:
+                endpoint_db_stats.record(endpoint, stats.queries, stats.db_seconds)
@@ -0,0 +1,449 @@
+"""
+Fila de jobs persistente para operações lentas na Stellar.
+
+Mint de NFT, transferência de NFT, criação e liberação de escrow levam segundos
+(S3, friendbot, Horizon); o endpoint só grava um `Job` e devolve o id, e um
+worker separado executa:
+
+    python start_worker.py            # ou: python -m app.jobs
+
+- Claim atômico: `UPDATE ... WHERE status = 'pending'` condicional, então
+  vários workers (processos ou máquinas) podem consumir a mesma tabela.
+- Retries com backoff exponencial até `max_attempts`.
+- Idempotência: a chave vale por (escopo, tipo, chave), onde o escopo é o
+  usuário que enfileirou (ou "shared" para recursos únicos, como um
+  escrow). A mesma chave com o mesmo payload devolve o job existente; com
+  outro payload, `IdempotencyConflict` (409). Um job `failed` volta para a
+  fila quando a chave é reenviada.
+- Recuperação: o worker segura o job por um lease (`locked_until`),
+  renovado por um heartbeat enquanto o handler roda; se o worker cair, o
+  job volta a ser elegível quando o lease expira.
+- Retomada sem repetir efeitos: o handler grava no `checkpoint` do job o
+  que precisa sobreviver a uma nova tentativa (conta emissora, hash da
+  transação montada) antes de cada passo externo, e na tentativa seguinte
+  confere o estado na rede em vez de enviar de novo.
+- Handlers podem ser `async def`: o worker mantém um event loop próprio,
+  então a sessão aiohttp com o Horizon (StellarContracts.aserver) é aberta
+  uma vez e reaproveitada por todos os jobs.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import inspect as inspect_schema, or_, and_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Job
+
+# Backoff entre tentativas: BASE * 2^(tentativa-1), limitado a MAX
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+# Tempo que um worker pode segurar um job sem renovar antes de ele voltar para a fila
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Intervalo do heartbeat que renova o lease enquanto o handler roda
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(LEASE_SECONDS / 3)))
+POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+
+# Escopo de chaves que identificam um recurso único, independente de quem enfileira
+SHARED_SCOPE = "shared"
+
+# Registro de handlers: tipo do job -> função(payload, checkpoint) -> resultado (JSON), síncrona ou async
+HANDLERS: Dict[str, Callable[[dict, "Checkpoint"], Any]] = {}
+
+
+class IdempotencyConflict(ValueError):
+    """A chave de idempotência já foi usada com outro payload"""
+
+
+class Checkpoint:
+    """
+    Progresso de um job entre tentativas. Sem `db`/`job` (chamadas diretas
+    aos contratos, fora da fila) os valores ficam só em memória.
+    """
+
+    def __init__(self, db: Optional[Session] = None, job: Optional[Job] = None):
+        self.db = db
+        self.job = job
+        self._values = dict(job.checkpoint or {}) if job is not None else {}
+
+    def get(self, key: str, default=None):
+        return self._values.get(key, default)
+
+    def save(self, **values):
+        """Grava antes do passo externo: se o worker cair logo depois, a próxima tentativa sabe o que foi tentado"""
+        self._values.update(values)
+        if self.job is not None:
+            self.job.checkpoint = dict(self._values)
+            self.db.commit()
+
+
+def job_handler(job_type: str):
+    """Registra a função que executa um tipo de job"""
+    def register(func):
+        HANDLERS[job_type] = func
+        return func
+    return register
+
+
+def retry_delay(attempts: int) -> float:
+    return min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+
+
+def payload_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+def idempotency_scope(created_by_user_id: Optional[int], shared: bool = False) -> str:
+    if shared:
+        return SHARED_SCOPE
+    return f"user:{created_by_user_id}" if created_by_user_id is not None else "system"
+
+
+def _find_by_key(db: Session, scope: str, job_type: str, idempotency_key: str):
+    return db.query(Job).filter(
+        Job.idempotency_scope == scope,
+        Job.type == job_type,
+        Job.idempotency_key == idempotency_key,
+    )
+
+
+def _reuse(db: Session, existing: Job, payload: dict, digest: str, max_attempts: int) -> Job:
+    """Job já enfileirado com a mesma chave: devolve, recusa ou recoloca na fila"""
+    if existing.status != "failed":
+        if existing.payload_hash != digest:
+            raise IdempotencyConflict("Idempotency-Key já usada com outro payload")
+        return existing
+
+    # Job falho: a chave volta a valer. Com o mesmo payload o checkpoint é
+    # mantido, então a nova execução retoma de onde a anterior parou
+    values = {
+        Job.status: "pending",
+        Job.attempts: 0,
+        Job.max_attempts: max_attempts,
+        Job.run_after: datetime.utcnow(),
+        Job.result: None,
+        Job.finished_at: None,
+    }
+    if existing.payload_hash != digest:
+        values.update({Job.payload: payload, Job.payload_hash: digest, Job.checkpoint: None})
+    db.query(Job).filter(Job.id == existing.id, Job.status == "failed").update(values, synchronize_session=False)
+    db.commit()
+    db.refresh(existing)
+    return existing
+
+
+def enqueue(db: Session, job_type: str, payload: dict, idempotency_key: Optional[str] = None,
+            max_attempts: int = 5, created_by_user_id: Optional[int] = None, shared: bool = False) -> Job:
+    """
+    Grava um job pendente e retorna. Com `idempotency_key`, um job já
+    existente com a mesma chave no mesmo escopo é retornado em vez de criar
+    outro (`shared=True`: a chave identifica o recurso, para qualquer usuário).
+    """
+    if job_type not in HANDLERS:
+        raise ValueError(f"Tipo de job desconhecido: {job_type}")
+
+    digest = payload_hash(payload)
+    scope = idempotency_scope(created_by_user_id, shared) if idempotency_key else None
+    if idempotency_key:
+        existing = _find_by_key(db, scope, job_type, idempotency_key).first()
+        if existing:
+            return _reuse(db, existing, payload, digest, max_attempts)
+
+    job = Job(
+        type=job_type,
+        payload=payload,
+        payload_hash=digest,
+        idempotency_scope=scope,
+        idempotency_key=idempotency_key,
+        created_by_user_id=created_by_user_id,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Outra requisição gravou a mesma chave entre o SELECT e o INSERT
+        db.rollback()
+        existing = _find_by_key(db, scope, job_type, idempotency_key).one()
+        return _reuse(db, existing, payload, digest, max_attempts)
+    db.refresh(job)
+    return job
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(Job.status == "pending", Job.run_after <= now),
+        # Lease expirado: o worker que segurava o job caiu
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+def _fail_exhausted(db: Session, job_id: int, now: datetime) -> bool:
+    """Job que derrubou o worker em todas as tentativas não volta para a fila"""
+    failed = db.query(Job).filter(
+        Job.id == job_id,
+        Job.status == "running",
+        Job.locked_until < now,
+    ).update({
+        Job.status: "failed",
+        Job.last_error: "Lease expirado sem conclusão após o número máximo de tentativas",
+        Job.finished_at: now,
+        Job.locked_by: None,
+        Job.locked_until: None,
+    }, synchronize_session=False)
+    db.commit()
+    return bool(failed)
+
+
+def claim_next(db: Session, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> Optional[Job]:
+    """
+    Reserva o próximo job elegível para este worker. O UPDATE condicional
+    garante que só um worker vence a disputa pelo mesmo job.
+    """
+    now = datetime.utcnow()
+    candidates = db.query(Job.id, Job.status, Job.attempts, Job.max_attempts).filter(
+        _claimable(now)
+    ).order_by(Job.run_after, Job.id).limit(10).all()
+    for job_id, status, attempts, max_attempts in candidates:
+        if status == "running" and attempts >= max_attempts:
+            _fail_exhausted(db, job_id, now)
+            continue
+        claimed = db.query(Job).filter(Job.id == job_id, _claimable(now)).update({
+            Job.status: "running",
+            Job.locked_by: worker_id,
+            Job.locked_until: now + timedelta(seconds=lease_seconds),
+            Job.attempts: Job.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return db.get(Job, job_id)
+    return None
+
+
+class LeaseHeartbeat:
+    """
+    Renova o lease do job em uma thread enquanto o handler roda, para que
+    jobs mais longos que `lease_seconds` não sejam reivindicados por outro
+    worker no meio da execução.
+    """
+
+    def __init__(self, bind, job_id: int, worker_id: str, lease_seconds: int = LEASE_SECONDS,
+                 interval: float = HEARTBEAT_SECONDS):
+        self.bind = bind
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job_id}", daemon=True)
+
+    def extend(self) -> bool:
+        """Empurra locked_until; False se o lease já não é deste worker"""
+        with self.bind.begin() as conn:
+            renewed = conn.execute(update(Job).where(
+                Job.id == self.job_id,
+                Job.status == "running",
+                Job.locked_by == self.worker_id,
+            ).values(locked_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))).rowcount
+        return bool(renewed)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.extend():
+                    print(f"Job {self.job_id}: lease perdido pelo worker {self.worker_id}")
+                    return
+            except Exception as e:
+                print(f"Job {self.job_id}: falha ao renovar o lease: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def complete(db: Session, job: Job, result: Optional[dict]):
+    job.status = "succeeded"
+    job.result = result
+    job.last_error = None
+    job.finished_at = datetime.utcnow()
+    job.locked_by = None
+    job.locked_until = None
+    db.commit()
+
+
+def fail(db: Session, job: Job, error: str):
+    """Reagenda com backoff ou marca como falho ao esgotar as tentativas"""
+    job.last_error = error
+    job.locked_by = None
+    job.locked_until = None
+    if job.attempts >= job.max_attempts:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = "pending"
+        job.run_after = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+    db.commit()
+
+
+def run_job(db: Session, job: Job, loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Executa o handler do job; handlers async rodam em `loop` (o do worker)"""
+    handler = HANDLERS.get(job.type)
+    if handler is None:
+        job.attempts = job.max_attempts  # Sem handler não adianta tentar de novo
+        fail(db, job, f"Tipo de job desconhecido: {job.type}")
+        return
+    try:
+        with LeaseHeartbeat(db.get_bind(), job.id, job.locked_by):
+            result = handler(dict(job.payload or {}), Checkpoint(db, job))
+            if inspect.isawaitable(result):
+                result = (loop or _worker_loop()).run_until_complete(result)
+    except Exception as e:
+        print(f"Job {job.id} ({job.type}) falhou na tentativa {job.attempts}: {e}")
+        db.rollback()
+        fail(db, job, f"{e}\n{traceback.format_exc()}")
+        return
+    complete(db, job, result)
+
+
+def work(session_factory, worker_id: Optional[str] = None, poll_interval: float = POLL_INTERVAL_SECONDS,
+         once: bool = False):
+    """
+    Loop do worker: reserva e executa jobs até ser interrompido.
+    Com `once=True`, processa o que estiver elegível e retorna.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    loop = _worker_loop()
+    processed = 0
+    try:
+        while True:
+            db = session_factory()
+            try:
+                job = claim_next(db, worker_id)
+                if job is not None:
+                    run_job(db, job, loop)
+                    processed += 1
+            finally:
+                db.close()
+
+            if job is None:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+    finally:
+        _close_worker_loop()
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    """Event loop do worker, reaproveitado entre jobs (a sessão aiohttp fica presa a ele)"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+def _close_worker_loop():
+    global _loop
+    if _loop is None:
+        return
+    from app.stellar_contracts import close_stellar_contracts
+    try:
+        _loop.run_until_complete(close_stellar_contracts())
+    finally:
+        _loop.close()
+        _loop = None
+
+
+def upgrade_table(engine):
+    """
+    Bancos criados antes do escopo de idempotência têm `idempotency_key`
+    única globalmente. A tabela é recriada no formato atual, copiando os
+    jobs (escopo pelo usuário que enfileirou, hash do payload recalculado).
+    """
+    inspector = inspect_schema(engine)
+    if not inspector.has_table(Job.__tablename__):
+        return
+    if "idempotency_scope" in {column["name"] for column in inspector.get_columns(Job.__tablename__)}:
+        return
+
+    with engine.begin() as conn:
+        old_columns = {column["name"] for column in inspector.get_columns(Job.__tablename__)}
+        rows = [dict(row._mapping) for row in conn.execute(
+            select(*[column for column in Job.__table__.columns if column.name in old_columns])
+        )]
+        Job.__table__.drop(conn)
+        Job.__table__.create(conn)
+        for row in rows:
+            shared = (row["idempotency_key"] or "").startswith("escrow.release:")
+            row["idempotency_scope"] = (idempotency_scope(row["created_by_user_id"], shared)
+                                        if row["idempotency_key"] else None)
+            row["payload_hash"] = payload_hash(row["payload"] or {})
+        if rows:
+            conn.execute(Job.__table__.insert(), rows)
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT setval(pg_get_serial_sequence('jobs', 'id'), (SELECT MAX(id) FROM jobs))"))
+
+
+# ========================= HANDLERS STELLAR =========================
+
+def _contracts():
+    from app.stellar_contracts import get_stellar_contracts
+    return get_stellar_contracts()
+
+
+@job_handler("nft.mint")
+async def _mint_nft(payload: dict, checkpoint: Checkpoint) -> dict:
+    return await _contracts().get_watch_registration().register_watch_async(
+        payload["evaluation_data"], payload["owner_user_id"], checkpoint
+    )
+
+
+@job_handler("nft.tokenize")
+async def _tokenize_watch(payload: dict, checkpoint: Checkpoint) -> dict:
+    return await _contracts().get_watch_registration().tokenize_watch_async(payload["watch_id"], checkpoint)
+
+
+@job_handler("nft.transfer")
+async def _transfer_nft(payload: dict, checkpoint: Checkpoint) -> dict:
+    return await _contracts().get_nft().transfer_nft_async(
+        payload["watch_id"], payload["from_user_id"], payload["to_user_id"], checkpoint
+    )
+
+
+@job_handler("escrow.create")
+async def _create_escrow(payload: dict, checkpoint: Checkpoint) -> dict:
+    return await _contracts().get_escrow().deposit_to_escrow_async(
+        payload["offer_id"], Decimal(payload["amount_usdc"]), payload["depositor_stellar_key"], checkpoint
+    )
+
+
+@job_handler("escrow.release")
+async def _release_escrow(payload: dict, checkpoint: Checkpoint) -> dict:
+    return await _contracts().get_escrow().release_escrow_funds_async(payload["escrow_id"], checkpoint)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    print("Worker de jobs iniciado")
+    work(SessionLocal)
@@ -1,22 +1,35 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Header, HTTPException, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from app.routers import auth, watches, resell, admin, notifications, payments, evaluations, stellar_contracts
-from app.database import engine, get_db
-from app.models import Base, User, Store, Watch
+from app.routers import auth, watches, resell, admin, notifications, payments, evaluations, stellar_contracts, jobs
+from app.database import async_engine, get_db, init_db, ping_database, read_replicas, write_pins
+from app.replicas import WRITE_METHODS, request_user_id
+from app.models import User, Store, Watch
 from app.auth import require_role
+from app.pagination import NEXT_CURSOR_HEADER
+from app.cache import CatalogCacheMiddleware, ETagMiddleware
+from app.compression import CompressionMiddleware
+from app.db_metrics import DBMetricsMiddleware
+from app.metrics import MetricsMiddleware, metrics_authorized, metrics_enabled, metrics_response
 import os
+import sys
+from typing import Optional
 
-# Criar tabelas no banco de dados
-Base.metadata.create_all(bind=engine)
-   
 app = FastAPI(
     title="Marketplace de Relógios com NFT + Escrow na Stellar",
     description="API para marketplace de relógios de luxo com tokenização NFT e sistema de escrow",
     version="2.0.0"
 )
 
+# Middlewares registrados antes do CORS ficam por dentro dele: hits do cache e 304 também recebem os headers CORS.
+# Ordem de fora para dentro: CORS -> métricas -> métricas de banco -> compressão -> ETag -> cache do catálogo -> rotas
+app.add_middleware(CatalogCacheMiddleware)  # Cache do catálogo público (ETag/Last-Modified/304)
+app.add_middleware(ETagMiddleware)  # ETag pelo hash do corpo nas demais respostas GET
+app.add_middleware(CompressionMiddleware)  # brotli/gzip acima de COMPRESSION_MIN_BYTES
+app.add_middleware(DBMetricsMiddleware)  # Consultas e tempo de banco por requisição (Server-Timing)
+app.add_middleware(MetricsMiddleware)  # Latência por rota e requisições em andamento (/metrics)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -24,8 +37,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Cursor de paginação do marketplace
 )
 
+# Read-your-writes: quem acabou de escrever lê do primário por alguns segundos
+if read_replicas:
+    @app.middleware("http")
+    async def pin_writers_to_primary(request, call_next):
+        response = await call_next(request)
+        if request.method in WRITE_METHODS:
+            user_id = request_user_id(request)
+            if user_id is not None:
+                write_pins.pin(user_id)
+        return response
+
 # Servir arquivos estáticos
 os.makedirs("static/uploads", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -39,6 +64,25 @@ app.include_router(notifications.router)
 app.include_router(payments.router)
 app.include_router(evaluations.router)
 app.include_router(stellar_contracts.router)  # Contratos Stellar
+app.include_router(jobs.router)  # Fila de jobs Stellar
+
+@app.on_event("startup")
+def create_tables():
+    """Criar tabelas, índices e índice de busca no banco de dados"""
+    init_db()
+
+@app.on_event("shutdown")
+async def close_horizon_client():
+    """Fecha a sessão aiohttp com o Horizon, se os contratos Stellar foram usados"""
+    contracts = sys.modules.get("app.stellar_contracts")
+    if contracts is not None:
+        await contracts.close_stellar_contracts()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """Fecha as conexões do pool assíncrono (rotas de leitura) e das réplicas"""
+    await async_engine.dispose()
+    await read_replicas.dispose_async()
 
 @app.get("/")
 def root():
@@ -68,14 +112,43 @@ def root():
     }
 
 @app.get("/health")
-def health():
+async def health(response: Response):
+    """Estado geral: ping real no banco (503 se o primário não responde) e réplicas"""
     from datetime import datetime
+    database = await ping_database()
+    if not database["ok"]:
+        response.status_code = 503
     return {
-        "status": "ok", 
+        "status": "ok" if database["ok"] else "unavailable",
         "timestamp": datetime.utcnow().isoformat(),
-        "database": "connected"
+        "database": "connected" if database["ok"] else "unavailable",
+        "database_latency_ms": database["latency_ms"],
+        "read_replicas": read_replicas.status()
     }
 
+@app.get("/health/live")
+def liveness():
+    """Liveness: o processo responde (não toca no banco; reiniciar não resolve banco fora)"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Readiness: o primário responde a um SELECT 1 dentro de HEALTH_DB_TIMEOUT; senão 503"""
+    database = await ping_database()
+    if not database["ok"]:
+        response.status_code = 503
+    return {"status": "ready" if database["ok"] else "not_ready", "database": database}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: Optional[str] = Header(None)):
+    """Métricas no formato do Prometheus (Bearer METRICS_TOKEN; sem token configurado, 404)"""
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not metrics_authorized(authorization):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return metrics_response()
+
 # Endpoints de DEBUG temporários
 @app.get("/debug/profile")
 def debug_profile(current_user = Depends(require_role(["admin", "store", "evaluator", "user"])), db: Session = Depends(get_db)):
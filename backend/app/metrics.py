@@ -0,0 +1,160 @@
+"""
+Métricas no formato do Prometheus, expostas em `GET /metrics`.
+
+    http_request_duration_seconds{method, route, status}   histograma por template de rota
+    http_requests_in_progress{method}                       requisições em andamento
+    db_pool_checkout_wait_seconds{pool}                     espera por uma conexão do pool (sync/async)
+    stellar_call_duration_seconds{operation, outcome}       mint, nft_transfer, usdc_payment
+    stellar_calls_in_progress{operation}
+    s3_upload_duration_seconds{kind, outcome}               laudo (report) e evidências (photo, pdf)
+
+A rota é o template (`/watches/{watch_id}`), nunca o caminho concreto, para
+não explodir a cardinalidade. Respostas servidas pelo cache do catálogo não
+chegam ao roteador e entram como `route="(cache)"`; as que não casaram com
+nenhuma rota, como `route="(sem rota)"`.
+
+Com vários workers (gunicorn/uvicorn --workers), defina PROMETHEUS_MULTIPROC_DIR
+(diretório vazio e gravável) para que /metrics agregue todos os processos.
+
+O endpoint exige `Authorization: Bearer <METRICS_TOKEN>` (no Prometheus:
+`authorization: {credentials: ...}` no scrape_config); sem METRICS_TOKEN
+definido ele responde 404.
+"""
+
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Histogram, REGISTRY, generate_latest
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.responses import Response
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Chamadas externas (Horizon, S3) levam de dezenas de ms a vários segundos
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Duração das requisições HTTP por template de rota",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requisições HTTP em andamento", ["method"], multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Tempo até obter uma conexão do pool (inclui abrir conexão nova)",
+    ["pool"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+STELLAR_CALL_DURATION = Histogram(
+    "stellar_call_duration_seconds", "Duração das operações na Stellar",
+    ["operation", "outcome"], buckets=EXTERNAL_BUCKETS,
+)
+STELLAR_CALLS_IN_PROGRESS = Gauge(
+    "stellar_calls_in_progress", "Operações na Stellar em andamento", ["operation"], multiprocess_mode="livesum",
+)
+S3_UPLOAD_DURATION = Histogram(
+    "s3_upload_duration_seconds", "Duração dos uploads para o S3",
+    ["kind", "outcome"], buckets=EXTERNAL_BUCKETS,
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, in_progress: Gauge = None, **labels):
+    """Mede o bloco em `histogram` com outcome=ok/error (serve em código síncrono e assíncrono)"""
+    gauge = in_progress.labels(*labels.values()) if in_progress is not None else None
+    if gauge is not None:
+        gauge.inc()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        histogram.labels(outcome=outcome, **labels).observe(time.perf_counter() - started)
+        if gauge is not None:
+            gauge.dec()
+
+
+def stellar_call(operation: str):
+    return observe(STELLAR_CALL_DURATION, STELLAR_CALLS_IN_PROGRESS, operation=operation)
+
+
+def s3_upload(kind: str):
+    return observe(S3_UPLOAD_DURATION, kind=kind)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mede a espera por conexão em db_pool_checkout_wait_seconds"""
+
+    _pool_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self._pool_label).observe(time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    _pool_label = "async"
+
+
+class MetricsMiddleware:
+    """Duração por template de rota e requisições em andamento"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        cache_hit = False
+
+        async def send_with_status(message):
+            nonlocal status, cache_hit
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                cache_hit = any(name == b"x-cache" and value == b"HIT" for name, value in message["headers"])
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", None) or ("(cache)" if cache_hit else "(sem rota)")
+            HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(elapsed)
+
+
+def metrics_enabled() -> bool:
+    return bool(METRICS_TOKEN)
+
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    """Header Authorization com o METRICS_TOKEN (comparação em tempo constante)"""
+    if not METRICS_TOKEN or not authorization:
+        return False
+    scheme, _, credentials = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), METRICS_TOKEN.encode())
+
+
+def metrics_response() -> Response:
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,38 @@
+"""
+Migrações leves de schema executadas na inicialização.
+
+`Base.metadata.create_all` só cria índices junto com tabelas novas; em
+bancos já existentes os índices declarados nos modelos nunca seriam
+criados. Aqui cada índice é criado se ainda não existir, o que torna a
+migração idempotente e segura para rodar a cada start.
+"""
+
+from app.jobs import upgrade_table as upgrade_jobs_table
+from app.models import Base
+from app.search import ensure_search_index
+from app.stats import backfill_if_empty, drop_outdated_table
+
+
+def create_missing_indexes(engine):
+    """Cria os índices declarados nos modelos que ainda não existem no banco"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            # checkfirst consulta o catálogo antes do CREATE INDEX
+            index.create(bind=engine, checkfirst=True)
+
+
+def run_migrations(engine):
+    """Cria tabelas, índices, o índice de busca textual e o rollup de estatísticas"""
+    drop_outdated_table(engine)
+    upgrade_jobs_table(engine)
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes(engine)
+    ensure_search_index(engine)
+    backfill_if_empty(engine)
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    run_migrations(engine)
+    print("Migrações aplicadas")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Text, JSON, create_engine, Index
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Text, JSON, create_engine, Index, text
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
@@ -40,6 +40,10 @@ class Store(Base):
     evaluators = relationship("Evaluator", back_populates="store")
     watches = relationship("Watch", back_populates="store")
 
+    __table_args__ = (
+        Index('idx_stores_user', 'user_id'),
+    )
+
 class Evaluator(Base):
     __tablename__ = "evaluators"
     id = Column(Integer, primary_key=True, index=True)
@@ -59,6 +63,10 @@ class Evaluator(Base):
     store = relationship("Store", back_populates="evaluators")
     evaluations = relationship("Evaluation", back_populates="evaluator")
 
+    __table_args__ = (
+        Index('idx_evaluators_user', 'user_id'),
+    )
+
 class Watch(Base):
     __tablename__ = "watches"
     id = Column(Integer, primary_key=True, index=True)
@@ -92,6 +100,15 @@ class Watch(Base):
     evaluations = relationship("Evaluation", back_populates="watch")
     transfers = relationship("OwnershipTransfer", back_populates="watch")
 
+    # Índices para o marketplace: filtro por status + ordenação keyset (valor, id)
+    __table_args__ = (
+        Index('idx_watches_status_value', 'status', 'current_value_brl', 'id'),
+        Index('idx_watches_status_brand', 'status', 'brand', 'id'),
+        Index('idx_watches_status_created', 'status', 'created_at', 'id'),
+        Index('idx_watches_owner', 'current_owner_user_id'),
+        Index('idx_watches_store', 'store_id'),
+    )
+
 class Evaluation(Base):
     __tablename__ = "evaluations"
     id = Column(Integer, primary_key=True, index=True)
@@ -111,6 +128,11 @@ class Evaluation(Base):
     evaluator = relationship("Evaluator", back_populates="evaluations")
     requesting_user = relationship("User", foreign_keys=[requested_by_user_id])
 
+    __table_args__ = (
+        Index('idx_evaluations_watch_created', 'watch_id', 'created_at'),
+        Index('idx_evaluations_evaluator', 'evaluator_id'),
+    )
+
 class ResellOffer(Base):
     __tablename__ = "resell_offers"
     id = Column(Integer, primary_key=True, index=True)
@@ -136,6 +158,13 @@ class ResellOffer(Base):
     evaluator = relationship("Evaluator")
     escrow = relationship("Escrow", back_populates="offer", uselist=False)
 
+    __table_args__ = (
+        Index('idx_resell_offers_seller', 'seller_user_id'),
+        Index('idx_resell_offers_store', 'store_id'),
+        Index('idx_resell_offers_evaluator', 'evaluator_id'),
+        Index('idx_resell_offers_status', 'status'),
+    )
+
 class OwnershipTransfer(Base):
     __tablename__ = "ownership_transfers"
     id = Column(Integer, primary_key=True, index=True)
@@ -153,6 +182,15 @@ class OwnershipTransfer(Base):
     from_user = relationship("User", foreign_keys=[from_user_id])
     to_user = relationship("User", foreign_keys=[to_user_id])
 
+    # Relatórios filtram por tipo/período; histórico por relógio e por usuário
+    __table_args__ = (
+        Index('idx_transfers_type_created', 'type', 'created_at'),
+        Index('idx_transfers_created', 'created_at'),
+        Index('idx_transfers_watch_created', 'watch_id', 'created_at'),
+        Index('idx_transfers_to_user_created', 'to_user_id', 'created_at'),
+        Index('idx_transfers_from_user_created', 'from_user_id', 'created_at'),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True, index=True)
@@ -166,6 +204,11 @@ class Notification(Base):
     # Relationships
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        Index('idx_notifications_user_read_created', 'user_id', 'read', 'created_at'),
+        Index('idx_notifications_user_created', 'user_id', 'created_at'),
+    )
+
 class Commission(Base):
     __tablename__ = "commissions"
     id = Column(Integer, primary_key=True, index=True)
@@ -179,6 +222,69 @@ class Commission(Base):
     # Relationships
     recipient = relationship("User")
 
+    __table_args__ = (
+        Index('idx_commissions_created', 'created_at'),
+    )
+
+class MarketplaceStat(Base):
+    """
+    Rollup de métricas do marketplace, mantido incrementalmente (ver app/stats.py)
+    """
+    __tablename__ = "marketplace_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String, nullable=False)  # transfers.sale, watches.status.for_sale, users.new...
+    period = Column(String, nullable=False)  # day, month, total
+    bucket = Column(String, nullable=False)  # 2025-08-05, 2025-08 ou "all"
+    shard = Column(Integer, nullable=False, default=0)  # fatia do contador; leituras somam todas
+    count = Column(Integer, nullable=False, default=0)
+    amount_brl = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_marketplace_stats_shard_key', 'metric', 'period', 'bucket', 'shard', unique=True),
+        Index('idx_marketplace_stats_period_bucket', 'period', 'bucket'),
+    )
+
+class Job(Base):
+    """
+    Job da fila persistente de operações lentas (ver app/jobs.py)
+    """
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String, nullable=False)  # nft.mint, nft.tokenize, nft.transfer, escrow.create, escrow.release
+    payload = Column(JSON, nullable=False)
+    payload_hash = Column(String)  # SHA256 do payload: mesma chave com outro payload é recusada
+    # Chave única por (escopo, tipo, chave); escopo "user:<id>", "system" ou "shared"
+    idempotency_scope = Column(String)
+    idempotency_key = Column(String, nullable=True)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"))
+    
+    status = Column(String, nullable=False, default="pending")  # pending, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Próxima tentativa (backoff)
+    
+    # Lease do worker: se o worker cair, o job volta para a fila quando o lease expira
+    locked_by = Column(String)
+    locked_until = Column(DateTime)
+    
+    # Progresso gravado pelo handler entre tentativas (conta emissora, hash da transação enviada)
+    checkpoint = Column(JSON)
+    result = Column(JSON)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index('idx_jobs_idempotency', 'idempotency_scope', 'type', 'idempotency_key', unique=True),
+        Index('idx_jobs_status_run_after', 'status', 'run_after'),
+        Index('idx_jobs_status_locked_until', 'status', 'locked_until'),
+    )
+
 # ========================= MODELOS PARA CONTRATOS STELLAR =========================
 
 class NFTToken(Base):
@@ -266,6 +372,22 @@ class StellarTransaction(Base):
     watch = relationship("Watch")
     user = relationship("User")
     escrow = relationship("Escrow")
+    
+    __table_args__ = (
+        Index('idx_stellar_transactions_watch_created', 'watch_id', 'created_at'),
+        Index('idx_stellar_transactions_asset_created', 'asset_code', 'asset_issuer', 'created_at'),
+    )
+
+class IngestionCursor(Base):
+    """
+    Posição da ingestão de operações do Horizon por conta (ver app/stellar_ingest.py)
+    """
+    __tablename__ = "ingestion_cursors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(String, unique=True, nullable=False)
+    paging_token = Column(String, nullable=False, default="")  # Última operação aplicada
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class EvaluationReport(Base):
     """
@@ -296,6 +418,13 @@ class EvaluationReport(Base):
     signature_timestamp = Column(DateTime)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_evaluation_reports_pdf_hash', 'pdf_hash'),
+        # Busca de fotos por hash (JSON contém): só o Postgres indexa a expressão
+        Index('idx_evaluation_reports_photos', text("(CAST(photos_hashes AS JSONB)) jsonb_path_ops"),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     # Relationships
     watch = relationship("Watch")
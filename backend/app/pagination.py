@@ -0,0 +1,137 @@
+"""
+Paginação por cursor (keyset) para listagens grandes.
+
+Em vez de OFFSET, cada página filtra a partir da última chave vista
+(valor de ordenação, id), de modo que páginas profundas custam o mesmo
+que a primeira e a ordem continua estável quando novos itens entram.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_, union_all
+
+# Limites padrão para parâmetros `limit` das listagens paginadas
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Header usado para devolver o cursor da próxima página sem mudar o corpo (lista)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class KeysetOrder:
+    """
+    Ordenação composta (coluna, id) usada para paginar por cursor.
+
+    `column` pode ser None para ordenar só por id. Valores nulos da coluna
+    sempre ficam no fim da listagem, em qualquer direção.
+    """
+
+    def __init__(self, name: str, id_column, column=None, descending: bool = False):
+        self.name = name
+        self.id_column = id_column
+        self.column = column
+        self.descending = descending
+
+    def id_order(self):
+        return self.id_column.desc() if self.descending else self.id_column.asc()
+
+    def column_order(self):
+        return self.column.desc() if self.descending else self.column.asc()
+
+    def order_by(self) -> List[Any]:
+        if self.column is None:
+            return [self.id_order()]
+        return [self.column_order().nulls_last(), self.id_order()]
+
+    def after_id(self, last_id: int):
+        return self.id_column < last_id if self.descending else self.id_column > last_id
+
+    def after(self, key: Any, last_id: int):
+        """Linhas com valor posteriores a (key, last_id); o bloco de nulos fica de fora"""
+        row = tuple_(self.column, self.id_column)
+        return row < (key, last_id) if self.descending else row > (key, last_id)
+
+    def key_of(self, item: Any) -> Any:
+        if self.column is None:
+            return None
+        return getattr(item, self.column.key)
+
+
+def encode_cursor(order: KeysetOrder, key: Any, last_id: int) -> str:
+    if isinstance(key, datetime):
+        payload = {"s": order.name, "k": key.isoformat(), "t": "dt", "id": last_id}
+    else:
+        payload = {"s": order.name, "k": key, "id": last_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(order: KeysetOrder, cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = payload["k"]
+        if payload.get("t") == "dt" and key is not None:
+            key = datetime.fromisoformat(key)
+        last_id = int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if payload.get("s") != order.name:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    return key, last_id
+
+
+def paginate(query, order: KeysetOrder, limit: int, cursor: Optional[str] = None):
+    """
+    Aplica ordenação, cursor e limite a um `select()`.
+
+    Busca `limit + 1` linhas para saber se existe próxima página; use
+    `split_page` no resultado.
+
+    Com coluna de ordenação, as linhas com valor e o bloco de nulos são
+    dois ramos de um UNION ALL, cada um com um filtro que o índice
+    composto (status, coluna, id) atende sozinho. Um `OR coluna IS NULL`
+    na mesma consulta impediria o índice de servir as páginas profundas.
+    """
+    key = last_id = None
+    if cursor:
+        key, last_id = decode_cursor(order, cursor)
+
+    if order.column is None:
+        if cursor:
+            query = query.filter(order.after_id(last_id))
+        return query.order_by(order.id_order()).limit(limit + 1)
+
+    nulls = query.filter(order.column.is_(None))
+    if cursor and key is None:
+        # Já estamos no bloco de nulos, que é ordenado apenas por id
+        return nulls.filter(order.after_id(last_id)).order_by(order.id_order()).limit(limit + 1)
+
+    values = query.filter(order.column.isnot(None))
+    if cursor:
+        values = values.filter(order.after(key, last_id))
+    branches = union_all(
+        select(values.order_by(order.column_order(), order.id_order()).limit(limit + 1).subquery()),
+        select(nulls.order_by(order.id_order()).limit(limit + 1).subquery()),
+    ).subquery("page")
+    column, id_column = branches.c[order.column.key], branches.c[order.id_column.key]
+    return (
+        select(branches)
+        .order_by((column.desc() if order.descending else column.asc()).nulls_last(),
+                  id_column.desc() if order.descending else id_column.asc())
+        .limit(limit + 1)
+    )
+
+
+def split_page(rows: List[Any], order: KeysetOrder, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Separa a página atual e gera o cursor da próxima (ou None no fim)"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(order, order.key_of(last), getattr(last, order.id_column.key))
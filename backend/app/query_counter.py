@@ -0,0 +1,73 @@
+"""
+Contagem das consultas SQL emitidas num trecho de código.
+
+Escuta `before_cursor_execute` em todas as Engines (primário, réplicas e
+as engines síncronas por trás das AsyncEngines), então conta tanto rotas
+síncronas quanto assíncronas. Serve para fixar um orçamento de consultas
+por endpoint e pegar N+1 (lazy load por item) antes de ir para produção:
+
+    with assert_max_queries(3):
+        client.get("/auth/transaction-history", headers=...)
+
+Ver tests/test_query_budget.py para os orçamentos dos endpoints.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """Conta (e guarda) as consultas executadas enquanto está ativo"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self.parameters: List[Any] = []
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements.append(statement)
+            self.parameters.append(parameters)
+
+    def start(self):
+        event.listen(Engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def stop(self):
+        event.remove(Engine, "before_cursor_execute", self._on_execute)
+
+    def report(self) -> str:
+        return "\n".join(f"  {i}. {' '.join(s.split())[:200]}" for i, s in enumerate(self.statements, 1))
+
+
+@contextmanager
+def count_queries():
+    """Contexto que devolve um QueryCounter com as consultas do bloco"""
+    counter = QueryCounter().start()
+    try:
+        yield counter
+    finally:
+        counter.stop()
+
+
+@contextmanager
+def assert_max_queries(budget: int, label: str = "bloco"):
+    """Falha com QueryBudgetExceeded se o bloco fizer mais de `budget` consultas"""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > budget:
+        raise QueryBudgetExceeded(
+            f"{label}: {counter.count} consultas (orçamento {budget})\n{counter.report()}"
+        )
@@ -0,0 +1,190 @@
+"""
+Roteamento de leituras para réplicas do banco.
+
+    DATABASE_REPLICA_URLS=postgresql://ro1/db,postgresql://ro2/db
+
+- As rotas GET usam `get_read_db` / `get_async_read_db` (app/database.py),
+  que escolhem a próxima réplica saudável em round-robin. Sem réplicas
+  configuradas (ou com todas fora do ar), a leitura vai para o primário.
+- Health check em segundo plano a cada REPLICA_HEALTH_INTERVAL segundos:
+  `SELECT 1` e, no Postgres, o atraso de replicação; réplica que falha ou
+  passa de REPLICA_MAX_LAG_SECONDS sai do rodízio até o próximo check
+  bem-sucedido. Uma réplica nova só recebe leituras depois do primeiro
+  check; um erro de conexão durante uma requisição a tira na hora.
+- Read-your-writes: depois de qualquer requisição de escrita (POST, PUT,
+  PATCH, DELETE) de um usuário autenticado, as leituras dele vão para o
+  primário por READ_YOUR_WRITES_SECONDS, para não ver dados de antes da
+  própria escrita. A marcação é por processo.
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.auth import decode_token
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "10"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Atraso de replicação em segundos; 0 no primário ou com o WAL todo aplicado
+_PG_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    """Uma réplica: engines síncrona e assíncrona e o estado do último health check"""
+
+    def __init__(self, url: str, engine, async_engine=None):
+        self.url = url
+        self.engine = engine
+        self.async_engine = async_engine
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.async_session_factory = None
+        if async_engine is not None:
+            from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+            self.async_session_factory = async_sessionmaker(
+                async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        # Só entra no rodízio depois do primeiro health check bem-sucedido
+        self.healthy = False
+        self.lag_seconds = 0.0
+        self.last_error: Optional[str] = "ainda não verificada"
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def check(self, max_lag: float = REPLICA_MAX_LAG_SECONDS) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    self.lag_seconds = float(conn.execute(_PG_LAG_SQL).scalar() or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.lag_seconds = 0.0
+        except Exception as e:
+            self.mark_down(e)
+            return False
+        if self.lag_seconds > max_lag:
+            self.mark_down(f"atraso de replicação de {self.lag_seconds:.1f}s")
+            return False
+        self.healthy = True
+        self.last_error = None
+        return True
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.last_error = str(error)
+
+
+class ReplicaSet:
+    """Réplicas em round-robin, com health check periódico em uma thread daemon"""
+
+    def __init__(self, urls: List[str], engine_factory: Callable, async_engine_factory: Optional[Callable] = None,
+                 health_interval: float = REPLICA_HEALTH_INTERVAL):
+        self.replicas = [
+            Replica(url, engine_factory(url), async_engine_factory(url) if async_engine_factory else None)
+            for url in urls
+        ]
+        self.health_interval = health_interval
+        self._counter = itertools.count()
+        self._checker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self) -> Optional[Replica]:
+        """Próxima réplica saudável, ou None para usar o primário"""
+        if not self.replicas:
+            return None
+        self._ensure_checker()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._counter) % len(self.replicas)]
+            if replica.healthy:
+                return replica
+        return None
+
+    def check_all(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def status(self) -> List[Dict]:
+        return [{"replica": r.name, "healthy": r.healthy, "lag_seconds": r.lag_seconds, "error": r.last_error}
+                for r in self.replicas]
+
+    def _ensure_checker(self):
+        if self._checker is not None:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._check_loop, name="replica-health", daemon=True)
+                self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            self.check_all()
+            if self._stop.wait(self.health_interval):
+                return
+
+    def dispose(self):
+        self._stop.set()
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    async def dispose_async(self):
+        self.dispose()
+        for replica in self.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+
+
+class WritePins:
+    """Usuários que escreveram há pouco e por isso leem do primário"""
+
+    def __init__(self, window: float = READ_YOUR_WRITES_SECONDS):
+        self.window = window
+        self._until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def pin(self, user_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.window
+            if len(self._until) > 10000:
+                self._until = {k: v for k, v in self._until.items() if v > now}
+
+    def is_pinned(self, user_id: Optional[str]) -> bool:
+        if user_id is None:
+            return False
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._until.clear()
+
+
+def request_user_id(request) -> Optional[str]:
+    """`sub` do token Bearer da requisição, sem exigir autenticação"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return str(decode_token(token)["sub"])
+    except Exception:
+        return None
@@ -0,0 +1,247 @@
+"""
+Pipeline de upload de laudos e evidências (fotos, PDF) para o S3.
+
+- Hash SHA-256 calculado durante a leitura: o conteúdo passa uma única vez
+  pelo hashlib enquanto é copiado para um buffer temporário (memória até
+  SPOOL_MAX_BYTES, depois disco).
+- Chaves endereçadas por conteúdo. O upload é pulado se o hash já consta
+  em um `EvaluationReport` (report_hash, pdf_hash ou photos_hashes, gravado
+  no registro do relógio) ou se a chave já existe no bucket (HEAD): uma
+  evidência enviada e ainda não registrada também não sobe de novo.
+- Arquivos grandes vão em multipart (`upload_fileobj` + TransferConfig),
+  com partes enviadas em paralelo.
+- As versões assíncronas rodam tudo (leitura, consulta ao banco, HEAD e
+  envio) em um ThreadPoolExecutor limitado (REPORT_UPLOAD_WORKERS), fora do
+  event loop. A consulta usa uma Session própria aberta no thread do pool,
+  nunca a da requisição.
+"""
+
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Optional
+
+from sqlalchemy import String, cast, exists, func, or_, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from app.metrics import s3_upload
+from app.models import EvaluationReport
+
+CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+MULTIPART_CHUNK_SIZE = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024)))
+MAX_EVIDENCE_BYTES = int(os.getenv("MAX_EVIDENCE_BYTES", str(100 * 1024 * 1024)))
+REPORT_UPLOAD_WORKERS = int(os.getenv("REPORT_UPLOAD_WORKERS", "4"))
+
+EVIDENCE_KINDS = {"photo", "pdf"}
+
+
+def serialize_report(report_data: Dict) -> bytes:
+    """JSON determinístico do laudo (mesmo laudo, mesmos bytes, mesmo hash)"""
+    return json.dumps(report_data, sort_keys=True, separators=(',', ':')).encode()
+
+
+def spool_and_hash(source: BinaryIO, max_bytes: int = MAX_EVIDENCE_BYTES):
+    """
+    Copia `source` para um arquivo temporário calculando o SHA-256 na mesma
+    passada. Retorna (arquivo posicionado no início, hash, tamanho).
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    try:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"Arquivo excede {max_bytes} bytes")
+            digest.update(chunk)
+            spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+
+def evidence_key(content_hash: str, kind: str, content_type: Optional[str] = None) -> str:
+    if kind == "pdf":
+        extension = ".pdf"
+    else:
+        extension = mimetypes.guess_extension(content_type or "") or ""
+    return f"evidencias/{kind}/{content_hash}{extension}"
+
+
+def _photo_hash_matches(db: Session, content_hash: str):
+    """Condição "o hash está em photos_hashes", no formato que o banco indexa"""
+    photos = EvaluationReport.photos_hashes
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Casa com o índice GIN idx_evaluation_reports_photos
+        return cast(photos, JSONB).contains([content_hash])
+    if dialect == "sqlite":
+        values = func.json_each(photos).table_valued("value")
+        return exists(select(1).select_from(values).where(values.c.value == content_hash))
+    return cast(photos, String).contains(f'"{content_hash}"')
+
+
+def find_existing(db: Session, content_hash: str) -> Optional[EvaluationReport]:
+    """Laudo já registrado com este hash (do próprio laudo, do PDF ou de uma foto)"""
+    return db.query(EvaluationReport).filter(or_(
+        EvaluationReport.report_hash == content_hash,
+        EvaluationReport.pdf_hash == content_hash,
+        _photo_hash_matches(db, content_hash),
+    )).first()
+
+
+class ReportUploader:
+    """Uploads de laudos e evidências para um bucket S3"""
+
+    def __init__(self, s3_client, bucket_name: str, max_workers: int = REPORT_UPLOAD_WORKERS,
+                 session_factory=None):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+        self._session_factory = session_factory
+        # boto3/botocore importados só aqui: quem usa os contratos Stellar sem S3 não paga por eles
+        from boto3.s3.transfer import TransferConfig
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=4,
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="s3-upload")
+        return self._executor
+
+    @property
+    def session_factory(self):
+        """Sessões das versões assíncronas (padrão: SessionLocal)"""
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _result(self, content_hash: str, key: str, size: int, skipped: bool) -> Dict:
+        return {"sha256": content_hash, "bucket": self.bucket_name, "key": key,
+                "size": size, "skipped": skipped}
+
+    def _in_bucket(self, key: str) -> bool:
+        """A chave já existe no bucket (HEAD; 404 = não)"""
+        from botocore.exceptions import ClientError
+
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _put_report(self, body: bytes, file_key: str, report_hash: str, report_data: Dict, watch_serial: str) -> Dict:
+        from botocore.exceptions import ClientError
+
+        try:
+            with s3_upload("report"):
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Body=body,
+                    ContentType='application/json',
+                    Metadata={
+                        'watch_serial': watch_serial,
+                        'evaluator_id': str(report_data['evaluator_id']),
+                        'timestamp': report_data['timestamp'],
+                        'sha256': report_hash,
+                    }
+                )
+        except ClientError as e:
+            raise Exception(f"Erro ao fazer upload do laudo: {e}")
+        return self._result(report_hash, file_key, len(body), skipped=False)
+
+    def upload_report(self, report_data: Dict, watch_serial: str, db: Optional[Session] = None) -> Dict:
+        """
+        Serializa, calcula o hash e envia o laudo (JSON). Pula o envio se o
+        laudo já foi registrado em `evaluation_reports` ou já está no bucket.
+        """
+        body = serialize_report(report_data)
+        report_hash = hashlib.sha256(body).hexdigest()
+        existing = find_existing(db, report_hash) if db is not None else None
+        if existing is not None and existing.report_hash == report_hash:
+            return self._result(report_hash, existing.s3_key, len(body), skipped=True)
+
+        file_key = f"laudos/{watch_serial}/{report_hash}.json"
+        if self._in_bucket(file_key):
+            return self._result(report_hash, file_key, len(body), skipped=True)
+        return self._put_report(body, file_key, report_hash, report_data, watch_serial)
+
+    def _check_kind(self, kind: str):
+        if kind not in EVIDENCE_KINDS:
+            raise ValueError(f"Tipo de evidência inválido: {kind}")
+
+    def _put_file(self, spool, file_key: str, content_hash: str, size: int, content_type: Optional[str],
+                  kind: str) -> Dict:
+        from botocore.exceptions import ClientError
+
+        extra_args = {"Metadata": {"sha256": content_hash}}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        try:
+            with s3_upload(kind):
+                self.s3_client.upload_fileobj(spool, self.bucket_name, file_key,
+                                              ExtraArgs=extra_args, Config=self.transfer_config)
+        except ClientError as e:
+            raise Exception(f"Erro ao fazer upload da evidência: {e}")
+        return self._result(content_hash, file_key, size, skipped=False)
+
+    def upload_file(self, source: BinaryIO, kind: str, content_type: Optional[str] = None,
+                    db: Optional[Session] = None) -> Dict:
+        """
+        Envia uma evidência (foto ou PDF). O hash é calculado na mesma
+        leitura que prepara o envio; acima de MULTIPART_THRESHOLD o S3
+        recebe multipart.
+        """
+        self._check_kind(kind)
+        spool, content_hash, size = spool_and_hash(source)
+        with spool:
+            file_key = evidence_key(content_hash, kind, content_type)
+            registered = db is not None and find_existing(db, content_hash) is not None
+            if registered or self._in_bucket(file_key):
+                return self._result(content_hash, file_key, size, skipped=True)
+            return self._put_file(spool, file_key, content_hash, size, content_type, kind)
+
+    def _with_session(self, upload, *args) -> Dict:
+        """Roda um upload síncrono com uma Session própria (no thread do pool)"""
+        db = self.session_factory()
+        try:
+            return upload(*args, db=db)
+        finally:
+            db.close()
+
+    async def upload_report_async(self, report_data: Dict, watch_serial: str) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._with_session, self.upload_report,
+                                          report_data, watch_serial)
+
+    async def upload_file_async(self, source: BinaryIO, kind: str, content_type: Optional[str] = None) -> Dict:
+        self._check_kind(kind)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._with_session, self.upload_file,
+                                          source, kind, content_type)
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
 from app.schemas import StoreCreate, StoreOut, EvaluatorCreate, EvaluatorOut, AdminDashboard, OwnershipTransferOut
 from app.auth import require_role
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import Store, Evaluator, User, Commission, ResellOffer, Watch, OwnershipTransfer
+from app import dashboard, stats
+from app.db_metrics import SLOW_QUERY_MS, endpoint_db_stats, recent_slow_queries
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -41,7 +43,7 @@ def create_store(
 @router.get("/stores")
 def list_stores(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     try:
         stores = db.query(Store).all()
@@ -88,7 +90,7 @@ def create_evaluator(
 @router.get("/evaluators")
 def list_evaluators(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     try:
         evaluators = db.query(Evaluator).filter(Evaluator.active == True).all()
@@ -111,43 +113,19 @@ def list_evaluators(
 @router.get("/dashboard", response_model=AdminDashboard)
 def admin_dashboard(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     try:
-        # Total de usuários por tipo
-        total_users = db.query(User).count()
-        admin_users = db.query(User).filter(User.role == "admin").count()
-        store_users = db.query(User).filter(User.role == "store").count()
-        regular_users = db.query(User).filter(User.role == "user").count()
-        evaluator_users = db.query(User).filter(User.role == "evaluator").count()
-        
-        # Total de lojas cadastradas (informação importante!)
-        total_stores = db.query(Store).count()
-        active_stores = db.query(Store).filter(Store.credentialed == True).count()
-        
-        # Total de avaliadores ativos
-        total_evaluators = db.query(Evaluator).filter(Evaluator.active == True).count()
+        # Agregados pré-computados em marketplace_stats (ver app/dashboard.py)
+        snapshot = dashboard.snapshot(db)
+        users = dashboard.users_summary(snapshot)
+        watches = dashboard.watches_by_status(snapshot)
+        totals = dashboard.platform_totals(db, snapshot)
         
-        # Total de relógios por status
-        total_watches = db.query(Watch).count()
-        registered_watches = db.query(Watch).filter(Watch.status == "registered").count()
-        tokenized_watches = db.query(Watch).filter(Watch.status == "tokenized").count()
-        for_sale_watches = db.query(Watch).filter(Watch.status == "for_sale").count()
-        sold_watches = db.query(Watch).filter(Watch.status == "sold").count()
-        
-        # Total de transações e receita
-        total_transactions = db.query(OwnershipTransfer).count()
-        
-        # Calcular saldo total em BRL dos usuários
-        total_platform_balance = db.query(func.sum(User.balance_brl)).scalar() or 0
-        total_platform_xlm = db.query(func.sum(User.balance_xlm)).scalar() or 0
-        
-        # Calcular receita total das comissões
-        total_commission_revenue = 0
-        commissions = db.query(Commission).all()
-        for comm in commissions:
-            if comm.amount_brl:
-                total_commission_revenue += comm.amount_brl
+        total_watches = watches["total"]
+        sold_watches = watches["sold"]
+        total_transactions = totals["total_transfers"]
+        total_commission_revenue = totals["total_commissions"]
         
         # Calcular receita dos pagamentos (simulação)
         # Para MVP, vamos simular com base no número de relógios vendidos
@@ -156,20 +134,8 @@ def admin_dashboard(
         card_fee_revenue = sold_watches * 3325.0  # Taxa cartão média
         total_payment_fees = pix_fee_revenue + card_fee_revenue
         
-        # Ofertas pendentes
-        pending_disputes = db.query(ResellOffer).filter(ResellOffer.status == "pending").count()
-        
         # Comissões recentes detalhadas
-        recent_commissions = []
-        recent_comms = db.query(Commission).order_by(Commission.created_at.desc()).limit(5).all()
-        for comm in recent_comms:
-            recent_commissions.append({
-                "id": comm.id,
-                "amount_brl": comm.amount_brl or 0,
-                "description": comm.description or "Comissão de transação",
-                "transaction_type": comm.transaction_type or "sale",
-                "created_at": comm.created_at.isoformat()
-            })
+        recent_commissions = dashboard.recent_commissions(db)
         
         # Se não há comissões, criar algumas simuladas para demonstração
         if not recent_commissions:
@@ -185,22 +151,19 @@ def admin_dashboard(
         
         return AdminDashboard(
             total_commissions=total_commission_revenue,
-            pending_disputes=pending_disputes,
+            pending_disputes=totals["pending_offers"],
             total_watches=total_watches,
             total_transactions=total_transactions,
             recent_commissions=recent_commissions,
             # Novas informações
-            total_stores=total_stores,
-            active_stores=active_stores,
-            total_evaluators=total_evaluators,
-            platform_balance_brl=total_platform_balance,
-            platform_balance_xlm=total_platform_xlm,
+            total_stores=totals["total_stores"],
+            active_stores=totals["active_stores"],
+            total_evaluators=totals["active_evaluators"],
+            platform_balance_brl=users["balance_brl"],
+            platform_balance_xlm=users["balance_xlm"],
             users_by_role={
-                "admin": admin_users,
-                "store": store_users,
-                "evaluator": evaluator_users,
-                "user": regular_users,
-                "total": total_users
+                **users["by_role"],
+                "total": users["total"]
             }
         )
         
@@ -240,29 +203,27 @@ def admin_dashboard(
 @router.get("/dashboard/detailed")
 def detailed_dashboard(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retorna informações detalhadas do marketplace
     """
     try:
+        snapshot = dashboard.snapshot(db)
+        users = dashboard.users_summary(snapshot)
+        totals = dashboard.platform_totals(db, snapshot)
+        
         # Usuários por tipo
         users_data = {
-            "total": db.query(User).count(),
-            "admins": db.query(User).filter(User.role == "admin").count(),
-            "stores": db.query(User).filter(User.role == "store").count(), 
-            "users": db.query(User).filter(User.role == "user").count(),
-            "evaluators": db.query(User).filter(User.role == "evaluator").count()
+            "total": users["total"],
+            "admins": users["by_role"]["admin"],
+            "stores": users["by_role"]["store"],
+            "users": users["by_role"]["user"],
+            "evaluators": users["by_role"]["evaluator"]
         }
         
         # Relógios por status
-        watches_data = {
-            "total": db.query(Watch).count(),
-            "registered": db.query(Watch).filter(Watch.status == "registered").count(),
-            "tokenized": db.query(Watch).filter(Watch.status == "tokenized").count(),
-            "for_sale": db.query(Watch).filter(Watch.status == "for_sale").count(),
-            "sold": db.query(Watch).filter(Watch.status == "sold").count()
-        }
+        watches_data = dashboard.watches_by_status(snapshot)
         
         # Receita e pagamentos
         sold_count = watches_data["sold"]
@@ -291,9 +252,9 @@ def detailed_dashboard(
         
         # Transações
         transactions_data = {
-            "total_transfers": db.query(OwnershipTransfer).count(),
-            "sales": db.query(OwnershipTransfer).filter(OwnershipTransfer.type == "sale").count(),
-            "gifts": db.query(OwnershipTransfer).filter(OwnershipTransfer.type == "gift").count()
+            "total_transfers": totals["total_transfers"],
+            "sales": totals["sales"],
+            "gifts": totals["gifts"]
         }
         
         return {
@@ -341,14 +302,14 @@ def toggle_store_credential(
 @router.get("/transfers", response_model=List[OwnershipTransferOut])
 def list_transfers(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     return db.query(OwnershipTransfer).order_by(OwnershipTransfer.created_at.desc()).all()
 
 @router.get("/users")
 def list_all_users(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Lista todos os usuários do sistema"""
     try:
@@ -373,54 +334,29 @@ def list_all_users(
 @router.get("/dashboard/sales")
 def sales_dashboard(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Dashboard específico de vendas com métricas detalhadas"""
     try:
         from datetime import datetime, timedelta
         now = datetime.utcnow()
-        last_30_days = now - timedelta(days=30)
-        last_7_days = now - timedelta(days=7)
-        
-        # Vendas por período
-        total_sales = db.query(OwnershipTransfer).filter(
-            OwnershipTransfer.type == "sale"
-        ).count()
+        last_30_days = stats.day_bucket(now - timedelta(days=30))
+        last_7_days = stats.day_bucket(now - timedelta(days=7))
         
-        sales_last_30_days = db.query(OwnershipTransfer).filter(
-            OwnershipTransfer.type == "sale",
-            OwnershipTransfer.created_at >= last_30_days
-        ).count()
+        # Totais e buckets diários pré-computados (ver app/stats.py)
+        total_sales, total_revenue = stats.read_totals(db).get("transfers.sale", (0, 0.0))
+        daily = stats.read_buckets(db, "day", ["transfers.sale"], since=last_30_days)
         
-        sales_last_7_days = db.query(OwnershipTransfer).filter(
-            OwnershipTransfer.type == "sale",
-            OwnershipTransfer.created_at >= last_7_days
-        ).count()
-        
-        # Revenue total e por período
-        total_revenue = db.query(func.sum(OwnershipTransfer.price_brl)).filter(
-            OwnershipTransfer.type == "sale"
-        ).scalar() or 0
-        
-        revenue_last_30_days = db.query(func.sum(OwnershipTransfer.price_brl)).filter(
-            OwnershipTransfer.type == "sale",
-            OwnershipTransfer.created_at >= last_30_days
-        ).scalar() or 0
+        # Vendas e receita por período
+        sales_last_30_days = sum(count for count, _ in daily.values())
+        sales_last_7_days = sum(count for (_, day), (count, _) in daily.items() if day >= last_7_days)
+        revenue_last_30_days = sum(amount for _, amount in daily.values())
         
         # Top marcas vendidas
-        top_brands = db.query(
-            Watch.brand,
-            func.count(OwnershipTransfer.id).label('sales_count')
-        ).join(OwnershipTransfer).filter(
-            OwnershipTransfer.type == "sale"
-        ).group_by(Watch.brand).order_by(
-            func.count(OwnershipTransfer.id).desc()
-        ).limit(5).all()
+        top_brands = stats.top_sales_brands(db, limit=5)
         
         # Preço médio de vendas
-        avg_sale_price = db.query(func.avg(OwnershipTransfer.price_brl)).filter(
-            OwnershipTransfer.type == "sale"
-        ).scalar() or 0
+        avg_sale_price = total_revenue / total_sales if total_sales else 0
         
         return {
             "total_sales": total_sales,
@@ -447,75 +383,46 @@ def sales_dashboard(
 
 @router.get("/reports/monthly")
 def monthly_reports(
+    months: int = Query(6, ge=1, le=60, description="Quantidade de meses de calendário no relatório"),
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Relatórios mensais detalhados"""
     try:
-        from datetime import datetime, timedelta
-        import calendar
+        from datetime import datetime
         
         now = datetime.utcnow()
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Dados do mês atual
-        current_month_sales = db.query(OwnershipTransfer).filter(
-            OwnershipTransfer.type == "sale",
-            OwnershipTransfer.created_at >= current_month_start
-        ).count()
-        
-        current_month_revenue = db.query(func.sum(OwnershipTransfer.price_brl)).filter(
-            OwnershipTransfer.type == "sale",
-            OwnershipTransfer.created_at >= current_month_start
-        ).scalar() or 0
-        
-        # Novos usuários este mês
-        new_users_this_month = db.query(User).filter(
-            User.created_at >= current_month_start
-        ).count()
-        
-        # Novas lojas este mês
-        new_stores_this_month = db.query(Store).filter(
-            Store.created_at >= current_month_start
-        ).count()
         
-        # Relógios adicionados este mês
-        new_watches_this_month = db.query(Watch).filter(
-            Watch.created_at >= current_month_start
-        ).count()
+        # Meses de calendário (do atual para o mais antigo) e todos os buckets
+        # mensais da janela em uma única consulta (ver app/stats.py)
+        month_starts = stats.calendar_months(now, months)
+        series = {
+            "sales": "transfers.sale",
+            "new_users": "users.new",
+            "new_stores": "stores.new",
+            "new_watches": "watches.new",
+        }
+        buckets = stats.read_buckets(db, "month", series.values(), since=stats.month_bucket(month_starts[-1]))
         
-        # Dados dos últimos 6 meses para comparação
         monthly_data = []
-        for i in range(6):
-            # Calcular início e fim do mês
-            if i == 0:
-                month_start = current_month_start
-                month_end = now
-            else:
-                target_date = current_month_start - timedelta(days=30*i)
-                month_start = target_date.replace(day=1)
-                # Último dia do mês
-                last_day = calendar.monthrange(target_date.year, target_date.month)[1]
-                month_end = target_date.replace(day=last_day, hour=23, minute=59, second=59)
-            
-            month_sales = db.query(OwnershipTransfer).filter(
-                OwnershipTransfer.type == "sale",
-                OwnershipTransfer.created_at >= month_start,
-                OwnershipTransfer.created_at <= month_end
-            ).count()
-            
-            month_revenue = db.query(func.sum(OwnershipTransfer.price_brl)).filter(
-                OwnershipTransfer.type == "sale",
-                OwnershipTransfer.created_at >= month_start,
-                OwnershipTransfer.created_at <= month_end
-            ).scalar() or 0
-            
-            monthly_data.append({
-                "month": month_start.strftime("%Y-%m"),
+        for month_start in month_starts:
+            month = stats.month_bucket(month_start)
+            row = {
+                "month": month,
                 "month_name": month_start.strftime("%B %Y"),
-                "sales": month_sales,
-                "revenue": month_revenue
-            })
+            }
+            for name, metric in series.items():
+                row[name] = buckets.get((metric, month), (0, 0.0))[0]
+            row["revenue"] = buckets.get(("transfers.sale", month), (0, 0.0))[1]
+            monthly_data.append(row)
+        
+        # Dados do mês atual
+        current = monthly_data[0]
+        current_month_sales = current["sales"]
+        current_month_revenue = current["revenue"]
+        new_users_this_month = current["new_users"]
+        new_stores_this_month = current["new_stores"]
+        new_watches_this_month = current["new_watches"]
         
         return {
             "current_month": {
@@ -541,3 +448,23 @@ def monthly_reports(
             "monthly_trends": [],
             "generated_at": datetime.utcnow().isoformat()
         }
+
+@router.get("/db-stats")
+def db_stats(
+    limit: int = Query(20, ge=1, le=200, description="Quantidade de rotas no ranking"),
+    current_user = Depends(require_role(["admin"]))
+):
+    """Rotas que mais gastam tempo de banco e consultas lentas recentes (deste processo)"""
+    return {
+        "since": endpoint_db_stats.since.isoformat(),
+        "slow_query_ms": SLOW_QUERY_MS,
+        "endpoints": endpoint_db_stats.top(limit),
+        "slow_queries": list(reversed(recent_slow_queries))
+    }
+
+@router.delete("/db-stats")
+def reset_db_stats(current_user = Depends(require_role(["admin"]))):
+    """Zera os totais por rota e a lista de consultas lentas"""
+    endpoint_db_stats.reset()
+    recent_slow_queries.clear()
+    return {"message": "Estatísticas de banco zeradas"}
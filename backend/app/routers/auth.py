@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import UserCreate, LoginPayload, UserOut, UserProfile
 from app.auth import get_password_hash, verify_password, create_access_token, require_role
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
 from app.models import User, Store, OwnershipTransfer, Watch
-from stellar_sdk import Keypair
+from app.pagination import MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -16,6 +19,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email já cadastrado")
     
     # Criar par de chaves Stellar
+    from stellar_sdk import Keypair
     stellar_keypair = Keypair.random()
     
     # Criar usuário
@@ -69,8 +73,8 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @router.get("/me", response_model=UserOut)
-def get_current_user(current_user = Depends(require_role(["admin", "store", "evaluator", "user"])), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == int(current_user["sub"])).first()
+async def get_current_user(current_user = Depends(require_role(["admin", "store", "evaluator", "user"])), db: AsyncSession = Depends(get_async_read_db)):
+    user = await db.get(User, int(current_user["sub"]))
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     return user
@@ -139,37 +143,70 @@ def get_user_profile(current_user = Depends(require_role(["admin", "store", "eva
         "total_stores_count": total_stores_count
     }
 
+def _transfer_watch(t):
+    watch = t.watch
+    return {
+        "brand": watch.brand,
+        "model": watch.model,
+        "serial_number": watch.serial_number
+    } if watch else None
+
+def _page(query, limit: Optional[int], offset: int):
+    """Uma página da consulta e se há mais itens depois dela (busca limit + 1); sem limit, tudo"""
+    if limit is None:
+        return query.offset(offset).all(), False
+    rows = query.offset(offset).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
 @router.get("/transaction-history")
 def get_user_transaction_history(
+    start_date: Optional[date] = Query(None, description="Transferências a partir deste dia (inclusive)"),
+    end_date: Optional[date] = Query(None, description="Transferências até este dia (inclusive)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Itens por lista (sem limit: todos)"),
+    offset: int = Query(0, ge=0, description="Itens a pular em cada lista"),
     current_user = Depends(require_role(["user", "store"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Histórico de transações do usuário"""
+    """
+    Histórico de transações do usuário, paginado.
+
+    `limit`/`offset` valem para cada lista (compras, vendas e relógios);
+    `has_more` indica quais listas têm próxima página. Sem `limit` as
+    listas vêm completas, como antes da paginação. O período filtra
+    compras e vendas. São sempre 3 consultas: o relógio de cada
+    transferência vem no mesmo SELECT (joinedload), sem lazy load por item.
+    """
     user_id = int(current_user["sub"])
-    
-    # Buscar transferências como comprador e vendedor
-    transfers_as_buyer = db.query(OwnershipTransfer).filter(
-        OwnershipTransfer.to_user_id == user_id
-    ).order_by(OwnershipTransfer.created_at.desc()).all()
-    
-    transfers_as_seller = db.query(OwnershipTransfer).filter(
-        OwnershipTransfer.from_user_id == user_id
-    ).order_by(OwnershipTransfer.created_at.desc()).all()
-    
-    # Buscar relógios comprados
-    owned_watches = db.query(Watch).filter(
-        Watch.current_owner_user_id == user_id
-    ).all()
-    
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date deve ser anterior a end_date")
+
+    def transfers(user_column):
+        query = db.query(OwnershipTransfer).options(
+            joinedload(OwnershipTransfer.watch).load_only(Watch.brand, Watch.model, Watch.serial_number)
+        ).filter(user_column == user_id)
+        if start_date:
+            query = query.filter(OwnershipTransfer.created_at >= datetime.combine(start_date, time.min))
+        if end_date:
+            query = query.filter(OwnershipTransfer.created_at < datetime.combine(end_date + timedelta(days=1), time.min))
+        return query.order_by(OwnershipTransfer.created_at.desc(), OwnershipTransfer.id.desc())
+
+    transfers_as_buyer, more_purchases = _page(transfers(OwnershipTransfer.to_user_id), limit, offset)
+    transfers_as_seller, more_sales = _page(transfers(OwnershipTransfer.from_user_id), limit, offset)
+
+    # Relógios do usuário: só as colunas devolvidas
+    owned_watches, more_owned = _page(
+        db.query(Watch.id, Watch.brand, Watch.model, Watch.serial_number,
+                 Watch.current_value_brl, Watch.status, Watch.nft_code)
+        .filter(Watch.current_owner_user_id == user_id)
+        .order_by(Watch.id),
+        limit, offset
+    )
+
     return {
         "purchases": [{
             "id": t.id,
             "watch_id": t.watch_id,
-            "watch": {
-                "brand": t.watch.brand,
-                "model": t.watch.model,
-                "serial_number": t.watch.serial_number
-            } if t.watch else None,
+            "watch": _transfer_watch(t),
             "from_user_id": t.from_user_id,
             "price_brl": t.price_brl,
             "type": t.type,
@@ -179,24 +216,17 @@ def get_user_transaction_history(
         "sales": [{
             "id": t.id,
             "watch_id": t.watch_id,
-            "watch": {
-                "brand": t.watch.brand,
-                "model": t.watch.model,
-                "serial_number": t.watch.serial_number
-            } if t.watch else None,
+            "watch": _transfer_watch(t),
             "to_user_id": t.to_user_id,
             "price_brl": t.price_brl,
             "type": t.type,
             "stellar_tx_hash": t.stellar_tx_hash,
             "created_at": t.created_at
         } for t in transfers_as_seller],
-        "owned_watches": [{
-            "id": w.id,
-            "brand": w.brand,
-            "model": w.model,
-            "serial_number": w.serial_number,
-            "current_value_brl": w.current_value_brl,
-            "status": w.status,
-            "nft_code": w.nft_code
-        } for w in owned_watches]
+        "owned_watches": [dict(w._mapping) for w in owned_watches],
+        "has_more": {
+            "purchases": more_purchases,
+            "sales": more_sales,
+            "owned_watches": more_owned
+        }
     }
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List
 from app.schemas import EvaluationCreate, EvaluationOut
 from app.auth import require_role
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.cache import invalidate_catalog
 from app.models import Evaluation, Watch, Evaluator, Notification, Commission, Store, User
 from app.routers.notifications import create_notification
 
@@ -12,7 +13,7 @@ router = APIRouter(prefix="/evaluations", tags=["evaluations"])
 @router.get("/evaluators")
 def get_available_evaluators(
     current_user = Depends(require_role(["user", "store", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Listar avaliadores disponíveis para solicitação de avaliação"""
     evaluators = db.query(Evaluator).filter(Evaluator.active == True).all()
@@ -91,6 +92,31 @@ def request_evaluation(
         print(f"Erro interno na solicitação de avaliação: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
+@router.post("/evidence")
+async def upload_evidence(
+    file: UploadFile = File(...),
+    kind: str = Form(...),
+    current_user = Depends(require_role(["evaluator", "admin"]))
+):
+    """
+    Envia foto ou PDF do laudo para o S3 e devolve o SHA-256, a ser usado
+    em photos_hashes / pdf_hash. Conteúdo já registrado ou já enviado não é
+    reenviado; leitura, consulta ao banco e envio rodam no pool de upload.
+    """
+    if kind not in ("photo", "pdf"):
+        raise HTTPException(status_code=400, detail="kind deve ser 'photo' ou 'pdf'")
+    
+    from app.stellar_contracts import get_stellar_contracts
+    uploads = get_stellar_contracts().get_watch_registration().uploads
+    try:
+        return await uploads.upload_file_async(file.file, kind, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    finally:
+        await file.close()
+
 @router.put("/{evaluation_id}/complete")
 def complete_evaluation(
     evaluation_id: int,
@@ -129,6 +155,7 @@ def complete_evaluation(
     
     db.commit()
     db.refresh(evaluation)
+    invalidate_catalog()
     
     # Buscar o relógio avaliado
     watch = db.query(Watch).filter(Watch.id == evaluation.watch_id).first()
@@ -354,7 +381,7 @@ def create_evaluation(
 def get_watch_evaluation(
     watch_id: int,
     current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     evaluation = db.query(Evaluation).filter(Evaluation.watch_id == watch_id).first()
     if not evaluation:
@@ -366,7 +393,7 @@ def get_watch_evaluation(
 def get_evaluator_evaluations(
     evaluator_id: int,
     current_user = Depends(require_role(["admin", "evaluator"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     # Verificar se é o próprio avaliador ou admin
     if current_user["role"] != "admin":
@@ -383,7 +410,7 @@ def get_evaluator_evaluations(
 @router.get("/my-evaluations", response_model=List[EvaluationOut])
 def get_my_evaluations(
     current_user = Depends(require_role(["store", "evaluator", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Endpoint para lojas, avaliadores e admins verem suas avaliações"""
     user_id = int(current_user["sub"])
@@ -414,6 +441,6 @@ def get_my_evaluations(
 @router.get("/", response_model=List[EvaluationOut])
 def list_evaluations(
     current_user = Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     return db.query(Evaluation).all()
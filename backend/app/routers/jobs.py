@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.schemas import EscrowJobCreate, JobOut, NFTMintJobCreate, NFTTransferRequest
+from app.auth import require_role
+from app.database import get_db
+from app.models import Job, ResellOffer
+from app import jobs
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Operações Stellar são executadas pelo worker (python start_worker.py);
+# os endpoints só enfileiram e devolvem o job para acompanhamento em GET /jobs/{id}
+
+def enqueue_job(db: Session, job_type: str, payload: dict, **kwargs):
+    """jobs.enqueue com a Idempotency-Key reaproveitada para outro payload virando 409"""
+    try:
+        return jobs.enqueue(db, job_type, payload, **kwargs)
+    except jobs.IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/nft/mint", response_model=JobOut, status_code=202)
+def enqueue_nft_mint(
+    payload: NFTMintJobCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_role(["admin", "store", "evaluator"])),
+    db: Session = Depends(get_db)
+):
+    """Enfileira o registro + mint do NFT de um relógio"""
+    return enqueue_job(
+        db, "nft.mint",
+        {"evaluation_data": payload.report.model_dump(), "owner_user_id": payload.owner_user_id},
+        # Um serial só pode ser tokenizado uma vez (um job falho pode ser reenviado)
+        idempotency_key=idempotency_key or f"nft.mint:{payload.report.serial}",
+        created_by_user_id=int(current_user["sub"]),
+    )
+
+@router.post("/nft/transfer", response_model=JobOut, status_code=202)
+def enqueue_nft_transfer(
+    payload: NFTTransferRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
+    db: Session = Depends(get_db)
+):
+    """Enfileira a transferência do NFT entre usuários"""
+    if current_user["role"] != "admin" and payload.from_user_id != int(current_user["sub"]):
+        raise HTTPException(status_code=403, detail="Só o dono pode transferir o NFT")
+    
+    return enqueue_job(
+        db, "nft.transfer", payload.model_dump(),
+        idempotency_key=idempotency_key,
+        created_by_user_id=int(current_user["sub"]),
+    )
+
+@router.post("/escrow", response_model=JobOut, status_code=202)
+def enqueue_escrow_create(
+    payload: EscrowJobCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_role(["admin", "user"])),
+    db: Session = Depends(get_db)
+):
+    """Enfileira a criação da conta de escrow (friendbot + trustline USDC) de uma oferta"""
+    offer = db.query(ResellOffer).filter(ResellOffer.id == payload.offer_id).first()
+    if not offer:
+        raise HTTPException(status_code=404, detail="Oferta não encontrada")
+    
+    return enqueue_job(
+        db, "escrow.create",
+        {"offer_id": payload.offer_id, "amount_usdc": str(payload.amount_usdc),
+         "depositor_stellar_key": payload.depositor_stellar_key},
+        idempotency_key=idempotency_key,
+        created_by_user_id=int(current_user["sub"]),
+    )
+
+@router.post("/escrow/{escrow_id}/release", response_model=JobOut, status_code=202)
+def enqueue_escrow_release(
+    escrow_id: int,
+    current_user = Depends(require_role(["admin"])),
+    db: Session = Depends(get_db)
+):
+    """Enfileira a liberação dos fundos de um escrow (no máximo um job por escrow)"""
+    return enqueue_job(
+        db, "escrow.release", {"escrow_id": escrow_id},
+        idempotency_key=f"escrow.release:{escrow_id}", shared=True,
+        created_by_user_id=int(current_user["sub"]),
+    )
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(
+    job_id: int,
+    current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
+    db: Session = Depends(get_db)
+):
+    """Status de um job (pending, running, succeeded, failed)"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job or (current_user["role"] != "admin" and job.created_by_user_id != int(current_user["sub"])):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
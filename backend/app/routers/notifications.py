@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.schemas import NotificationOut
 from app.auth import require_role
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
 from app.models import Notification
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
@@ -23,7 +25,7 @@ def create_notification(db: Session, user_id: int, title: str, message: str, typ
 @router.get("/", response_model=List[NotificationOut])
 def get_notifications(
     current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     notifications = db.query(Notification).filter(
         Notification.user_id == int(current_user["sub"])
@@ -32,14 +34,14 @@ def get_notifications(
     return notifications
 
 @router.get("/unread", response_model=List[NotificationOut])
-def get_unread_notifications(
+async def get_unread_notifications(
     current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    notifications = db.query(Notification).filter(
+    notifications = (await db.scalars(select(Notification).filter(
         Notification.user_id == int(current_user["sub"]),
         Notification.read == False
-    ).order_by(Notification.created_at.desc()).all()
+    ).order_by(Notification.created_at.desc()))).all()
     
     return notifications
 
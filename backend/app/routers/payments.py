@@ -6,7 +6,7 @@ from app.schemas import (
     PixPaymentResponse, CreditCardPaymentResponse
 )
 from app.auth import require_role
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.stellar import (
     simulate_payment_conversion, generate_pix_payment, 
     generate_credit_card_payment, calculate_payment_fees
@@ -338,7 +338,7 @@ def calculate_fees(
 @router.get("/conversion-rates")
 def get_conversion_rates(
     current_user = Depends(require_role(["admin", "store", "user"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retorna taxas de conversão atuais e informações sobre métodos de pagamento
@@ -529,7 +529,7 @@ def pay_evaluator_fee(
 @router.get("/")
 def list_payments(
     current_user = Depends(require_role(["admin", "user", "store"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Lista todos os pagamentos (simulados) do sistema"""
     # Para MVP, vamos retornar dados simulados
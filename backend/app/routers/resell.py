@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from app.schemas import ResellOfferCreate, ResellOfferOut, ProposePricePayload, EscrowOut
 from app.auth import require_role
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import ResellOffer, Watch, Store, Evaluator, User, Escrow, OwnershipTransfer, Commission
 from app.stellar import transfer_nft, simulate_payment_conversion
 from app.routers.notifications import create_notification
@@ -45,7 +45,8 @@ def prepare_resell(
         seller_user_id=int(current_user["sub"]),
         store_id=evaluator_store.id,
         evaluator_id=offer.evaluator_id,
-        expected_price_brl=offer.expected_price_brl,
+        asking_price_brl=offer.proposed_price_brl,
+        description=offer.description,
         status="pending"
     )
     db.add(db_offer)
@@ -262,7 +263,7 @@ def confirm_delivery(
 @router.get("/", response_model=List[ResellOfferOut])
 def list_resell_offers(
     current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     # Filtrar por papel do usuário
     if current_user["role"] == "admin":
@@ -283,7 +284,7 @@ def list_resell_offers(
 @router.get("/my-offers", response_model=List[ResellOfferOut])
 def get_my_offers(
     current_user = Depends(require_role(["user", "store", "evaluator"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Retorna as ofertas do usuário logado"""
     if current_user["role"] == "user":
@@ -314,7 +315,7 @@ def get_my_offers(
 def get_resell_offer(
     offer_id: int,
     current_user = Depends(require_role(["admin", "store", "evaluator", "user"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     offer = db.query(ResellOffer).filter(ResellOffer.id == offer_id).first()
     if not offer:
@@ -1,18 +1,22 @@
 """
 Stellar Contracts Router - Versão Simplificada para Testes
-Simula contratos inteligentes na Stellar para NFTs e Escrow
+Simula contratos inteligentes na Stellar para NFTs e Escrow; registro e
+transferência de NFT são enfileirados na fila de jobs (app/jobs.py)
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..routers.auth import get_current_user
-from ..models import User, Watch, ResellOffer
-from ..stellar import create_nft_asset, transfer_nft, simulate_payment_conversion
+from ..models import User, Watch, ResellOffer, NFTToken
+from ..stellar import simulate_payment_conversion, get_nft_verification, get_nft_verifications
+from ..stellar import get_nft_history as nft_history
+from ..schemas import JobOut
+from .jobs import enqueue_job
 
 router = APIRouter(prefix="/stellar", tags=["Contratos Stellar"])
 
@@ -23,21 +27,10 @@ class WatchRegistrationRequest(BaseModel):
     brand: str
     model: str
 
-class WatchRegistrationResponse(BaseModel):
-    success: bool
-    nft_token: str
-    blockchain_hash: str
-    watch_id: int
-
 class NFTTransferRequest(BaseModel):
     from_watch_id: int
     to_address: str
     
-class NFTTransferResponse(BaseModel):
-    success: bool
-    transaction_hash: str
-    new_owner: str
-
 class EscrowRequest(BaseModel):
     offer_id: int
     amount_brl: float
@@ -47,45 +40,39 @@ class EscrowResponse(BaseModel):
     escrow_id: str
     amount_locked: float
 
+class NFTBulkVerifyRequest(BaseModel):
+    watch_ids: List[int] = Field(..., min_length=1, max_length=100)
+
 # Endpoints simplificados para teste
 
-@router.post("/watches/register", response_model=WatchRegistrationResponse)
+@router.post("/watches/register", response_model=JobOut, status_code=202)
 def register_watch(
     request: WatchRegistrationRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Registrar relógio na blockchain como NFT"""
-    try:
-        # Verificar se o relógio existe
-        watch = db.query(Watch).filter(Watch.id == request.watch_id).first()
-        if not watch:
-            raise HTTPException(status_code=404, detail="Relógio não encontrado")
-        
-        # Simular criação do NFT
-        nft_data = create_nft_asset(
-            watch_id=request.watch_id,
-            brand=request.brand,
-            model=request.model,
-            serial_number=request.serial_number,
-            receiver_public="SIMULATED_ADDRESS"
-        )
-        
-        return WatchRegistrationResponse(
-            success=True,
-            nft_token=nft_data["asset_code"],
-            blockchain_hash=nft_data["tx_hash"],
-            watch_id=request.watch_id
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao registrar NFT: {str(e)}")
+    """Enfileira o mint do NFT de um relógio cadastrado (acompanhar em GET /jobs/{id})"""
+    watch = db.query(Watch).filter(Watch.id == request.watch_id).first()
+    if not watch:
+        raise HTTPException(status_code=404, detail="Relógio não encontrado")
+    if watch.serial_number != request.serial_number:
+        raise HTTPException(status_code=400, detail="Serial não confere com o relógio")
+    if current_user.role not in ("admin", "store", "evaluator") and watch.current_owner_user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Só o dono pode registrar o NFT do relógio")
+    
+    # Um relógio só é tokenizado uma vez, seja quem for que enfileire
+    return enqueue_job(
+        db, "nft.tokenize", {"watch_id": watch.id},
+        idempotency_key=idempotency_key or f"nft.tokenize:{watch.id}", shared=idempotency_key is None,
+        created_by_user_id=current_user.id,
+    )
 
 @router.get("/watches/{watch_id}/nft-status")
 def get_nft_status(
     watch_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Verificar status do NFT do relógio"""
     try:
@@ -159,71 +146,82 @@ def get_escrow_status(
         "created_at": datetime.now().isoformat()
     }
 
-@router.post("/nft/transfer", response_model=NFTTransferResponse)
+@router.post("/nft/transfer", response_model=JobOut, status_code=202)
 def transfer_nft_endpoint(
     request: NFTTransferRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Transferir NFT do relógio"""
-    try:
-        # Simular transferência
-        tx_hash = f"TX_TRANSFER_{request.from_watch_id}_{datetime.now().timestamp()}"
-        
-        return NFTTransferResponse(
-            success=True,
-            transaction_hash=tx_hash,
-            new_owner=request.to_address
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao transferir NFT: {str(e)}")
+    """Enfileira a transferência do NFT para o usuário dono da chave `to_address`"""
+    watch = db.query(Watch).filter(Watch.id == request.from_watch_id).first()
+    if not watch:
+        raise HTTPException(status_code=404, detail="Relógio não encontrado")
+    if current_user.role != "admin" and watch.current_owner_user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Só o dono pode transferir o NFT")
+    
+    to_user = db.query(User).filter(User.stellar_public_key == request.to_address).first()
+    if not to_user:
+        raise HTTPException(status_code=404, detail="Destinatário não encontrado")
+    
+    return enqueue_job(
+        db, "nft.transfer",
+        {"watch_id": watch.id, "from_user_id": watch.current_owner_user_id, "to_user_id": to_user.id},
+        idempotency_key=idempotency_key,
+        created_by_user_id=current_user.id,
+    )
 
 @router.get("/nft/{watch_id}/history")
 def get_nft_history(
     watch_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Histórico de transferências do NFT"""
+    """Histórico de transferências do NFT (ingerido do Horizon)"""
+    token = db.query(NFTToken).filter(NFTToken.watch_id == watch_id).first()
+    if not token:
+        raise HTTPException(status_code=404, detail="NFT não encontrado")
+    
+    history = nft_history(token.asset_code, db, token.issuer_account)
     return {
         "watch_id": watch_id,
-        "nft_token": f"W{watch_id:06d}",
-        "transactions": [
-            {
-                "type": "mint",
-                "hash": f"TX_MINT_{watch_id}",
-                "timestamp": "2025-08-01T10:00:00Z",
-                "owner": "Original Owner"
-            },
-            {
-                "type": "transfer", 
-                "hash": f"TX_TRANSFER_{watch_id}",
-                "timestamp": "2025-08-13T15:30:00Z",
-                "owner": current_user.name
-            }
-        ]
+        "nft_token": token.token_id,
+        "current_owner": token.current_owner_stellar_key,
+        "transactions": history["transactions"]
     }
 
 @router.get("/nft/{watch_id}/verify")
 def verify_nft(
     watch_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Verificar autenticidade do NFT"""
-    return {
-        "watch_id": watch_id,
-        "nft_valid": True,
-        "blockchain_verified": True,
-        "certificate_hash": f"CERT_{watch_id}_VERIFIED",
-        "verified_at": datetime.now().isoformat()
-    }
+    """Verificar autenticidade do NFT (espelho local da blockchain)"""
+    verification = get_nft_verification(watch_id, db)
+    if verification is None:
+        raise HTTPException(status_code=404, detail="NFT não encontrado")
+    return verification
+
+@router.post("/nft/verify")
+def verify_nfts(
+    request: NFTBulkVerifyRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Verificar vários NFTs (espelho local da blockchain, como GET /nft/{id}/verify)"""
+    verifications = get_nft_verifications(request.watch_ids, db)
+    return {"results": [
+        verifications.get(watch_id) or {"watch_id": watch_id, "nft_valid": False,
+                                        "blockchain_verified": False, "message": "NFT não encontrado"}
+        for watch_id in dict.fromkeys(request.watch_ids)
+    ]}
 
 # Endpoints administrativos
 
 @router.get("/admin/stellar-transactions")
 def list_stellar_transactions(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Listar transações Stellar para admin"""
     if str(current_user.role) != "admin":
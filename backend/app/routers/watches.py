@@ -1,16 +1,36 @@
 # import removido: os
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 from app.schemas import WatchCreate, WatchOut, PurchasePayload
 from app.auth import require_role
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
+from app.cache import invalidate_catalog
 from app.models import Watch, User, Store, Favorite
+from app.search import apply_text_search
+from app.pagination import KeysetOrder, paginate, split_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.serialization import FastJSONResponse, Projection
 from uuid import uuid4
 
 router = APIRouter(prefix="/watches", tags=["watches"])
 
+# Keyset orderings for the marketplace, one per sort_by mode.
+# Every key ends with Watch.id so pages are stable even with equal values.
+MARKETPLACE_ORDERS = {
+    "price-low": KeysetOrder("price-low", Watch.id, Watch.current_value_brl),
+    "price-high": KeysetOrder("price-high", Watch.id, Watch.current_value_brl, descending=True),
+    "brand": KeysetOrder("brand", Watch.id, Watch.brand),
+    "newest": KeysetOrder("newest", Watch.id, Watch.created_at, descending=True),
+}
+# "popular" would require a popularity metric, so it falls back to insertion order
+DEFAULT_MARKETPLACE_ORDER = KeysetOrder("default", Watch.id)
+
+# List endpoints select only the WatchOut columns as tuples and encode them with orjson,
+# skipping ORM objects and per-row Pydantic validation (response_model stays for the docs)
+WATCH_LIST = Projection(WatchOut, Watch)
+
 @router.post("/", response_model=WatchOut)
 async def create_watch(
     watch: WatchCreate,
@@ -60,18 +80,26 @@ async def create_watch(
     db.refresh(db_watch)
     return db_watch
 
-@router.get("/marketplace", response_model=List[WatchOut])
-def list_marketplace_watches(
-    db: Session = Depends(get_db),
+@router.get("/marketplace", response_model=List[WatchOut], response_class=FastJSONResponse)
+async def list_marketplace_watches(
+    db: AsyncSession = Depends(get_async_read_db),
     brand: str = None,
     category: str = None,
     condition: str = None,
     price_min: float = None,
     price_max: float = None,
     search: str = None,
-    sort_by: str = None
+    sort_by: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
 ):
-    query = db.query(Watch).filter(Watch.status == "for_sale")
+    """
+    List watches for sale, one page at a time.
+
+    The cursor for the next page is returned in the X-Next-Cursor header
+    and must be sent back with the same filters and sort_by.
+    """
+    query = WATCH_LIST.select().filter(Watch.status == "for_sale")
 
     if brand:
         brands = [b.strip().lower() for b in brand.split(',')]
@@ -87,24 +115,12 @@ def list_marketplace_watches(
     if price_max:
         query = query.filter(Watch.current_value_brl <= price_max)
     if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(
-            func.lower(Watch.brand).like(search_term) |
-            func.lower(Watch.model).like(search_term) |
-            func.lower(Watch.description).like(search_term)
-        )
-
-    if sort_by == "price-low":
-        query = query.order_by(Watch.current_value_brl.asc())
-    elif sort_by == "price-high":
-        query = query.order_by(Watch.current_value_brl.desc())
-    elif sort_by == "brand":
-        query = query.order_by(Watch.brand.asc())
-    elif sort_by == "newest":
-        query = query.order_by(Watch.created_at.desc())
-    # "popular" sorting would require a popularity metric, not implemented here
+        query, _ = apply_text_search(query, search)
 
-    return query.all()
+    order = MARKETPLACE_ORDERS.get(sort_by, DEFAULT_MARKETPLACE_ORDER)
+    rows = (await db.execute(paginate(query, order, limit, cursor))).all()
+    watches, next_cursor = split_page(rows, order, limit)
+    return WATCH_LIST.response(watches, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
 @router.post("/{watch_id}/purchase")
 def purchase_watch(
@@ -148,26 +164,24 @@ def purchase_watch(
     
     return {"message": "Purchase completed successfully", "watch": watch}
 
-@router.get("/search", response_model=List[WatchOut])
+@router.get("/search", response_model=List[WatchOut], response_class=FastJSONResponse)
 def search_watches(
     q: str,  # Query de busca
-    db: Session = Depends(get_db)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db)
 ):
-    """Search watches by text in brand, model or description"""
-    search_term = f"%{q.lower()}%"
-    
-    watches = db.query(Watch).filter(
-        Watch.status == "for_sale"
-    ).filter(
-        func.lower(Watch.brand).like(search_term) |
-        func.lower(Watch.model).like(search_term) |
-        func.lower(Watch.description).like(search_term) |
-        func.lower(Watch.serial_number).like(search_term)
-    ).all()
-    
-    return watches
+    """Search watches by brand, model, description or serial number, best matches first"""
+    query = db.query(*WATCH_LIST.columns).filter(Watch.status == "for_sale")
+    query, rank = apply_text_search(query, q)
+
+    if rank is not None:
+        query = query.order_by(rank, Watch.id)
+    else:
+        query = query.order_by(Watch.id)
 
-@router.get("/filter", response_model=List[WatchOut])
+    return WATCH_LIST.response(query.limit(limit).all())
+
+@router.get("/filter", response_model=List[WatchOut], response_class=FastJSONResponse)
 def filter_watches(
     brand: str = None,
     model: str = None,
@@ -176,10 +190,10 @@ def filter_watches(
     year_max: int = None,
     price_min: float = None,
     price_max: float = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Advanced filters for watches"""
-    query = db.query(Watch).filter(Watch.status == "for_sale")
+    query = db.query(*WATCH_LIST.columns).filter(Watch.status == "for_sale")
     
     if brand:
         query = query.filter(func.lower(Watch.brand).like(f"%{brand.lower()}%"))
@@ -196,15 +210,16 @@ def filter_watches(
     if price_max:
         query = query.filter(Watch.current_value_brl <= price_max)
     
-    return query.all()
+    return WATCH_LIST.response(query.all())
 
-@router.get("/my", response_model=List[WatchOut])
+@router.get("/my", response_model=List[WatchOut], response_class=FastJSONResponse)
 def my_watches(
     current_user = Depends(require_role(["user", "store"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     # List user's or store's watches
-    return db.query(Watch).filter(Watch.current_owner_user_id == int(current_user["sub"])).all()
+    rows = db.query(*WATCH_LIST.columns).filter(Watch.current_owner_user_id == int(current_user["sub"])).all()
+    return WATCH_LIST.response(rows)
 
 @router.post("/{watch_id}/favorite")
 def toggle_favorite(
@@ -230,31 +245,33 @@ def toggle_favorite(
         # Remove from favorites
         db.delete(existing_favorite)
         db.commit()
+        invalidate_catalog()
         return {"message": "Watch removed from favorites", "is_favorite": False}
     else:
         # Add to favorites
         favorite = Favorite(user_id=user_id, watch_id=watch_id)
         db.add(favorite)
         db.commit()
+        invalidate_catalog()
         return {"message": "Watch added to favorites", "is_favorite": True}
 
-@router.get("/favorites", response_model=List[WatchOut])
+@router.get("/favorites", response_model=List[WatchOut], response_class=FastJSONResponse)
 def get_favorites(
     current_user = Depends(require_role(["user"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """List user's favorite watches"""
     user_id = int(current_user["sub"])
     
-    favorites = db.query(Watch).join(Favorite).filter(
+    favorites = db.query(*WATCH_LIST.columns).select_from(Watch).join(Favorite).filter(
         Favorite.user_id == user_id
     ).all()
     
-    return favorites
+    return WATCH_LIST.response(favorites)
 
 @router.get("/{watch_id}", response_model=WatchOut)
-def get_watch(watch_id: int, db: Session = Depends(get_db)):
-    watch = db.query(Watch).filter(Watch.id == watch_id).first()
+async def get_watch(watch_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    watch = await db.get(Watch, watch_id)
     if not watch:
         raise HTTPException(status_code=404, detail="Watch not found")
     return watch
@@ -262,7 +279,7 @@ def get_watch(watch_id: int, db: Session = Depends(get_db)):
 @router.get("/{watch_id}/history")
 def get_watch_history(
     watch_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Detailed history of a watch"""
     watch = db.query(Watch).filter(Watch.id == watch_id).first()
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional, List
 from datetime import datetime
+from decimal import Decimal
 import re
 
 # User schemas
@@ -125,6 +126,31 @@ class NFTTransferRequest(BaseModel):
     from_user_id: int
     to_user_id: int
 
+# Job schemas (fila de operações Stellar)
+class NFTMintJobCreate(BaseModel):
+    report: StellarWatchRegister
+    owner_user_id: int
+
+class EscrowJobCreate(BaseModel):
+    offer_id: int
+    amount_usdc: Decimal = Field(..., gt=0)
+    depositor_stellar_key: str
+
+class JobOut(BaseModel):
+    id: int
+    type: str
+    status: str  # pending, running, succeeded, failed
+    attempts: int
+    max_attempts: int
+    run_after: Optional[datetime] = None
+    result: Optional[dict] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Watch schemas
 class WatchCreate(BaseModel):
     serial_number: str
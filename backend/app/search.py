@@ -0,0 +1,137 @@
+"""
+Busca textual de relógios servida por índice.
+
+- SQLite: tabela virtual FTS5 (`watches_fts`) com conteúdo externo, mantida
+  em sincronia com `watches` por triggers de INSERT/UPDATE/DELETE.
+- Postgres: índice GIN sobre `to_tsvector` dos mesmos campos.
+- Outros bancos (ou SQLite sem FTS5): LIKE como antes, sem índice.
+
+Os termos viram consultas de prefixo ("rol" encontra "Rolex") e todos os
+termos precisam aparecer (AND).
+"""
+
+import logging
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import false, literal_column, select, text
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+from app.models import Watch
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "watches_fts"
+SEARCH_COLUMNS = ("brand", "model", "description", "serial_number")
+
+# Mesma expressão no índice GIN e nas consultas, senão o Postgres não usa o índice
+PG_SEARCH_DOCUMENT = "to_tsvector('simple', " + " || ' ' || ".join(
+    f"coalesce({col}, '')" for col in SEARCH_COLUMNS
+) + ")"
+
+_SQLITE_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {", ".join(SEARCH_COLUMNS)},
+        content='watches', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON watches BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES (new.id, {", ".join("new." + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON watches BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {", ".join("old." + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {", ".join(SEARCH_COLUMNS)} ON watches BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {", ".join("old." + c for c in SEARCH_COLUMNS)});
+        INSERT INTO {FTS_TABLE}(rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES (new.id, {", ".join("new." + c for c in SEARCH_COLUMNS)});
+    END""",
+]
+
+_PG_INDEX_DDL = f"CREATE INDEX IF NOT EXISTS idx_watches_search ON watches USING gin ({PG_SEARCH_DOCUMENT})"
+
+# Backend ativo neste processo: "fts5", "postgres" ou "like"
+_backend = "like"
+
+
+def ensure_search_index(engine) -> str:
+    """
+    Cria o índice de busca (idempotente) e escolhe o backend de busca.
+
+    Na primeira criação da tabela FTS5 o índice é reconstruído a partir
+    dos relógios já existentes.
+    """
+    global _backend
+
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE},
+                ).first()
+                for ddl in _SQLITE_FTS_DDL:
+                    conn.execute(text(ddl))
+                if not exists:
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            _backend = "fts5"
+        except OperationalError as e:
+            # SQLite compilado sem FTS5 ("no such module: fts5"): mantém a busca por LIKE
+            logger.warning("FTS5 indisponível, usando LIKE na busca: %s", e)
+            _backend = "like"
+    elif dialect == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(_PG_INDEX_DDL))
+        _backend = "postgres"
+    else:
+        _backend = "like"
+
+    return _backend
+
+
+def search_terms(q: str):
+    """Normaliza a busca em termos alfanuméricos (sem operadores do usuário)"""
+    return re.findall(r"\w+", (q or "").lower())
+
+
+def apply_text_search(query, q: str) -> Tuple[object, Optional[object]]:
+    """
+    Filtra a query (Query ou select) pelos relógios que casam com `q`.
+
+    Retorna a query filtrada e uma expressão de relevância ordenável em
+    ordem crescente (melhor primeiro), ou None quando não há ranking.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return query.filter(false()), None
+
+    if _backend == "fts5":
+        match = " ".join(f'"{term}"*' for term in terms)
+        fts = (
+            select(literal_column("rowid").label("watch_id"), literal_column("rank").label("rank"))
+            .select_from(text(FTS_TABLE))
+            .where(literal_column(FTS_TABLE).op("MATCH")(match))
+            .subquery("fts")
+        )
+        return query.join(fts, fts.c.watch_id == Watch.id), fts.c.rank
+
+    if _backend == "postgres":
+        document = literal_column(PG_SEARCH_DOCUMENT)
+        ts_query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        query = query.filter(document.op("@@")(ts_query))
+        return query, -func.ts_rank(document, ts_query)
+
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(
+            func.lower(Watch.brand).like(pattern) |
+            func.lower(Watch.model).like(pattern) |
+            func.lower(Watch.description).like(pattern) |
+            func.lower(Watch.serial_number).like(pattern)
+        )
+    return query, None
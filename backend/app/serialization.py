@@ -0,0 +1,68 @@
+"""
+Serialização rápida das listagens.
+
+Com `response_model=List[WatchOut]` cada objeto do ORM é carregado com
+todas as colunas e validado campo a campo pelo Pydantic antes de virar
+JSON. Nas listagens isso custa mais que a consulta. O caminho rápido:
+
+- `Projection` seleciona só as colunas que o schema de saída expõe, como
+  tuplas (sem montar objetos do ORM). Campos do schema que não existem no
+  modelo saem como NULL na própria consulta, na ordem do schema.
+- `FastJSONResponse` codifica as linhas com orjson, sem validação por
+  linha. O `response_model` continua na rota para a documentação OpenAPI.
+
+O schema segue sendo o contrato: a projeção é derivada dos campos dele,
+então um campo novo no schema entra na consulta sem mudar as rotas.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import inspect, null, select
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usa o json da stdlib
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse codificada com orjson (ou json da stdlib, se orjson não estiver instalado)"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class Projection:
+    """Colunas de `model` expostas por `schema`, lidas como tuplas e devolvidas como dicts"""
+
+    def __init__(self, schema, model):
+        self.fields = list(schema.model_fields)
+        mapped = inspect(model).column_attrs
+        self.columns = [
+            getattr(model, name) if name in mapped else null().label(name)
+            for name in self.fields
+        ]
+
+    def select(self):
+        return select(*self.columns)
+
+    def to_dicts(self, rows: Iterable) -> List[Dict[str, Any]]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def response(self, rows: Iterable, headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+        return FastJSONResponse(self.to_dicts(rows), headers=headers)
@@ -0,0 +1,511 @@
+"""
+Estatísticas do marketplace pré-computadas (tabela `marketplace_stats`).
+
+Métricas de fluxo (eventos) são somadas nos buckets diário, mensal e total
+pela data do evento:
+    users.new, stores.new, watches.new, commissions, transfers.<tipo>
+    sales.brand.<marca> (só no bucket total)
+Editar a data, o valor ou o tipo de um evento (ou a marca de um relógio
+vendido) tira a contribuição antiga e soma a nova.
+
+Métricas de estado (gauges) ficam só no bucket total ("all") e sobem ou
+descem conforme os registros mudam:
+    users.role.<papel>, users.balance_brl, users.balance_xlm,
+    watches.status.<status>, stores.credentialed, evaluators.active
+
+A atualização roda no `after_flush` de qualquer Session, na mesma transação
+da escrita, então um rollback também desfaz as estatísticas.
+
+Cada contador é dividido em STATS_SHARDS linhas (coluna `shard`): cada
+transação soma numa fatia sorteada e as leituras somam todas. Sem isso, toda
+escrita concorrente (cadastro, venda, mudança de saldo) esperaria pelo lock
+da mesma linha "total/all" no Postgres. No SQLite as escritas já são
+serializadas pelo banco, então fica uma fatia só.
+
+`query.update()`/`query.delete()` em massa não passam pelo rastreamento por
+objeto; por isso são recusadas (UntrackedBulkWrite) quando mexem em colunas
+ou tabelas rastreadas. Para reconstruir tudo a partir das tabelas de origem
+(por exemplo depois de SQL manual no banco):
+
+    python -m app.stats
+"""
+
+import os
+import random
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.models import (
+    MarketplaceStat, User, Store, Evaluator, Watch, OwnershipTransfer, Commission
+)
+
+TOTAL_BUCKET = "all"
+SALES_BRAND_PREFIX = "sales.brand."
+
+# Fatias por contador (Postgres e outros bancos com escrita concorrente)
+STATS_SHARDS = max(int(os.getenv("STATS_SHARDS", "8")), 1)
+
+# Colunas que alimentam gauges e tabelas que alimentam contadores
+TRACKED_COLUMNS = {
+    User: {"role", "balance_brl", "balance_xlm", "created_at"},
+    Store: {"credentialed", "created_at"},
+    Evaluator: {"active"},
+    Watch: {"status", "brand", "created_at"},
+    OwnershipTransfer: {"type", "price_brl", "watch_id", "created_at"},
+    Commission: {"amount_brl", "created_at"},
+}
+
+
+class UntrackedBulkWrite(RuntimeError):
+    """UPDATE/DELETE em massa que deixaria marketplace_stats desatualizada"""
+
+
+def day_bucket(when: datetime) -> str:
+    return when.strftime("%Y-%m-%d")
+
+
+def month_bucket(when: datetime) -> str:
+    return when.strftime("%Y-%m")
+
+
+def calendar_months(now: datetime, count: int) -> List[datetime]:
+    """Início dos últimos `count` meses de calendário, do atual para o mais antigo"""
+    year, month = now.year, now.month
+    months = []
+    for _ in range(count):
+        months.append(datetime(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months
+
+
+class StatsDelta:
+    """Acumula incrementos por (métrica, período, bucket) antes de gravar"""
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: [0, 0.0])
+
+    def __bool__(self):
+        return any(count or amount for count, amount in self.rows.values())
+
+    def add(self, metric: str, period: str, bucket: str, count: int = 0, amount: float = 0.0):
+        row = self.rows[(metric, period, bucket)]
+        row[0] += count
+        row[1] += amount
+
+    def flow(self, metric: str, when: Optional[datetime], count: int = 1, amount: float = 0.0):
+        when = when or datetime.utcnow()
+        self.add(metric, "day", day_bucket(when), count, amount)
+        self.add(metric, "month", month_bucket(when), count, amount)
+        self.add(metric, "total", TOTAL_BUCKET, count, amount)
+
+    def gauge(self, metric: str, count: int = 0, amount: float = 0.0):
+        self.add(metric, "total", TOTAL_BUCKET, count, amount)
+
+    def apply(self, conn, shard: int = 0):
+        """
+        Soma os incrementos na fatia `shard` com upsert (uma instrução para
+        todas as linhas). As linhas vão em ordem de chave, então transações
+        concorrentes travam as mesmas linhas na mesma ordem (sem deadlock).
+        """
+        table = MarketplaceStat.__table__
+        now = datetime.utcnow()
+        values = [
+            {"metric": metric, "period": period, "bucket": bucket, "shard": shard,
+             "count": count, "amount_brl": amount, "updated_at": now}
+            for (metric, period, bucket), (count, amount) in sorted(self.rows.items())
+            if count or amount
+        ]
+        if not values:
+            return
+
+        dialect = conn.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.metric, table.c.period, table.c.bucket, table.c.shard],
+                set_={
+                    "count": table.c.count + stmt.excluded.count,
+                    "amount_brl": table.c.amount_brl + stmt.excluded.amount_brl,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            conn.execute(stmt, values)
+            return
+
+        # Outros bancos: UPDATE e, se a linha não existir, INSERT
+        for row in values:
+            key = (
+                (table.c.metric == row["metric"]) &
+                (table.c.period == row["period"]) &
+                (table.c.bucket == row["bucket"]) &
+                (table.c.shard == shard)
+            )
+            result = conn.execute(table.update().where(key).values(
+                count=table.c.count + row["count"],
+                amount_brl=table.c.amount_brl + row["amount_brl"],
+                updated_at=now,
+            ))
+            if result.rowcount == 0:
+                conn.execute(table.insert().values(**row))
+
+
+# ========================= RASTREAMENTO INCREMENTAL =========================
+
+def _watch_status(status: Optional[str]) -> str:
+    return status or "registered"
+
+
+def _change(obj, attr: str):
+    """(antigo, novo) se o atributo mudou neste flush, senão None"""
+    history = inspect(obj).attrs[attr].history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+def _previous(obj, attr: str):
+    """Valor do atributo antes deste flush"""
+    change = _change(obj, attr)
+    return change[0] if change else getattr(obj, attr)
+
+
+def _sale_brand(session, conn, transfer: OwnershipTransfer, before: bool = False) -> Optional[str]:
+    """Marca do relógio da venda; com before=True, como estava antes deste flush"""
+    watch_id = _previous(transfer, "watch_id") if before else transfer.watch_id
+    watch = transfer.__dict__.get("watch")
+    if watch is None or watch.id != watch_id:
+        watch = session.identity_map.get(identity_key(Watch, watch_id)) if watch_id is not None else None
+    if watch is not None:
+        return _previous(watch, "brand") if before else watch.brand
+    if watch_id is None:
+        return None
+    return conn.execute(select(Watch.brand).where(Watch.id == watch_id)).scalar()
+
+
+def _track_transfer(delta: StatsDelta, session, conn, obj: OwnershipTransfer, sign: int, before: bool = False):
+    value = _previous if before else getattr
+    price = value(obj, "price_brl") or 0
+    transfer_type = value(obj, "type")
+    delta.flow(f"transfers.{transfer_type}", value(obj, "created_at"), sign, sign * price)
+    if transfer_type == "sale":
+        brand = _sale_brand(session, conn, obj, before)
+        if brand:
+            delta.gauge(f"{SALES_BRAND_PREFIX}{brand}", sign, sign * price)
+
+
+def _track_row(delta: StatsDelta, session, conn, obj, sign: int):
+    """Registro inserido (sign=1) ou removido (sign=-1)"""
+    if isinstance(obj, User):
+        delta.flow("users.new", obj.created_at, sign)
+        delta.gauge(f"users.role.{obj.role}", sign)
+        delta.gauge("users.balance_brl", amount=sign * (obj.balance_brl or 0))
+        delta.gauge("users.balance_xlm", amount=sign * (obj.balance_xlm or 0))
+    elif isinstance(obj, Store):
+        delta.flow("stores.new", obj.created_at, sign)
+        if obj.credentialed:
+            delta.gauge("stores.credentialed", sign)
+    elif isinstance(obj, Evaluator):
+        if obj.active is not False:
+            delta.gauge("evaluators.active", sign)
+    elif isinstance(obj, Watch):
+        delta.flow("watches.new", obj.created_at, sign)
+        delta.gauge(f"watches.status.{_watch_status(obj.status)}", sign)
+    elif isinstance(obj, OwnershipTransfer):
+        # Removido: a marca que contava a venda é a de antes deste flush
+        _track_transfer(delta, session, conn, obj, sign, before=sign < 0)
+    elif isinstance(obj, Commission):
+        delta.flow("commissions", obj.created_at, sign, sign * (obj.amount_brl or 0))
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history: ao atribuir uma coluna rastreada num objeto expirado (depois
+# de um commit), o ORM carrega o valor antigo, senão o histórico viria sem ele
+for _model, _attrs in TRACKED_COLUMNS.items():
+    for _attr in _attrs:
+        event.listen(getattr(_model, _attr), "set", _load_previous_value, active_history=True)
+
+
+def _changed(obj, attrs) -> bool:
+    return any(_change(obj, attr) for attr in attrs)
+
+
+def _move_flow(delta: StatsDelta, obj, metric: str, amount_attr: Optional[str] = None):
+    """Evento com data ou valor alterados: sai do bucket antigo e entra no novo"""
+    attrs = ("created_at", amount_attr) if amount_attr else ("created_at",)
+    if not _changed(obj, attrs):
+        return
+    old_amount = (_previous(obj, amount_attr) or 0) if amount_attr else 0.0
+    new_amount = (getattr(obj, amount_attr) or 0) if amount_attr else 0.0
+    delta.flow(metric, _previous(obj, "created_at"), -1, -old_amount)
+    delta.flow(metric, obj.created_at, 1, new_amount)
+
+
+def _move_brand_sales(delta: StatsDelta, session, conn, watch: Watch, old_brand: Optional[str]):
+    """
+    Relógio com vendas mudou de marca: as vendas já gravadas passam para a
+    nova. Vendas inseridas, removidas ou alteradas neste mesmo flush ficam de
+    fora; o rastreamento de cada uma já conta a marca certa.
+    """
+    handled = [
+        obj.id for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, OwnershipTransfer) and obj.id is not None
+        and (obj in session.new or _changed(obj, TRACKED_COLUMNS[OwnershipTransfer]))
+    ]
+    count, amount = conn.execute(
+        select(func.count(OwnershipTransfer.id), func.coalesce(func.sum(OwnershipTransfer.price_brl), 0))
+        .where(OwnershipTransfer.watch_id == watch.id, OwnershipTransfer.type == "sale",
+               OwnershipTransfer.id.notin_(handled))
+    ).one()
+    if not count:
+        return
+    if old_brand:
+        delta.gauge(f"{SALES_BRAND_PREFIX}{old_brand}", -count, -amount)
+    if watch.brand:
+        delta.gauge(f"{SALES_BRAND_PREFIX}{watch.brand}", count, amount)
+
+
+def _track_changes(delta: StatsDelta, session, conn, obj):
+    """Registro existente alterado: ajusta os gauges e move os eventos afetados"""
+    if isinstance(obj, User):
+        _move_flow(delta, obj, "users.new")
+        role = _change(obj, "role")
+        if role:
+            delta.gauge(f"users.role.{role[0]}", -1)
+            delta.gauge(f"users.role.{role[1]}", 1)
+        for attr in ("balance_brl", "balance_xlm"):
+            balance = _change(obj, attr)
+            if balance:
+                delta.gauge(f"users.{attr}", amount=(balance[1] or 0) - (balance[0] or 0))
+    elif isinstance(obj, Store):
+        _move_flow(delta, obj, "stores.new")
+        credentialed = _change(obj, "credentialed")
+        if credentialed and bool(credentialed[0]) != bool(credentialed[1]):
+            delta.gauge("stores.credentialed", 1 if credentialed[1] else -1)
+    elif isinstance(obj, Evaluator):
+        active = _change(obj, "active")
+        if active and bool(active[0]) != bool(active[1]):
+            delta.gauge("evaluators.active", 1 if active[1] else -1)
+    elif isinstance(obj, Watch):
+        _move_flow(delta, obj, "watches.new")
+        status = _change(obj, "status")
+        if status and status[0] != status[1]:
+            delta.gauge(f"watches.status.{_watch_status(status[0])}", -1)
+            delta.gauge(f"watches.status.{_watch_status(status[1])}", 1)
+        brand = _change(obj, "brand")
+        if brand and brand[0] != brand[1]:
+            _move_brand_sales(delta, session, conn, obj, brand[0])
+    elif isinstance(obj, OwnershipTransfer):
+        if _changed(obj, TRACKED_COLUMNS[OwnershipTransfer]):
+            _track_transfer(delta, session, conn, obj, -1, before=True)
+            _track_transfer(delta, session, conn, obj, 1)
+    elif isinstance(obj, Commission):
+        _move_flow(delta, obj, "commissions", "amount_brl")
+
+
+_SHARD_KEY = "marketplace_stats_shard"
+
+
+def _transaction_shard(session, conn) -> int:
+    """Uma fatia por transação: todos os flushes dela somam nas mesmas linhas"""
+    if conn.dialect.name == "sqlite" or STATS_SHARDS == 1:
+        return 0
+    transaction = session.get_transaction()
+    current = session.info.get(_SHARD_KEY)
+    if current is None or current[0] is not transaction:
+        current = (transaction, random.randrange(STATS_SHARDS))
+        session.info[_SHARD_KEY] = current
+    return current[1]
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    # Em after_flush, new/dirty/deleted e o histórico ainda refletem o flush atual
+    delta = StatsDelta()
+    conn = session.connection()
+    for obj in session.new:
+        _track_row(delta, session, conn, obj, 1)
+    for obj in session.deleted:
+        _track_row(delta, session, conn, obj, -1)
+    for obj in session.dirty:
+        _track_changes(delta, session, conn, obj)
+    if delta:
+        delta.apply(conn, _transaction_shard(session, conn))
+
+
+def _updated_columns(statement) -> set:
+    keys = set()
+    for key in getattr(statement, "_values", None) or {}:
+        keys.add(key if isinstance(key, str) else getattr(key, "key", None))
+    for key, _ in getattr(statement, "_ordered_values", None) or ():
+        keys.add(key if isinstance(key, str) else getattr(key, "key", None))
+    return keys
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _forbid_untracked_bulk_writes(orm_execute_state):
+    """Recusa UPDATE/DELETE em massa que mexem no que marketplace_stats acompanha"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    tracked = TRACKED_COLUMNS.get(mapper.class_) if mapper is not None else None
+    if tracked is None:
+        return
+    if orm_execute_state.is_delete:
+        raise UntrackedBulkWrite(
+            f"DELETE em massa em {mapper.class_.__tablename__} não atualiza marketplace_stats; "
+            "carregue os registros e use session.delete()"
+        )
+    columns = _updated_columns(orm_execute_state.statement) & tracked
+    if columns:
+        raise UntrackedBulkWrite(
+            f"UPDATE em massa de {', '.join(sorted(columns))} em {mapper.class_.__tablename__} "
+            "não atualiza marketplace_stats; altere os objetos carregados"
+        )
+
+
+# ========================= LEITURA =========================
+
+def read_totals(db: Session) -> Dict[str, Tuple[int, float]]:
+    """Todos os totais ("all"), exceto vendas por marca: {métrica: (count, amount)}"""
+    rows = db.query(
+        MarketplaceStat.metric, func.sum(MarketplaceStat.count), func.sum(MarketplaceStat.amount_brl)
+    ).filter(
+        MarketplaceStat.period == "total",
+        MarketplaceStat.bucket == TOTAL_BUCKET,
+        ~MarketplaceStat.metric.like(f"{SALES_BRAND_PREFIX}%"),
+    ).group_by(MarketplaceStat.metric).all()
+    return {metric: (count, amount) for metric, count, amount in rows}
+
+
+def read_buckets(db: Session, period: str, metrics: Iterable[str], since: str) -> Dict[Tuple[str, str], Tuple[int, float]]:
+    """Buckets de um período a partir de `since`: {(métrica, bucket): (count, amount)}"""
+    rows = db.query(
+        MarketplaceStat.metric, MarketplaceStat.bucket,
+        func.sum(MarketplaceStat.count), func.sum(MarketplaceStat.amount_brl)
+    ).filter(
+        MarketplaceStat.period == period,
+        MarketplaceStat.bucket >= since,
+        MarketplaceStat.metric.in_(list(metrics)),
+    ).group_by(MarketplaceStat.metric, MarketplaceStat.bucket).all()
+    return {(metric, bucket): (count, amount) for metric, bucket, count, amount in rows}
+
+
+def top_sales_brands(db: Session, limit: int = 5):
+    """Marcas mais vendidas: [(marca, vendas)]"""
+    sales = func.sum(MarketplaceStat.count)
+    rows = db.query(MarketplaceStat.metric, sales).filter(
+        MarketplaceStat.period == "total",
+        MarketplaceStat.bucket == TOTAL_BUCKET,
+        MarketplaceStat.metric.like(f"{SALES_BRAND_PREFIX}%"),
+    ).group_by(MarketplaceStat.metric).having(sales > 0).order_by(sales.desc()).limit(limit).all()
+    return [(metric[len(SALES_BRAND_PREFIX):], count) for metric, count in rows]
+
+
+# ========================= REBUILD (BACKFILL) =========================
+
+def _day_expr(column, dialect: str):
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d", column)
+    if dialect == "postgresql":
+        return func.to_char(column, "YYYY-MM-DD")
+    return func.date(column)
+
+
+def _add_daily(delta: StatsDelta, metric: str, day, count: int, amount: float = 0.0):
+    if day is None:
+        delta.gauge(metric, count, amount)
+    else:
+        delta.flow(metric, datetime.strptime(str(day)[:10], "%Y-%m-%d"), count, amount)
+
+
+def rebuild(db: Session):
+    """Recalcula todas as estatísticas a partir das tabelas de origem"""
+    dialect = db.get_bind().dialect.name
+    delta = StatsDelta()
+
+    for metric, model in (("users.new", User), ("stores.new", Store), ("watches.new", Watch)):
+        day = _day_expr(model.created_at, dialect)
+        for d, count in db.query(day, func.count(model.id)).group_by(day).all():
+            _add_daily(delta, metric, d, count)
+
+    day = _day_expr(OwnershipTransfer.created_at, dialect)
+    for d, transfer_type, count, amount in db.query(
+        day, OwnershipTransfer.type, func.count(OwnershipTransfer.id),
+        func.coalesce(func.sum(OwnershipTransfer.price_brl), 0)
+    ).group_by(day, OwnershipTransfer.type).all():
+        _add_daily(delta, f"transfers.{transfer_type}", d, count, amount)
+
+    day = _day_expr(Commission.created_at, dialect)
+    for d, count, amount in db.query(
+        day, func.count(Commission.id), func.coalesce(func.sum(Commission.amount_brl), 0)
+    ).group_by(day).all():
+        _add_daily(delta, "commissions", d, count, amount)
+
+    for brand, count, amount in db.query(
+        Watch.brand, func.count(OwnershipTransfer.id), func.coalesce(func.sum(OwnershipTransfer.price_brl), 0)
+    ).join(OwnershipTransfer, OwnershipTransfer.watch_id == Watch.id).filter(
+        OwnershipTransfer.type == "sale", Watch.brand.isnot(None)
+    ).group_by(Watch.brand).all():
+        delta.gauge(f"{SALES_BRAND_PREFIX}{brand}", count, amount)
+
+    for role, count, brl, xlm in db.query(
+        User.role, func.count(User.id),
+        func.coalesce(func.sum(User.balance_brl), 0), func.coalesce(func.sum(User.balance_xlm), 0)
+    ).group_by(User.role).all():
+        delta.gauge(f"users.role.{role}", count)
+        delta.gauge("users.balance_brl", amount=brl)
+        delta.gauge("users.balance_xlm", amount=xlm)
+
+    for status, count in db.query(Watch.status, func.count(Watch.id)).group_by(Watch.status).all():
+        delta.gauge(f"watches.status.{_watch_status(status)}", count)
+
+    delta.gauge("stores.credentialed", db.query(Store).filter(Store.credentialed == True).count())
+    delta.gauge("evaluators.active", db.query(Evaluator).filter(Evaluator.active != False).count())
+
+    db.query(MarketplaceStat).delete()
+    delta.apply(db.connection())
+    db.commit()
+
+
+def drop_outdated_table(engine):
+    """
+    O rollup é derivado das tabelas de origem: se a tabela ainda tem o
+    formato antigo (sem `shard`), é descartada para ser recriada e
+    reconstruída por backfill_if_empty.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(MarketplaceStat.__tablename__):
+        return
+    if "shard" not in {column["name"] for column in inspector.get_columns(MarketplaceStat.__tablename__)}:
+        MarketplaceStat.__table__.drop(bind=engine)
+
+
+def backfill_if_empty(engine):
+    """Na primeira execução (tabela vazia), popula as estatísticas a partir do histórico"""
+    with Session(bind=engine) as db:
+        if db.query(MarketplaceStat.id).first() is None:
+            rebuild(db)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print(f"Estatísticas reconstruídas: {db.query(MarketplaceStat).count()} linhas")
+    finally:
+        db.close()
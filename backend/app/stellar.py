@@ -1,5 +1,3 @@
-from stellar_sdk import Server, Keypair, TransactionBuilder, Network, Asset, Account
-from stellar_sdk.exceptions import SdkError
 import os
 import hashlib
 import time
@@ -19,6 +17,7 @@ if SIMULATION_MODE:
     MARKETPLACE_KEYPAIR_SECRET = "SDKJLASDJKLASDJKLASDJKLASDJKLASDJKLASDJKLASDJKLASDJKLASDJKL"
 else:
     # Em produção, usar chaves reais do .env
+    from stellar_sdk import Keypair
     MARKETPLACE_SECRET = os.getenv("MARKETPLACE_SECRET")
     if MARKETPLACE_SECRET and MARKETPLACE_SECRET.startswith("SD"):
         try:
@@ -87,6 +86,9 @@ def transfer_nft(asset_code: str, from_secret: str, to_public: str):
     """
     Transfere um NFT de um usuário para outro
     """
+    # stellar_sdk é importado sob demanda: leva centenas de ms e a maioria dos workers nunca o usa
+    from stellar_sdk import Keypair
+    
     try:
         # Simular transferência do NFT
         tx_hash = hashlib.sha256(
@@ -107,35 +109,69 @@ def transfer_nft(asset_code: str, from_secret: str, to_public: str):
             "error": str(e)
         }
 
-def get_nft_history(asset_code: str):
+def get_nft_history(asset_code: str, db, asset_issuer: str = None, limit: int = 100):
     """
-    Obtém o histórico de transações de um NFT
+    Obtém o histórico de transações de um NFT a partir do banco, mantido
+    pela ingestão do Horizon (app/stellar_ingest.py)
     """
-    try:
-        # Simular busca do histórico na blockchain
-        # Em ambiente real, consultaria o Horizon API
-        return {
-            "asset_code": asset_code,
-            "issuer": MARKETPLACE_KEYPAIR.public_key,
-            "transactions": [
-                {
-                    "type": "create_account",
-                    "hash": f"tx_create_{asset_code}",
-                    "created_at": "2025-08-02T10:00:00Z"
-                },
-                {
-                    "type": "payment",
-                    "hash": f"tx_mint_{asset_code}",
-                    "created_at": "2025-08-02T10:01:00Z"
-                }
-            ]
-        }
-    
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e)
+    from app.models import StellarTransaction
+
+    query = db.query(StellarTransaction).filter(StellarTransaction.asset_code == asset_code)
+    if asset_issuer:
+        query = query.filter(StellarTransaction.asset_issuer == asset_issuer)
+    transactions = query.order_by(StellarTransaction.created_at, StellarTransaction.id).limit(limit).all()
+
+    return {
+        "asset_code": asset_code,
+        "issuer": asset_issuer,
+        "transactions": [
+            {
+                "type": tx.transaction_type,
+                "hash": tx.transaction_hash,
+                "from": tx.from_account,
+                "to": tx.to_account,
+                "created_at": tx.created_at.isoformat() + "Z" if tx.created_at else None
+            }
+            for tx in transactions
+        ]
+    }
+
+def get_nft_verification(watch_id: int, db):
+    """
+    Verifica o NFT pelo espelho local da blockchain: o dono registrado na
+    Stellar (ingerido do Horizon) deve ser a carteira do dono na plataforma
+    """
+    return get_nft_verifications([watch_id], db).get(watch_id)
+
+def get_nft_verifications(watch_ids, db):
+    """
+    Verificação em lote pelo espelho local, numa consulta só. Relógios sem
+    NFT ficam fora do dicionário retornado.
+    """
+    from app.models import NFTToken, User, Watch
+
+    rows = (
+        db.query(NFTToken, Watch, User.stellar_public_key)
+        .join(Watch, Watch.id == NFTToken.watch_id)
+        .outerjoin(User, User.id == Watch.current_owner_user_id)
+        .filter(NFTToken.watch_id.in_(list(watch_ids)))
+        .all()
+    )
+    verifications = {}
+    for token, watch, owner_key in rows:
+        verified = bool(owner_key) and token.current_owner_stellar_key == owner_key
+        verifications[token.watch_id] = {
+            "watch_id": token.watch_id,
+            "nft_token": token.token_id,
+            "nft_valid": verified,
+            "blockchain_verified": verified,
+            "current_owner_stellar_key": token.current_owner_stellar_key,
+            "certificate_hash": watch.laudo_hash,
+            "mint_tx": token.mint_transaction_hash,
+            "last_transfer_tx": token.last_transfer_hash,
+            "verified_at": token.updated_at.isoformat() if token.updated_at else None
         }
+    return verifications
 
 def simulate_payment_conversion(amount_brl: float, payment_method: str, installments: int = 1):
     """
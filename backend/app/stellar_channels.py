@@ -0,0 +1,142 @@
+"""
+Números de sequência locais e contas de canal para submissões paralelas.
+
+Toda transação Stellar precisa do próximo número de sequência da conta de
+origem. Buscar a sequência no Horizon antes de cada envio (`load_account`)
+custa uma ida à rede e, com envios concorrentes da mesma conta, dois
+pedidos recebem a mesma sequência e um deles falha com `tx_bad_seq`.
+
+- `SequenceManager` busca a sequência uma vez por conta e depois reserva
+  números localmente (thread-safe). Se o Horizon recusar um envio com
+  `tx_bad_seq`, a conta é invalidada e a próxima reserva recarrega do
+  Horizon; outras falhas não descartam as reservas de envios em voo (uma
+  sequência pulada aparece como `tx_bad_seq` no envio seguinte).
+- `ChannelPool` mantém contas de canal: a transação usa o canal como
+  origem (sequência e taxa) e as operações continuam saindo da conta do
+  lote (master, emissora do NFT, dono, escrow), que só assina. Cada canal
+  leva no máximo uma transação em voo, então N canais permitem N envios
+  paralelos sem disputa de sequência e sem carregar a conta de cada
+  emissora ou escrow recém-criada.
+
+Canais são configurados em STELLAR_CHANNEL_SECRETS (secrets separados por
+vírgula); as contas precisam existir e ter saldo para as taxas.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from stellar_sdk import Account, Keypair
+from stellar_sdk.exceptions import BadRequestError
+
+# Contas com sequência em cache (emissoras e escrows são criadas aos milhares)
+MAX_CACHED_ACCOUNTS = 10000
+
+
+def is_bad_sequence(error: Exception) -> bool:
+    """Horizon recusou a transação por número de sequência desatualizado"""
+    if not isinstance(error, BadRequestError):
+        return False
+    result_codes = (error.extras or {}).get("result_codes") or {}
+    return result_codes.get("transaction") == "tx_bad_seq"
+
+
+class SequenceManager:
+    """
+    Cache local de números de sequência por conta.
+
+    `next_account` devolve um `Account` pronto para o TransactionBuilder e
+    já avança o contador local, então chamadas concorrentes nunca recebem a
+    mesma sequência.
+    """
+
+    def __init__(self, max_accounts: int = MAX_CACHED_ACCOUNTS):
+        self._sequences: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_accounts = max_accounts
+
+    def _reserve(self, account_id: str) -> Optional[Account]:
+        with self._lock:
+            sequence = self._sequences.get(account_id)
+            if sequence is None:
+                return None
+            self._sequences[account_id] = sequence + 1
+            self._sequences.move_to_end(account_id)
+            return Account(account_id, sequence)
+
+    def _store(self, account_id: str, sequence: int):
+        with self._lock:
+            # Outro envio pode ter carregado a conta enquanto esperávamos o Horizon
+            if account_id not in self._sequences:
+                self._sequences[account_id] = sequence
+                while len(self._sequences) > self.max_accounts:
+                    self._sequences.popitem(last=False)
+
+    def next_account(self, account_id: str, load_account: Callable[[str], Account]) -> Account:
+        account = self._reserve(account_id)
+        if account is None:
+            self._store(account_id, load_account(account_id).sequence)
+            account = self._reserve(account_id)
+        return account
+
+    async def next_account_async(self, account_id: str,
+                                 load_account: Callable[[str], Awaitable[Account]]) -> Account:
+        account = self._reserve(account_id)
+        if account is None:
+            self._store(account_id, (await load_account(account_id)).sequence)
+            account = self._reserve(account_id)
+        return account
+
+    def invalidate(self, account_id: str):
+        """Descarta a sequência local; a próxima reserva recarrega do Horizon"""
+        with self._lock:
+            self._sequences.pop(account_id, None)
+
+
+class ChannelPool:
+    """
+    Pool de contas de canal, cada uma emprestada a uma transação por vez.
+    """
+
+    def __init__(self, channel_secrets: List[str]):
+        self.channels = [Keypair.from_secret(secret) for secret in channel_secrets]
+        self._free = list(self.channels)
+        self._available = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> "ChannelPool":
+        secrets = os.getenv("STELLAR_CHANNEL_SECRETS", "")
+        return cls([secret.strip() for secret in secrets.split(",") if secret.strip()])
+
+    def __len__(self):
+        return len(self.channels)
+
+    def try_acquire(self) -> Optional[Keypair]:
+        with self._available:
+            return self._free.pop() if self._free else None
+
+    def acquire(self, timeout: Optional[float] = None) -> Keypair:
+        """Espera um canal livre (bloqueante)"""
+        with self._available:
+            if not self._available.wait_for(lambda: self._free, timeout=timeout):
+                raise TimeoutError("Nenhuma conta de canal livre")
+            return self._free.pop()
+
+    async def acquire_async(self, timeout: Optional[float] = None, poll_interval: float = 0.01) -> Keypair:
+        """Espera um canal livre sem bloquear o event loop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            channel = self.try_acquire()
+            if channel is not None:
+                return channel
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Nenhuma conta de canal livre")
+            await asyncio.sleep(poll_interval)
+
+    def release(self, channel: Keypair):
+        with self._available:
+            self._free.append(channel)
+            self._available.notify()
@@ -1,31 +1,50 @@
 # CONTRATOS STELLAR - MARKETPLACE DE RELÓGIOS NFT
 # Implementação dos contratos de Registro, Escrow e NFT
 
-import json
-import hashlib
+import re
 import uuid
 import os
+import threading
+import time
+from functools import cached_property
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Dict, Optional, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
 from stellar_sdk import (
-    Server, Keypair, Account, TransactionBuilder, Asset, 
-    Payment, ChangeTrust, ManageData, TextMemo
+    Server, ServerAsync, Keypair, Account, TransactionBuilder, Asset, 
+    Payment, ChangeTrust, ManageData, TextMemo, HashMemo
 )
-from stellar_sdk.exceptions import BadRequestError
-import boto3
-from botocore.exceptions import ClientError
+from stellar_sdk.memo import Memo
+from stellar_sdk.client.aiohttp_client import AiohttpClient
+from stellar_sdk.exceptions import BadRequestError, NotFoundError
+from stellar_sdk.muxed_account import MuxedAccount
 
-from .models import Watch, OwnershipTransfer, Escrow, NFTToken
+from .models import Watch, OwnershipTransfer, Escrow, NFTToken, EvaluationReport, Evaluator
 from .database import get_db
+from .jobs import Checkpoint
+from .stellar_channels import SequenceManager, ChannelPool, is_bad_sequence
+from .report_uploads import ReportUploader
+from .metrics import stellar_call
+
+# Configuráveis para apontar para um Horizon local (ver benchmarks/fake_horizon.py)
+HORIZON_URL = os.getenv("STELLAR_HORIZON_URL", "https://horizon-testnet.stellar.org")
+FRIENDBOT_URL = os.getenv("STELLAR_FRIENDBOT_URL", "https://friendbot.stellar.org")
+
+# Conexões simultâneas mantidas abertas com o Horizon no modo assíncrono
+HORIZON_POOL_SIZE = int(os.getenv("STELLAR_HORIZON_POOL_SIZE", "50"))
 
 class StellarContracts:
     """
     Gerenciador dos contratos Stellar para o marketplace
     """
     
-    def __init__(self):
-        self.server = Server("https://horizon-testnet.stellar.org")
+    def __init__(self, horizon_url: str = HORIZON_URL, friendbot_url: str = FRIENDBOT_URL):
+        self.horizon_url = horizon_url
+        self.friendbot_url = friendbot_url
+        
+        # Cliente assíncrono (aiohttp), criado no primeiro uso e fechado no shutdown
+        self.async_server: Optional[ServerAsync] = None
+        self.async_client: Optional[AiohttpClient] = None
         self.network_passphrase = "Test SDF Network ; September 2015"
         
         # Conta master da plataforma (gerar dinamicamente ou usar variável ambiente)
@@ -43,9 +62,266 @@ class StellarContracts:
         # Taxa de rede Stellar
         self.base_fee = 100
         
+        # Sequências locais por conta e canais que dão origem (sequência e taxa) às transações
+        self.sequences = SequenceManager()
+        self.channels = ChannelPool.from_env()
+        
         # S3 para armazenar laudos
-        self.s3_client = boto3.client('s3')
         self.bucket_name = "marketplace-relogios-laudos"
+    
+    @cached_property
+    def server(self) -> Server:
+        """Server síncrono (sessão requests), criado no primeiro uso"""
+        return Server(self.horizon_url)
+    
+    @cached_property
+    def s3_client(self):
+        """Cliente S3, criado no primeiro uso (importar/configurar o boto3 é caro)"""
+        import boto3
+        return boto3.client('s3')
+    
+    def _open_async(self, pool_size: int = HORIZON_POOL_SIZE) -> ServerAsync:
+        # A sessão aiohttp só é aberta na primeira requisição, então não exige event loop aqui
+        if self.async_server is None:
+            self.async_client = AiohttpClient(pool_size=pool_size)
+            self.async_server = ServerAsync(self.horizon_url, client=self.async_client)
+        return self.async_server
+    
+    async def open_async(self, pool_size: int = HORIZON_POOL_SIZE) -> ServerAsync:
+        """
+        Abre o ServerAsync com uma sessão aiohttp compartilhada (pool de conexões).
+        Opcional: `aserver` abre com o tamanho padrão no primeiro uso.
+        """
+        return self._open_async(pool_size)
+    
+    async def close_async(self):
+        """Fecha a sessão aiohttp (shutdown da aplicação)"""
+        if self.async_server is not None:
+            await self.async_server.close()
+            self.async_server = None
+            self.async_client = None
+    
+    @property
+    def aserver(self) -> ServerAsync:
+        """ServerAsync compartilhado, aberto no primeiro uso"""
+        return self._open_async()
+    
+    async def fund_account_async(self, public_key: str):
+        """Cria conta na Testnet via Friendbot usando a sessão compartilhada"""
+        self._open_async()
+        response = await self.async_client.get(self.friendbot_url, params={"addr": public_key})
+        if response.status_code != 200:
+            raise Exception("Erro ao criar conta Stellar")
+    
+    def load_account_json(self, account_id: str) -> dict:
+        """JSON da conta no Horizon (saldos, sequência, signatários)"""
+        return self.server.accounts().account_id(account_id).call()
+    
+    def account_exists(self, account_id: str) -> bool:
+        try:
+            self.load_account_json(account_id)
+        except NotFoundError:
+            return False
+        return True
+    
+    async def account_exists_async(self, account_id: str) -> bool:
+        try:
+            await self.aserver.accounts().account_id(account_id).call()
+        except NotFoundError:
+            return False
+        return True
+    
+    def transaction_status(self, tx_hash: str) -> Optional[bool]:
+        """True/False se a transação entrou no ledger (com ou sem sucesso); None se o Horizon não a conhece"""
+        try:
+            return bool(self.server.transactions().transaction(tx_hash).call().get("successful"))
+        except NotFoundError:
+            return None
+    
+    async def transaction_status_async(self, tx_hash: str) -> Optional[bool]:
+        try:
+            return bool((await self.aserver.transactions().transaction(tx_hash).call()).get("successful"))
+        except NotFoundError:
+            return None
+
+class PendingTransaction(Exception):
+    """Transação de uma tentativa anterior ainda pode entrar no ledger: reenviar agora pagaria duas vezes"""
+
+class TransactionBatch:
+    """
+    Agrupa as operações de uma ação de negócio em uma única transação
+    multi-operação: um load_account, uma assinatura por signatário e um
+    submit. As operações são atômicas na rede (todas ou nenhuma).
+    
+        batch = TransactionBatch(stellar, escrow_keypair, memo="ESCROW-RELEASE:1")
+        batch.payment(admin_key, usdc, "8").payment(seller_key, usdc, "92")
+        tx_hash = batch.submit()["hash"]
+    """
+    
+    # Limite de operações por transação na Stellar
+    MAX_OPERATIONS = 100
+    # Tentativas quando o Horizon recusa por sequência desatualizada (tx_bad_seq)
+    SUBMIT_ATTEMPTS = 3
+    # Espera máxima por um canal livre
+    CHANNEL_TIMEOUT = 30
+    
+    def __init__(self, stellar: StellarContracts, source_keypair: Keypair,
+                 memo=None, timeout: int = 30, use_channels: Optional[bool] = None):
+        self.stellar = stellar
+        self.source_keypair = source_keypair
+        self.memo = memo
+        self.timeout = timeout
+        self.operations = []
+        self._signers = {source_keypair.public_key: source_keypair}
+        
+        # Com canais configurados, toda transação sai por um canal: o canal paga a taxa e
+        # fornece a sequência, então mint, transferência e escrow não disputam (nem
+        # carregam do Horizon) a sequência da emissora, do usuário ou da conta de escrow
+        if use_channels is None:
+            use_channels = True
+        self.use_channels = use_channels and len(stellar.channels) > 0
+    
+    def __len__(self):
+        return len(self.operations)
+    
+    def add(self, operation, signer: Optional[Keypair] = None) -> "TransactionBatch":
+        """Adiciona uma operação; `signer` assina operações com outra conta de origem"""
+        if len(self.operations) >= self.MAX_OPERATIONS:
+            raise ValueError(f"Lote excede {self.MAX_OPERATIONS} operações")
+        self.operations.append(operation)
+        if signer is not None:
+            self._signers.setdefault(signer.public_key, signer)
+        return self
+    
+    def payment(self, destination: str, asset: Asset, amount, source: Optional[Keypair] = None) -> "TransactionBatch":
+        return self.add(Payment(
+            destination=destination,
+            asset=asset,
+            amount=str(amount),
+            source=source.public_key if source else None
+        ), source)
+    
+    def change_trust(self, asset: Asset, source: Optional[Keypair] = None) -> "TransactionBatch":
+        return self.add(ChangeTrust(asset=asset, source=source.public_key if source else None), source)
+    
+    def build(self, source_account: Account, channel: Optional[Keypair] = None):
+        """
+        Monta e assina a transação com todos os signatários do lote. Com
+        `channel`, o canal é a origem da transação e as operações sem origem
+        explícita continuam saindo da conta do lote.
+        """
+        if not self.operations:
+            raise ValueError("Lote de transação sem operações")
+        
+        if channel is not None:
+            for operation in self.operations:
+                if operation.source is None:
+                    operation.source = MuxedAccount.from_account(self.source_keypair.public_key)
+        
+        builder = TransactionBuilder(
+            source_account=source_account,
+            network_passphrase=self.stellar.network_passphrase,
+            base_fee=self.stellar.base_fee
+        )
+        for operation in self.operations:
+            builder.append_operation(operation)
+        if isinstance(self.memo, Memo):
+            builder.add_memo(self.memo)
+        elif self.memo:
+            builder.add_text_memo(self.memo)
+        
+        transaction = builder.set_timeout(self.timeout).build()
+        for keypair in self._signers.values():
+            transaction.sign(keypair)
+        if channel is not None and channel.public_key not in self._signers:
+            transaction.sign(channel)
+        return transaction
+    
+    def submit(self, on_built: Optional[Callable] = None) -> Dict:
+        """Envia o lote; `on_built(envelope)` roda com a transação assinada, antes de cada envio"""
+        for attempt in range(1, self.SUBMIT_ATTEMPTS + 1):
+            channel = self.stellar.channels.acquire(timeout=self.CHANNEL_TIMEOUT) if self.use_channels else None
+            try:
+                tx_source = (channel or self.source_keypair).public_key
+                source_account = self.stellar.sequences.next_account(tx_source, self.stellar.server.load_account)
+                try:
+                    envelope = self.build(source_account, channel)
+                    if on_built is not None:
+                        on_built(envelope)
+                    response = self.stellar.server.submit_transaction(envelope)
+                except Exception as e:
+                    # Só tx_bad_seq prova que o contador local divergiu da rede; invalidar em
+                    # outras falhas descartaria as reservas de envios ainda em voo
+                    if is_bad_sequence(e):
+                        self.stellar.sequences.invalidate(tx_source)
+                    raise
+                return response
+            except Exception as e:
+                if not is_bad_sequence(e) or attempt == self.SUBMIT_ATTEMPTS:
+                    raise
+            finally:
+                if channel is not None:
+                    self.stellar.channels.release(channel)
+    
+    async def submit_async(self, on_built: Optional[Callable] = None) -> Dict:
+        for attempt in range(1, self.SUBMIT_ATTEMPTS + 1):
+            channel = await self.stellar.channels.acquire_async(timeout=self.CHANNEL_TIMEOUT) if self.use_channels else None
+            try:
+                tx_source = (channel or self.source_keypair).public_key
+                source_account = await self.stellar.sequences.next_account_async(tx_source, self.stellar.aserver.load_account)
+                try:
+                    envelope = self.build(source_account, channel)
+                    if on_built is not None:
+                        on_built(envelope)
+                    response = await self.stellar.aserver.submit_transaction(envelope)
+                except Exception as e:
+                    if is_bad_sequence(e):
+                        self.stellar.sequences.invalidate(tx_source)
+                    raise
+                return response
+            except Exception as e:
+                if not is_bad_sequence(e) or attempt == self.SUBMIT_ATTEMPTS:
+                    raise
+            finally:
+                if channel is not None:
+                    self.stellar.channels.release(channel)
+
+    def submit_once(self, checkpoint: Checkpoint, name: str) -> str:
+        """
+        Envia o lote no máximo uma vez por job: o hash da transação montada é
+        gravado no checkpoint antes do envio e, numa nova tentativa,
+        consultado no Horizon. Se já entrou no ledger, não reenvia.
+        """
+        recorded = checkpoint.get(name)
+        if recorded and self._settled(recorded, self.stellar.transaction_status(recorded["hash"])):
+            return recorded["hash"]
+        return self.submit(on_built=self._recorder(checkpoint, name))["hash"]
+    
+    async def submit_once_async(self, checkpoint: Checkpoint, name: str) -> str:
+        recorded = checkpoint.get(name)
+        if recorded and self._settled(recorded, await self.stellar.transaction_status_async(recorded["hash"])):
+            return recorded["hash"]
+        return (await self.submit_async(on_built=self._recorder(checkpoint, name)))["hash"]
+    
+    @staticmethod
+    def _settled(recorded: Dict, status: Optional[bool]) -> bool:
+        """True se a transação gravada entrou com sucesso; False se é seguro montar outra"""
+        if status is None and time.time() <= recorded["max_time"]:
+            raise PendingTransaction(f"Transação {recorded['hash']} ainda pode entrar no ledger até {recorded['max_time']}")
+        return bool(status)
+    
+    @staticmethod
+    def _recorder(checkpoint: Checkpoint, name: str) -> Callable:
+        def record(envelope):
+            checkpoint.save(**{name: {
+                "hash": envelope.hash_hex(),
+                "max_time": envelope.transaction.preconditions.time_bounds.max_time,
+            }})
+        return record
+
+def nft_asset_code(watch_serial: str) -> str:
+    """Código do asset NFT: "NRF" + serial (só alfanuméricos, até 12 chars no total)"""
+    return "NRF" + re.sub(r"[^A-Za-z0-9]", "", watch_serial)[:9]
 
 # ========================= 1. CONTRATO DE REGISTRO DE RELÓGIOS =========================
 
@@ -56,7 +332,12 @@ class WatchRegistrationContract:
     
     def __init__(self, stellar_contracts: StellarContracts):
         self.stellar = stellar_contracts
-        
+    
+    @cached_property
+    def uploads(self) -> ReportUploader:
+        """Uploads de laudos (cria o cliente S3 só quando usado)"""
+        return ReportUploader(self.stellar.s3_client, self.stellar.bucket_name)
+    
     def validate_evaluation_report(self, report_data: Dict) -> bool:
         """
         Valida o laudo de avaliação
@@ -77,167 +358,309 @@ class WatchRegistrationContract:
             
         return True
     
-    def upload_report_to_s3(self, report_data: Dict, watch_serial: str) -> str:
+    def upload_report_to_s3(self, report_data: Dict, watch_serial: str, db=None) -> str:
         """
-        Upload do laudo para S3 e retorna hash SHA256
+        Upload do laudo para S3 e retorna hash SHA256 (com `db`, laudos já
+        registrados não são enviados de novo)
         """
-        try:
-            # Serializar JSON de forma determinística
-            report_json = json.dumps(report_data, sort_keys=True, separators=(',', ':'))
-            
-            # Calcular hash SHA256
-            report_hash = hashlib.sha256(report_json.encode()).hexdigest()
-            
-            # Nome do arquivo
-            file_key = f"laudos/{watch_serial}/{report_hash}.json"
-            
-            # Upload para S3
-            self.stellar.s3_client.put_object(
-                Bucket=self.stellar.bucket_name,
-                Key=file_key,
-                Body=report_json,
-                ContentType='application/json',
-                Metadata={
-                    'watch_serial': watch_serial,
-                    'evaluator_id': str(report_data['evaluator_id']),
-                    'timestamp': report_data['timestamp']
-                }
-            )
-            
-            return report_hash
-            
-        except ClientError as e:
-            raise Exception(f"Erro ao fazer upload do laudo: {e}")
+        return self.uploads.upload_report(report_data, watch_serial, db)["sha256"]
     
-    def mint_watch_nft(self, watch_serial: str, owner_public_key: str, report_hash: str) -> Tuple[str, str]:
+    async def upload_report_to_s3_async(self, report_data: Dict, watch_serial: str) -> str:
         """
-        Cria NFT único para o relógio na Stellar
+        Versão assíncrona de upload_report_to_s3 (executor limitado, fora do event loop)
         """
+        return (await self.uploads.upload_report_async(report_data, watch_serial))["sha256"]
+    
+    def mint_watch_nft(self, watch_serial: str, owner_public_key: str, report_hash: str,
+                       owner_secret: Optional[str] = None,
+                       checkpoint: Optional[Checkpoint] = None) -> Tuple[str, str, str]:
+        """
+        Cria NFT único para o relógio na Stellar (código do asset, emissor e hash da transação).
+        Com `checkpoint`, uma nova tentativa reaproveita a emissora e não emite duas vezes.
+        """
+        checkpoint = checkpoint or Checkpoint()
         try:
-            # Código do asset único
-            asset_code = f"NRF-{watch_serial[:6]}"  # Limitado a 12 chars
+            with stellar_call("mint"):
+                # Código do asset único
+                asset_code = nft_asset_code(watch_serial)  # Limitado a 12 chars
             
-            # Criar conta emissora (ou usar existente)
-            issuer_keypair = Keypair.random()
-            issuer_account = issuer_keypair.public_key
+                # Conta emissora: gravada antes de ser criada na rede
+                issuer_keypair, retry = self._issuer(checkpoint)
+                issuer_account = issuer_keypair.public_key
+                if not retry or not self.stellar.account_exists(issuer_account):
+                    self._create_stellar_account(issuer_account)
             
-            # Criar conta emissora na rede
-            self._create_stellar_account(issuer_account)
+                # Trustline do dono + emissão de 1 unidade em uma única transação
+                batch = self._mint_batch(issuer_keypair, owner_public_key, owner_secret, asset_code, watch_serial, report_hash)
+                tx_hash = batch.submit_once(checkpoint, "mint_tx")
             
-            # Asset NFT
-            nft_asset = Asset(asset_code, issuer_account)
+                return asset_code, issuer_account, tx_hash
             
-            # Criar trustline do dono para o asset
-            self._create_trustline(owner_public_key, nft_asset)
+        except Exception as e:
+            raise Exception(f"Erro ao criar NFT: {e}")
+    
+    async def mint_watch_nft_async(self, watch_serial: str, owner_public_key: str, report_hash: str,
+                                   owner_secret: Optional[str] = None,
+                                   checkpoint: Optional[Checkpoint] = None) -> Tuple[str, str, str]:
+        """
+        Versão assíncrona de mint_watch_nft (não ocupa o threadpool do FastAPI)
+        """
+        checkpoint = checkpoint or Checkpoint()
+        try:
+            with stellar_call("mint"):
+                asset_code = nft_asset_code(watch_serial)
+                issuer_keypair, retry = self._issuer(checkpoint)
+                issuer_account = issuer_keypair.public_key
             
-            # Emitir 1 unidade do NFT
-            source_account = self.stellar.server.load_account(issuer_account)
-            
-            transaction = (
-                TransactionBuilder(
-                    source_account=source_account,
-                    network_passphrase=self.stellar.network_passphrase,
-                    base_fee=self.stellar.base_fee
-                )
-                .append_payment_op(
-                    destination=owner_public_key,
-                    asset=nft_asset,
-                    amount="1"
-                )
-                .add_text_memo(f"NFT-MINT:{watch_serial}:{report_hash}")
-                .set_timeout(30)
-                .build()
-            )
+                if not retry or not await self.stellar.account_exists_async(issuer_account):
+                    await self.stellar.fund_account_async(issuer_account)
             
-            transaction.sign(issuer_keypair)
-            response = self.stellar.server.submit_transaction(transaction)
+                batch = self._mint_batch(issuer_keypair, owner_public_key, owner_secret, asset_code, watch_serial, report_hash)
+                tx_hash = await batch.submit_once_async(checkpoint, "mint_tx")
             
-            return asset_code, issuer_account
+                return asset_code, issuer_account, tx_hash
             
         except Exception as e:
             raise Exception(f"Erro ao criar NFT: {e}")
     
-    def register_watch(self, evaluation_data: Dict, owner_user_id: int) -> Dict:
+    @staticmethod
+    def _issuer(checkpoint: Checkpoint) -> Tuple[Keypair, bool]:
+        """Emissora do mint e se ela vem de uma tentativa anterior"""
+        secret = checkpoint.get("issuer_secret")
+        if secret:
+            return Keypair.from_secret(secret), True
+        keypair = Keypair.random()
+        checkpoint.save(issuer=keypair.public_key, issuer_secret=keypair.secret)  # Em produção: criptografar
+        return keypair, False
+    
+    @staticmethod
+    def _mint_memo(watch_serial: str, report_hash: str):
+        """Memo de texto aceita só 28 bytes: o SHA256 do laudo vai on-chain como memo hash"""
+        if re.fullmatch(r"[0-9a-f]{64}", report_hash or ""):
+            return HashMemo(report_hash)
+        return f"NFT-MINT:{watch_serial}"[:28]
+    
+    def _mint_batch(self, issuer_keypair: Keypair, owner_public_key: str, owner_secret: Optional[str],
+                    asset_code: str, watch_serial: str, report_hash: str) -> TransactionBatch:
+        """Lote do mint: trustline do dono (se a chave dele estiver disponível) + pagamento de 1 NFT"""
+        nft_asset = Asset(asset_code, issuer_keypair.public_key)
+        batch = TransactionBatch(self.stellar, issuer_keypair, memo=self._mint_memo(watch_serial, report_hash))
+        
+        if owner_secret:
+            batch.change_trust(nft_asset, source=Keypair.from_secret(owner_secret))
+        else:
+            # Sem a chave do dono a trustline fica a cargo da carteira dele
+            self._create_trustline(owner_public_key, nft_asset)
+        
+        return batch.payment(owner_public_key, nft_asset, "1")
+    
+    def register_watch(self, evaluation_data: Dict, owner_user_id: int,
+                       checkpoint: Optional[Checkpoint] = None) -> Dict:
         """
         Processo completo de registro de relógio
         """
+        checkpoint = checkpoint or Checkpoint()
         db = next(get_db())
         
         try:
-            # 1. Validar laudo
-            self.validate_evaluation_report(evaluation_data)
-            
-            # 2. Verificar se serial é único
-            existing_watch = db.query(Watch).filter(Watch.serial == evaluation_data['serial']).first()
-            if existing_watch:
-                raise ValueError(f"Relógio com serial {evaluation_data['serial']} já existe")
+            registered = self._registered(db, evaluation_data['serial'], checkpoint)
+            if registered:
+                return registered
+            owner = self._registration_owner(db, evaluation_data, owner_user_id)
             
-            # 3. Upload do laudo para S3 e hash
-            report_hash = self.upload_report_to_s3(evaluation_data, evaluation_data['serial'])
-            
-            # 4. Obter chave pública do dono (da tabela User)
-            from .models import User
-            owner = db.query(User).filter(User.id == owner_user_id).first()
-            if not owner or not owner.stellar_public_key:
-                raise ValueError("Usuário deve ter chave Stellar configurada")
+            # Upload do laudo para S3 e hash
+            upload = self.uploads.upload_report(evaluation_data, evaluation_data['serial'], db)
             
-            # 5. Mint NFT
-            asset_code, issuer_account = self.mint_watch_nft(
+            # Mint NFT
+            asset_code, issuer_account, tx_hash = self.mint_watch_nft(
                 evaluation_data['serial'], 
                 owner.stellar_public_key, 
-                report_hash
+                upload["sha256"],
+                owner_secret=owner.stellar_secret,
+                checkpoint=checkpoint
             )
             
-            # 6. Criar registro no banco
-            watch = Watch(
-                serial=evaluation_data['serial'],
-                brand=evaluation_data['brand'],
-                model=evaluation_data['model'],
-                condition=evaluation_data['condition'],
-                laudo_hash=report_hash,
-                nft_code=asset_code,
-                nft_issuer=issuer_account,
-                current_owner_user_id=owner_user_id,
-                price_brl=evaluation_data.get('estimated_value_brl', 0),
-                status="tokenized",
-                created_at=datetime.now(timezone.utc)
+            return self._record_registration(db, evaluation_data, owner, upload, asset_code, issuer_account, tx_hash)
+            
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Erro no registro: {e}")
+        finally:
+            db.close()
+    
+    async def register_watch_async(self, evaluation_data: Dict, owner_user_id: int,
+                                   checkpoint: Optional[Checkpoint] = None) -> Dict:
+        """
+        Versão assíncrona de register_watch (S3 no executor, friendbot e Horizon pela sessão aiohttp)
+        """
+        checkpoint = checkpoint or Checkpoint()
+        db = next(get_db())
+        
+        try:
+            registered = self._registered(db, evaluation_data['serial'], checkpoint)
+            if registered:
+                return registered
+            owner = self._registration_owner(db, evaluation_data, owner_user_id)
+            upload = await self.uploads.upload_report_async(evaluation_data, evaluation_data['serial'])
+            asset_code, issuer_account, tx_hash = await self.mint_watch_nft_async(
+                evaluation_data['serial'],
+                owner.stellar_public_key,
+                upload["sha256"],
+                owner_secret=owner.stellar_secret,
+                checkpoint=checkpoint
             )
+            return self._record_registration(db, evaluation_data, owner, upload, asset_code, issuer_account, tx_hash)
             
-            db.add(watch)
-            db.commit()
-            db.refresh(watch)
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Erro no registro: {e}")
+        finally:
+            db.close()
+    
+    async def tokenize_watch_async(self, watch_id: int, checkpoint: Optional[Checkpoint] = None) -> Dict:
+        """Mint do NFT de um relógio já cadastrado, para o dono atual"""
+        checkpoint = checkpoint or Checkpoint()
+        db = next(get_db())
+        
+        try:
+            watch = db.query(Watch).filter(Watch.id == watch_id).first()
+            if not watch:
+                raise ValueError("Relógio não encontrado")
             
-            # 7. Registrar NFT Token
-            nft_token = NFTToken(
-                watch_id=watch.id,
-                token_id=f"{asset_code}:{issuer_account}",
-                asset_code=asset_code,
-                issuer_account=issuer_account,
-                current_owner_stellar_key=owner.stellar_public_key,
-                metadata_hash=report_hash,
-                mint_transaction_hash=response['hash'],
-                created_at=datetime.now(timezone.utc)
+            nft_token = db.query(NFTToken).filter(NFTToken.watch_id == watch_id).first()
+            if nft_token:
+                # Tentativa anterior deste job já gravou o NFT
+                if nft_token.issuer_account == checkpoint.get("issuer"):
+                    return self._registration_result(watch, nft_token)
+                raise ValueError("Relógio já tokenizado")
+            
+            from .models import User
+            owner = db.query(User).filter(User.id == watch.current_owner_user_id).first()
+            if not owner or not owner.stellar_public_key:
+                raise ValueError("Usuário deve ter chave Stellar configurada")
+            
+            report_hash = watch.laudo_hash or ""
+            asset_code, issuer_account, tx_hash = await self.mint_watch_nft_async(
+                watch.serial_number,
+                owner.stellar_public_key,
+                report_hash,
+                owner_secret=owner.stellar_secret,
+                checkpoint=checkpoint
             )
             
+            watch.nft_code = asset_code
+            watch.nft_issuer = issuer_account
+            watch.status = "tokenized"
+            nft_token = self._nft_token(watch, owner, report_hash, asset_code, issuer_account, tx_hash)
             db.add(nft_token)
             db.commit()
-            
-            return {
-                "watch_id": watch.id,
-                "serial": watch.serial,
-                "nft_code": asset_code,
-                "nft_issuer": issuer_account,
-                "laudo_hash": report_hash,
-                "status": "tokenized",
-                "message": f"Relógio {watch.serial} tokenizado com sucesso!"
-            }
+            return self._registration_result(watch, nft_token)
             
         except Exception as e:
             db.rollback()
-            raise Exception(f"Erro no registro: {e}")
+            raise Exception(f"Erro na tokenização: {e}")
         finally:
             db.close()
     
+    def _registered(self, db, serial: str, checkpoint: Checkpoint) -> Optional[Dict]:
+        """Resultado do registro se uma tentativa anterior deste job já gravou o relógio"""
+        issuer = checkpoint.get("issuer")
+        if not issuer:
+            return None
+        watch = db.query(Watch).filter(Watch.serial_number == serial, Watch.nft_issuer == issuer).first()
+        if watch is None:
+            return None
+        return self._registration_result(watch, db.query(NFTToken).filter(NFTToken.watch_id == watch.id).one())
+    
+    def _registration_owner(self, db, evaluation_data: Dict, owner_user_id: int):
+        """Valida o laudo e o serial e devolve o dono (precisa de chave Stellar)"""
+        self.validate_evaluation_report(evaluation_data)
+        
+        existing_watch = db.query(Watch).filter(Watch.serial_number == evaluation_data['serial']).first()
+        if existing_watch:
+            raise ValueError(f"Relógio com serial {evaluation_data['serial']} já existe")
+        
+        from .models import User
+        owner = db.query(User).filter(User.id == owner_user_id).first()
+        if not owner or not owner.stellar_public_key:
+            raise ValueError("Usuário deve ter chave Stellar configurada")
+        return owner
+    
+    def _record_registration(self, db, evaluation_data: Dict, owner, upload: Dict,
+                             asset_code: str, issuer_account: str, tx_hash: str) -> Dict:
+        """Grava o relógio tokenizado, o laudo (hashes das evidências) e o NFT depois do mint"""
+        report_hash = upload["sha256"]
+        watch = Watch(
+            serial_number=evaluation_data['serial'],
+            brand=evaluation_data['brand'],
+            model=evaluation_data['model'],
+            condition=evaluation_data['condition'],
+            laudo_hash=report_hash,
+            nft_code=asset_code,
+            nft_issuer=issuer_account,
+            current_owner_user_id=owner.id,
+            price_brl=evaluation_data.get('estimated_value_brl', 0),
+            status="tokenized",
+            created_at=datetime.now(timezone.utc)
+        )
+        db.add(watch)
+        db.flush()
+        self._record_report(db, watch, evaluation_data, upload)
+        
+        nft_token = self._nft_token(watch, owner, report_hash, asset_code, issuer_account, tx_hash)
+        db.add(nft_token)
+        db.commit()
+        return self._registration_result(watch, nft_token)
+    
+    def _record_report(self, db, watch: Watch, evaluation_data: Dict, upload: Dict):
+        """
+        Registra o laudo em `evaluation_reports`: é o que faz os próximos
+        uploads do mesmo laudo, PDF ou fotos serem pulados (find_existing)
+        """
+        if db.query(EvaluationReport.id).filter(EvaluationReport.report_hash == upload["sha256"]).first():
+            return
+        evaluator_id = evaluation_data.get('evaluator_id')
+        if evaluator_id is not None and db.get(Evaluator, evaluator_id) is None:
+            evaluator_id = None  # Laudo de avaliador fora da plataforma
+        db.add(EvaluationReport(
+            watch_id=watch.id,
+            evaluator_id=evaluator_id,
+            report_hash=upload["sha256"],
+            s3_bucket=upload["bucket"],
+            s3_key=upload["key"],
+            condition=evaluation_data['condition'],
+            authenticity=evaluation_data.get("authenticity") or "unknown",
+            estimated_value_brl=evaluation_data.get('estimated_value_brl'),
+            photos_hashes=list(evaluation_data.get('photos_hashes') or []),
+            pdf_hash=evaluation_data.get('pdf_hash'),
+        ))
+    
+    @staticmethod
+    def _nft_token(watch: Watch, owner, report_hash: str, asset_code: str, issuer_account: str, tx_hash: str) -> NFTToken:
+        return NFTToken(
+            watch_id=watch.id,
+            token_id=f"{asset_code}:{issuer_account}",
+            asset_code=asset_code,
+            issuer_account=issuer_account,
+            current_owner_stellar_key=owner.stellar_public_key,
+            metadata_hash=report_hash,
+            mint_transaction_hash=tx_hash,
+            created_at=datetime.now(timezone.utc)
+        )
+    
+    @staticmethod
+    def _registration_result(watch: Watch, nft_token: NFTToken) -> Dict:
+        return {
+            "watch_id": watch.id,
+            "serial": watch.serial_number,
+            "nft_code": nft_token.asset_code,
+            "nft_issuer": nft_token.issuer_account,
+            "laudo_hash": nft_token.metadata_hash,
+            "mint_tx": nft_token.mint_transaction_hash,
+            "status": "tokenized",
+            "message": f"Relógio {watch.serial_number} tokenizado com sucesso!"
+        }
+    
     def _create_stellar_account(self, public_key: str):
         """
         Cria conta na Stellar Testnet usando Friendbot
@@ -245,7 +668,7 @@ class WatchRegistrationContract:
         import requests
         
         try:
-            response = requests.get(f"https://friendbot.stellar.org?addr={public_key}")
+            response = requests.get(self.stellar.friendbot_url, params={"addr": public_key})
             if response.status_code != 200:
                 raise Exception("Erro ao criar conta Stellar")
         except Exception as e:
@@ -270,33 +693,88 @@ class EscrowContract:
         self.stellar = stellar_contracts
         self.usdc_asset = Asset("USDC", "GBBD47IF6LWK7P7MDEVSCWR7DPUWV3NY3DTQEVFL4NAT4AQH3ZLLFLA5")  # Testnet USDC
         
-    def create_escrow_account(self) -> Tuple[str, str]:
+    def create_escrow_account(self, checkpoint: Optional[Checkpoint] = None) -> Tuple[str, str]:
         """
         Cria conta de escrow única para transação
         """
-        escrow_keypair = Keypair.random()
+        escrow_keypair, retry = self._escrow_keypair(checkpoint or Checkpoint())
         escrow_public = escrow_keypair.public_key
         escrow_secret = escrow_keypair.secret
         
         # Criar conta na rede
-        self._create_stellar_account(escrow_public)
+        if not retry or not self.stellar.account_exists(escrow_public):
+            self._create_stellar_account(escrow_public)
         
-        # Criar trustline para USDC
+        # Criar trustline para USDC (reenviar numa nova tentativa não muda nada na rede)
         self._create_usdc_trustline(escrow_public, escrow_secret)
         
         return escrow_public, escrow_secret
     
-    def deposit_to_escrow(self, offer_id: int, amount_usdc: Decimal, depositor_key: str) -> Dict:
+    async def create_escrow_account_async(self, checkpoint: Optional[Checkpoint] = None) -> Tuple[str, str]:
+        """Versão assíncrona de create_escrow_account"""
+        escrow_keypair, retry = self._escrow_keypair(checkpoint or Checkpoint())
+        if not retry or not await self.stellar.account_exists_async(escrow_keypair.public_key):
+            await self.stellar.fund_account_async(escrow_keypair.public_key)
+        await self.create_usdc_trustline_async(escrow_keypair.public_key, escrow_keypair.secret)
+        return escrow_keypair.public_key, escrow_keypair.secret
+    
+    @staticmethod
+    def _escrow_keypair(checkpoint: Checkpoint) -> Tuple[Keypair, bool]:
+        """Conta do escrow, gravada antes de ser criada na rede, e se vem de uma tentativa anterior"""
+        secret = checkpoint.get("escrow_secret")
+        if secret:
+            return Keypair.from_secret(secret), True
+        keypair = Keypair.random()
+        checkpoint.save(escrow_account=keypair.public_key, escrow_secret=keypair.secret)  # Em produção: criptografar
+        return keypair, False
+    
+    def deposit_to_escrow(self, offer_id: int, amount_usdc: Decimal, depositor_key: str,
+                          checkpoint: Optional[Checkpoint] = None) -> Dict:
         """
         Depósito em escrow para uma oferta de revenda
         """
+        checkpoint = checkpoint or Checkpoint()
+        recorded = self._recorded_escrow(checkpoint)
+        if recorded:
+            return recorded
+        try:
+            # Criar conta de escrow
+            escrow_public, escrow_secret = self.create_escrow_account(checkpoint)
+        except Exception as e:
+            raise Exception(f"Erro ao criar escrow: {e}")
+        return self._record_escrow(offer_id, amount_usdc, depositor_key, escrow_public, escrow_secret)
+    
+    async def deposit_to_escrow_async(self, offer_id: int, amount_usdc: Decimal, depositor_key: str,
+                                      checkpoint: Optional[Checkpoint] = None) -> Dict:
+        """Versão assíncrona de deposit_to_escrow"""
+        checkpoint = checkpoint or Checkpoint()
+        recorded = self._recorded_escrow(checkpoint)
+        if recorded:
+            return recorded
+        try:
+            escrow_public, escrow_secret = await self.create_escrow_account_async(checkpoint)
+        except Exception as e:
+            raise Exception(f"Erro ao criar escrow: {e}")
+        return self._record_escrow(offer_id, amount_usdc, depositor_key, escrow_public, escrow_secret)
+    
+    def _recorded_escrow(self, checkpoint: Checkpoint) -> Optional[Dict]:
+        """Escrow já gravado por uma tentativa anterior deste job"""
+        account = checkpoint.get("escrow_account")
+        if not account:
+            return None
+        db = next(get_db())
+        try:
+            escrow = db.query(Escrow).filter(Escrow.escrow_stellar_account == account).first()
+            return self._escrow_result(escrow) if escrow else None
+        finally:
+            db.close()
+    
+    def _record_escrow(self, offer_id: int, amount_usdc: Decimal, depositor_key: str,
+                       escrow_public: str, escrow_secret: str) -> Dict:
+        """Registra no banco o escrow cuja conta já existe na rede"""
         db = next(get_db())
         
         try:
-            # Criar conta de escrow
-            escrow_public, escrow_secret = self.create_escrow_account()
-            
-            # Registrar escrow no banco
             escrow = Escrow(
                 offer_id=offer_id,
                 escrow_stellar_account=escrow_public,
@@ -310,14 +788,7 @@ class EscrowContract:
             db.add(escrow)
             db.commit()
             db.refresh(escrow)
-            
-            return {
-                "escrow_id": escrow.id,
-                "escrow_account": escrow_public,
-                "amount_usdc": str(amount_usdc),
-                "status": "holding",
-                "message": f"Escrow criado. Deposite {amount_usdc} USDC em {escrow_public}"
-            }
+            return self._escrow_result(escrow)
             
         except Exception as e:
             db.rollback()
@@ -325,6 +796,16 @@ class EscrowContract:
         finally:
             db.close()
     
+    @staticmethod
+    def _escrow_result(escrow: Escrow) -> Dict:
+        return {
+            "escrow_id": escrow.id,
+            "escrow_account": escrow.escrow_stellar_account,
+            "amount_usdc": str(escrow.amount_usdc),
+            "status": escrow.status,
+            "message": f"Escrow criado. Deposite {escrow.amount_usdc} USDC em {escrow.escrow_stellar_account}"
+        }
+    
     def confirm_delivery(self, escrow_id: int, confirmer_type: str) -> Dict:
         """
         Confirma entrega/recebimento (seller ou evaluator)
@@ -351,9 +832,19 @@ class EscrowContract:
             
             db.commit()
             
-            # Se ambos confirmaram, liberar fundos
+            # Se ambos confirmaram, enfileirar a liberação dos fundos (executada pelo worker)
             if escrow.seller_confirmed and escrow.evaluator_confirmed:
-                return self._release_escrow_funds(escrow_id)
+                from .jobs import enqueue
+                job = enqueue(db, "escrow.release", {"escrow_id": escrow_id},
+                              idempotency_key=f"escrow.release:{escrow_id}", shared=True)
+                return {
+                    "escrow_id": escrow_id,
+                    "status": "release_queued",
+                    "job_id": job.id,
+                    "seller_confirmed": True,
+                    "evaluator_confirmed": True,
+                    "message": "Entrega confirmada. Liberação dos fundos em processamento"
+                }
             
             return {
                 "escrow_id": escrow_id,
@@ -369,65 +860,22 @@ class EscrowContract:
         finally:
             db.close()
     
-    def _release_escrow_funds(self, escrow_id: int) -> Dict:
+    def _release_escrow_funds(self, escrow_id: int, checkpoint: Optional[Checkpoint] = None) -> Dict:
         """
         Libera fundos do escrow com splits automáticos
         """
+        checkpoint = checkpoint or Checkpoint()
         db = next(get_db())
         
         try:
-            escrow = db.query(Escrow).filter(Escrow.id == escrow_id).first()
-            if not escrow:
-                raise ValueError("Escrow não encontrado")
-            
-            # Obter dados da oferta
-            from .models import ResellOffer
-            offer = db.query(ResellOffer).filter(ResellOffer.id == escrow.offer_id).first()
-            if not offer:
-                raise ValueError("Oferta não encontrada")
-            
-            # Calcular splits
-            total_amount = escrow.amount_usdc
-            admin_commission = total_amount * Decimal('0.08')  # 8%
-            seller_amount = total_amount - admin_commission
-            
-            # Executar transferências Stellar
-            tx_admin = self._transfer_usdc(
-                escrow.escrow_stellar_account,
-                escrow.escrow_secret_key,
-                self.stellar.master_account,
-                admin_commission,
-                f"ADMIN-COMMISSION:{escrow_id}"
-            )
+            escrow, offer = self._releasable(db, escrow_id)
+            if escrow.status == "released":
+                return self._already_released(escrow)
             
-            tx_seller = self._transfer_usdc(
-                escrow.escrow_stellar_account,
-                escrow.escrow_secret_key,
-                offer.seller_stellar_key,
-                seller_amount,
-                f"SELLER-PAYMENT:{escrow_id}"
-            )
-            
-            # Atualizar escrow
-            escrow.status = "released"
-            escrow.released_at = datetime.now(timezone.utc)
-            escrow.admin_tx_hash = tx_admin
-            escrow.seller_tx_hash = tx_seller
-            escrow.admin_amount_usdc = admin_commission
-            escrow.seller_amount_usdc = seller_amount
-            
-            db.commit()
-            
-            return {
-                "escrow_id": escrow_id,
-                "status": "released",
-                "total_amount": str(total_amount),
-                "admin_commission": str(admin_commission),
-                "seller_amount": str(seller_amount),
-                "admin_tx": tx_admin,
-                "seller_tx": tx_seller,
-                "message": "Fundos liberados com sucesso!"
-            }
+            batch, admin_commission, seller_amount = self._release_batch(escrow, offer)
+            with stellar_call("usdc_payment"):
+                tx_hash = batch.submit_once(checkpoint, "release_tx")
+            return self._record_release(db, escrow, tx_hash, admin_commission, seller_amount)
             
         except Exception as e:
             db.rollback()
@@ -435,68 +883,111 @@ class EscrowContract:
         finally:
             db.close()
     
-    def _transfer_usdc(self, from_account: str, from_secret: str, to_account: str, 
-                      amount: Decimal, memo: str) -> str:
-        """
-        Executa transferência USDC na Stellar
-        """
+    async def release_escrow_funds_async(self, escrow_id: int, checkpoint: Optional[Checkpoint] = None) -> Dict:
+        """Versão assíncrona de _release_escrow_funds"""
+        checkpoint = checkpoint or Checkpoint()
+        db = next(get_db())
+        
         try:
-            from_keypair = Keypair.from_secret(from_secret)
-            source_account = self.stellar.server.load_account(from_account)
-            
-            transaction = (
-                TransactionBuilder(
-                    source_account=source_account,
-                    network_passphrase=self.stellar.network_passphrase,
-                    base_fee=self.stellar.base_fee
-                )
-                .append_payment_op(
-                    destination=to_account,
-                    asset=self.usdc_asset,
-                    amount=str(amount)
-                )
-                .add_text_memo(memo)
-                .set_timeout(30)
-                .build()
-            )
-            
-            transaction.sign(from_keypair)
-            response = self.stellar.server.submit_transaction(transaction)
+            escrow, offer = self._releasable(db, escrow_id)
+            if escrow.status == "released":
+                return self._already_released(escrow)
             
-            return response['hash']
+            batch, admin_commission, seller_amount = self._release_batch(escrow, offer)
+            with stellar_call("usdc_payment"):
+                tx_hash = await batch.submit_once_async(checkpoint, "release_tx")
+            return self._record_release(db, escrow, tx_hash, admin_commission, seller_amount)
             
         except Exception as e:
-            raise Exception(f"Erro na transferência USDC: {e}")
+            db.rollback()
+            raise Exception(f"Erro na liberação: {e}")
+        finally:
+            db.close()
+    
+    def _releasable(self, db, escrow_id: int):
+        escrow = db.query(Escrow).filter(Escrow.id == escrow_id).first()
+        if not escrow:
+            raise ValueError("Escrow não encontrado")
+        
+        from .models import ResellOffer
+        offer = db.query(ResellOffer).filter(ResellOffer.id == escrow.offer_id).first()
+        if not offer:
+            raise ValueError("Oferta não encontrada")
+        return escrow, offer
+    
+    @staticmethod
+    def _already_released(escrow: Escrow) -> Dict:
+        """Retry de um job que já liberou: não pagar duas vezes"""
+        return {
+            "escrow_id": escrow.id,
+            "status": "released",
+            "admin_tx": escrow.admin_tx_hash,
+            "seller_tx": escrow.seller_tx_hash,
+            "message": "Fundos já liberados"
+        }
+    
+    def _release_batch(self, escrow: Escrow, offer) -> Tuple[TransactionBatch, Decimal, Decimal]:
+        """Comissão (8%) e pagamento do vendedor em uma única transação atômica"""
+        # Stellar aceita no máximo 7 casas decimais
+        total_amount = Decimal(str(escrow.amount_usdc))
+        admin_commission = (total_amount * Decimal('0.08')).quantize(Decimal('0.0000001'))
+        seller_amount = total_amount - admin_commission
+        
+        batch = TransactionBatch(
+            self.stellar,
+            Keypair.from_secret(escrow.escrow_secret_key),
+            memo=f"ESCROW-RELEASE:{escrow.id}"
+        )
+        batch.payment(self.stellar.master_account, self.usdc_asset, admin_commission)
+        batch.payment(offer.seller_stellar_key, self.usdc_asset, seller_amount)
+        return batch, admin_commission, seller_amount
+    
+    def _record_release(self, db, escrow: Escrow, tx_hash: str, admin_commission: Decimal,
+                        seller_amount: Decimal) -> Dict:
+        escrow.status = "released"
+        escrow.released_at = datetime.now(timezone.utc)
+        escrow.admin_tx_hash = tx_hash
+        escrow.seller_tx_hash = tx_hash
+        escrow.admin_amount_usdc = admin_commission
+        escrow.seller_amount_usdc = seller_amount
+        db.commit()
+        
+        return {
+            "escrow_id": escrow.id,
+            "status": "released",
+            "total_amount": str(admin_commission + seller_amount),
+            "admin_commission": str(admin_commission),
+            "seller_amount": str(seller_amount),
+            "admin_tx": tx_hash,
+            "seller_tx": tx_hash,
+            "message": "Fundos liberados com sucesso!"
+        }
     
     def _create_stellar_account(self, public_key: str):
         """Cria conta Stellar via Friendbot"""
         import requests
-        response = requests.get(f"https://friendbot.stellar.org?addr={public_key}")
+        response = requests.get(self.stellar.friendbot_url, params={"addr": public_key})
         if response.status_code != 200:
             raise Exception("Erro ao criar conta Stellar")
     
     def _create_usdc_trustline(self, account_key: str, account_secret: str):
         """Cria trustline para USDC"""
         try:
-            keypair = Keypair.from_secret(account_secret)
-            source_account = self.stellar.server.load_account(account_key)
-            
-            transaction = (
-                TransactionBuilder(
-                    source_account=source_account,
-                    network_passphrase=self.stellar.network_passphrase,
-                    base_fee=self.stellar.base_fee
-                )
-                .append_change_trust_op(asset=self.usdc_asset)
-                .set_timeout(30)
-                .build()
-            )
+            self._usdc_trustline_batch(account_secret).submit()
             
-            transaction.sign(keypair)
-            self.stellar.server.submit_transaction(transaction)
+        except Exception as e:
+            raise Exception(f"Erro ao criar trustline USDC: {e}")
+    
+    async def create_usdc_trustline_async(self, account_key: str, account_secret: str):
+        """Versão assíncrona de _create_usdc_trustline"""
+        try:
+            await self._usdc_trustline_batch(account_secret).submit_async()
             
         except Exception as e:
             raise Exception(f"Erro ao criar trustline USDC: {e}")
+    
+    def _usdc_trustline_batch(self, account_secret: str) -> TransactionBatch:
+        return TransactionBatch(self.stellar, Keypair.from_secret(account_secret)).change_trust(self.usdc_asset)
 
 # ========================= 3. CONTRATO DE NFT (TOKENIZAÇÃO E TRANSFERÊNCIA) =========================
 
@@ -508,82 +999,111 @@ class NFTContract:
     def __init__(self, stellar_contracts: StellarContracts):
         self.stellar = stellar_contracts
         
-    def transfer_nft(self, watch_id: int, from_user_id: int, to_user_id: int) -> Dict:
+    def transfer_nft(self, watch_id: int, from_user_id: int, to_user_id: int,
+                     checkpoint: Optional[Checkpoint] = None) -> Dict:
         """
         Transfere NFT de relógio entre usuários
         """
         db = next(get_db())
         
         try:
-            # Obter dados do relógio e NFT
-            watch = db.query(Watch).filter(Watch.id == watch_id).first()
-            if not watch:
-                raise ValueError("Relógio não encontrado")
-            
-            nft_token = db.query(NFTToken).filter(NFTToken.watch_id == watch_id).first()
-            if not nft_token:
-                raise ValueError("NFT não encontrado")
-            
-            # Obter usuários
-            from .models import User
-            from_user = db.query(User).filter(User.id == from_user_id).first()
-            to_user = db.query(User).filter(User.id == to_user_id).first()
-            
-            if not from_user or not to_user:
-                raise ValueError("Usuário não encontrado")
-            
-            if not from_user.stellar_public_key or not to_user.stellar_public_key:
-                raise ValueError("Usuários devem ter chaves Stellar configuradas")
-            
-            # Criar asset NFT
-            nft_asset = Asset(nft_token.asset_code, nft_token.issuer_account)
-            
-            # Criar trustline para o destinatário (se necessário)
-            self._ensure_trustline(to_user.stellar_public_key, nft_asset)
+            watch, nft_token, from_user, to_user, nft_asset = self._transfer_parties(db, watch_id, from_user_id, to_user_id)
             
             # Executar transferência
             tx_hash = self._execute_nft_transfer(
                 from_user.stellar_public_key,
-                from_user.stellar_secret_key,  # Em produção: usar assinatura segura
+                from_user.stellar_secret,  # Em produção: usar assinatura segura
                 to_user.stellar_public_key,
                 nft_asset,
-                watch.serial
+                watch.serial_number,
+                checkpoint
             )
             
-            # Atualizar registros
-            watch.current_owner_user_id = to_user_id
+            return self._record_transfer(db, watch, nft_token, from_user, to_user, tx_hash)
+            
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Erro na transferência NFT: {e}")
+        finally:
+            db.close()
+    
+    async def transfer_nft_async(self, watch_id: int, from_user_id: int, to_user_id: int,
+                                 checkpoint: Optional[Checkpoint] = None) -> Dict:
+        """Versão assíncrona de transfer_nft"""
+        db = next(get_db())
+        
+        try:
+            watch, nft_token, from_user, to_user, nft_asset = self._transfer_parties(db, watch_id, from_user_id, to_user_id)
+            tx_hash = await self.execute_nft_transfer_async(
+                from_user.stellar_public_key,
+                from_user.stellar_secret,
+                to_user.stellar_public_key,
+                nft_asset,
+                watch.serial_number,
+                checkpoint
+            )
+            return self._record_transfer(db, watch, nft_token, from_user, to_user, tx_hash)
+            
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Erro na transferência NFT: {e}")
+        finally:
+            db.close()
+    
+    def _transfer_parties(self, db, watch_id: int, from_user_id: int, to_user_id: int):
+        """Relógio, NFT, remetente, destinatário e asset de uma transferência"""
+        watch = db.query(Watch).filter(Watch.id == watch_id).first()
+        if not watch:
+            raise ValueError("Relógio não encontrado")
+        
+        nft_token = db.query(NFTToken).filter(NFTToken.watch_id == watch_id).first()
+        if not nft_token:
+            raise ValueError("NFT não encontrado")
+        
+        from .models import User
+        from_user = db.query(User).filter(User.id == from_user_id).first()
+        to_user = db.query(User).filter(User.id == to_user_id).first()
+        
+        if not from_user or not to_user:
+            raise ValueError("Usuário não encontrado")
+        
+        if not from_user.stellar_public_key or not to_user.stellar_public_key:
+            raise ValueError("Usuários devem ter chaves Stellar configuradas")
+        
+        nft_asset = Asset(nft_token.asset_code, nft_token.issuer_account)
+        
+        # Criar trustline para o destinatário (se necessário)
+        self._ensure_trustline(to_user.stellar_public_key, nft_asset)
+        return watch, nft_token, from_user, to_user, nft_asset
+    
+    def _record_transfer(self, db, watch: Watch, nft_token: NFTToken, from_user, to_user, tx_hash: str) -> Dict:
+        # Nova tentativa de um job cuja transferência já foi gravada: não duplicar o histórico
+        recorded = db.query(OwnershipTransfer.id).filter(OwnershipTransfer.stellar_tx_hash == tx_hash).first()
+        if recorded is None:
+            watch.current_owner_user_id = to_user.id
             nft_token.current_owner_stellar_key = to_user.stellar_public_key
             nft_token.last_transfer_hash = tx_hash
             nft_token.updated_at = datetime.now(timezone.utc)
             
-            # Registrar transferência
-            transfer = OwnershipTransfer(
-                watch_id=watch_id,
-                from_user_id=from_user_id,
-                to_user_id=to_user_id,
+            db.add(OwnershipTransfer(
+                watch_id=watch.id,
+                from_user_id=from_user.id,
+                to_user_id=to_user.id,
                 type="sale",
                 price_brl=watch.price_brl,
                 stellar_tx_hash=tx_hash,
                 created_at=datetime.now(timezone.utc)
-            )
-            
-            db.add(transfer)
+            ))
             db.commit()
-            
-            return {
-                "watch_id": watch_id,
-                "nft_token_id": nft_token.token_id,
-                "from_user": from_user.email,
-                "to_user": to_user.email,
-                "transaction_hash": tx_hash,
-                "message": f"NFT do relógio {watch.serial} transferido com sucesso!"
-            }
-            
-        except Exception as e:
-            db.rollback()
-            raise Exception(f"Erro na transferência NFT: {e}")
-        finally:
-            db.close()
+        
+        return {
+            "watch_id": watch.id,
+            "nft_token_id": nft_token.token_id,
+            "from_user": from_user.email,
+            "to_user": to_user.email,
+            "transaction_hash": tx_hash,
+            "message": f"NFT do relógio {watch.serial_number} transferido com sucesso!"
+        }
     
     def get_nft_ownership_history(self, watch_id: int) -> List[Dict]:
         """
@@ -613,92 +1133,36 @@ class NFTContract:
         finally:
             db.close()
     
-    def verify_nft_authenticity(self, watch_id: int) -> Dict:
+    def _execute_nft_transfer(self, from_account: str, from_secret: str, to_account: str, 
+                             nft_asset: Asset, memo: str, checkpoint: Optional[Checkpoint] = None) -> str:
         """
-        Verifica autenticidade do NFT na blockchain
+        Executa transferência NFT na Stellar
         """
-        db = next(get_db())
-        
         try:
-            watch = db.query(Watch).filter(Watch.id == watch_id).first()
-            nft_token = db.query(NFTToken).filter(NFTToken.watch_id == watch_id).first()
-            
-            if not watch or not nft_token:
-                raise ValueError("Relógio ou NFT não encontrado")
-            
-            # Verificar na Stellar
-            try:
-                account = self.stellar.server.accounts().account_id(nft_token.current_owner_stellar_key).call()
-                
-                # Verificar se possui o asset
-                nft_asset_line = None
-                for balance in account['balances']:
-                    if (balance['asset_type'] != 'native' and 
-                        balance['asset_code'] == nft_token.asset_code and
-                        balance['asset_issuer'] == nft_token.issuer_account):
-                        nft_asset_line = balance
-                        break
-                
-                if nft_asset_line and float(nft_asset_line['balance']) == 1.0:
-                    authenticity_status = "verified"
-                    message = "NFT autêntico e verificado na blockchain"
-                else:
-                    authenticity_status = "invalid"
-                    message = "NFT não encontrado na conta atual"
-                
-            except Exception as e:
-                authenticity_status = "error"
-                message = f"Erro na verificação: {e}"
-            
-            return {
-                "watch_id": watch_id,
-                "serial": watch.serial,
-                "nft_token_id": nft_token.token_id,
-                "current_owner": nft_token.current_owner_stellar_key,
-                "laudo_hash": watch.laudo_hash,
-                "mint_tx": nft_token.mint_transaction_hash,
-                "authenticity_status": authenticity_status,
-                "message": message
-            }
+            with stellar_call("nft_transfer"):
+                batch = self._nft_transfer_batch(from_secret, to_account, nft_asset, memo)
+                return batch.submit_once(checkpoint or Checkpoint(), "transfer_tx")
             
         except Exception as e:
-            raise Exception(f"Erro na verificação: {e}")
-        finally:
-            db.close()
+            raise Exception(f"Erro na transferência NFT: {e}")
     
-    def _execute_nft_transfer(self, from_account: str, from_secret: str, to_account: str, 
-                             nft_asset: Asset, memo: str) -> str:
+    async def execute_nft_transfer_async(self, from_account: str, from_secret: str, to_account: str,
+                                         nft_asset: Asset, memo: str, checkpoint: Optional[Checkpoint] = None) -> str:
         """
-        Executa transferência NFT na Stellar
+        Versão assíncrona de _execute_nft_transfer
         """
         try:
-            from_keypair = Keypair.from_secret(from_secret)
-            source_account = self.stellar.server.load_account(from_account)
-            
-            transaction = (
-                TransactionBuilder(
-                    source_account=source_account,
-                    network_passphrase=self.stellar.network_passphrase,
-                    base_fee=self.stellar.base_fee
-                )
-                .append_payment_op(
-                    destination=to_account,
-                    asset=nft_asset,
-                    amount="1"
-                )
-                .add_text_memo(f"NFT-TRANSFER:{memo}")
-                .set_timeout(30)
-                .build()
-            )
-            
-            transaction.sign(from_keypair)
-            response = self.stellar.server.submit_transaction(transaction)
-            
-            return response['hash']
+            with stellar_call("nft_transfer"):
+                batch = self._nft_transfer_batch(from_secret, to_account, nft_asset, memo)
+                return await batch.submit_once_async(checkpoint or Checkpoint(), "transfer_tx")
             
         except Exception as e:
             raise Exception(f"Erro na transferência NFT: {e}")
     
+    def _nft_transfer_batch(self, from_secret: str, to_account: str, nft_asset: Asset, memo: str) -> TransactionBatch:
+        batch = TransactionBatch(self.stellar, Keypair.from_secret(from_secret), memo=f"NFT-TRANSFER:{memo}"[:28])
+        return batch.payment(to_account, nft_asset, "1")
+    
     def _ensure_trustline(self, account_key: str, asset: Asset):
         """
         Garante que conta tem trustline para o asset
@@ -714,8 +1178,8 @@ class StellarContractsManager:
     Gerenciador principal dos contratos Stellar
     """
     
-    def __init__(self):
-        self.stellar = StellarContracts()
+    def __init__(self, stellar: Optional[StellarContracts] = None):
+        self.stellar = stellar or StellarContracts()
         self.watch_registration = WatchRegistrationContract(self.stellar)
         self.escrow = EscrowContract(self.stellar)
         self.nft = NFTContract(self.stellar)
@@ -729,5 +1193,26 @@ class StellarContractsManager:
     def get_nft(self) -> NFTContract:
         return self.nft
 
-# Instância global
-stellar_contracts = StellarContractsManager()
+# Instância global, criada no primeiro uso: importar o módulo não gera
+# chaves, não abre sessões com o Horizon nem cria o cliente S3
+_manager: Optional[StellarContractsManager] = None
+_manager_lock = threading.Lock()
+
+def get_stellar_contracts() -> StellarContractsManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = StellarContractsManager()
+    return _manager
+
+async def close_stellar_contracts():
+    """Fecha a sessão aiohttp, se os contratos chegaram a ser usados (shutdown)"""
+    if _manager is not None:
+        await _manager.stellar.close_async()
+
+def __getattr__(name):
+    # Compatibilidade com `from app.stellar_contracts import stellar_contracts`
+    if name == "stellar_contracts":
+        return get_stellar_contracts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,251 @@
+"""
+Ingestão contínua de operações do Horizon para o banco local.
+
+`NFTToken.current_owner_stellar_key` e o log `stellar_transactions` só
+mudavam quando o nosso código submetia uma transação; transferências feitas
+direto pelas carteiras ficavam invisíveis e a verificação precisava
+consultar o Horizon. Este worker acompanha as contas que nos interessam e
+aplica cada operação no banco:
+
+    python start_ingestor.py          # ou: python -m app.stellar_ingest
+
+- Contas acompanhadas: master, donos atuais dos NFTs e escrows em aberto.
+  Emissoras não entram: cada emissora só assina o próprio mint, e esse
+  pagamento já aparece nas operações do dono.
+  Transferências entre carteiras saem da conta do dono, então o novo dono
+  passa a ser acompanhado a partir da operação que o tornou dono. O custo
+  por ciclo é uma leitura por dono distinto, não por NFT.
+- Cursor por conta (`ingestion_cursors.paging_token`), gravado na mesma
+  transação que as linhas ingeridas: depois de um restart a ingestão
+  continua de onde parou, sem lacunas.
+- Upserts em lote: `stellar_transactions` por `transaction_hash` (INSERT
+  ... ON CONFLICT DO NOTHING) e `nft_tokens` com UPDATE em lote por id, então
+  reprocessar uma página não duplica nada.
+
+O Horizon expõe streaming (SSE) por conta, mas isso seria uma conexão aberta
+por dono; aqui cada ciclo pagina
+`/accounts/{id}/operations` a partir do cursor, com leituras em paralelo.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import Escrow, IngestionCursor, NFTToken, StellarTransaction
+
+logger = logging.getLogger(__name__)
+
+# Registros por página do Horizon (máximo aceito pela API)
+PAGE_LIMIT = 200
+POLL_INTERVAL_SECONDS = float(os.getenv("STELLAR_INGEST_POLL_SECONDS", "5"))
+# Leituras simultâneas ao Horizon por ciclo
+MAX_PARALLEL_READS = 8
+
+
+def _contracts():
+    from app.stellar_contracts import get_stellar_contracts
+    return get_stellar_contracts()
+
+
+def tracked_accounts(db: Session, master_account: Optional[str] = None) -> Set[str]:
+    """Contas cujas operações alteram NFTs, escrows ou a conta da plataforma"""
+    accounts: Set[str] = {
+        owner for (owner,) in db.query(NFTToken.current_owner_stellar_key).distinct() if owner
+    }
+    accounts.update(a for (a,) in db.query(Escrow.escrow_stellar_account).filter(Escrow.status == "holding"))
+    if master_account:
+        accounts.add(master_account)
+    return accounts
+
+
+def fetch_operations(server, account_id: str, cursor: str, max_pages: int = 50) -> List[dict]:
+    """Operações da conta depois do cursor, em ordem crescente de paging_token"""
+    records: List[dict] = []
+    for _ in range(max_pages):
+        page = server.operations().for_account(account_id).cursor(cursor).limit(PAGE_LIMIT).order(desc=False).call()
+        batch = page["_embedded"]["records"]
+        records.extend(batch)
+        if len(batch) < PAGE_LIMIT:
+            break
+        cursor = batch[-1]["paging_token"]
+    return records
+
+
+def _created_at(record: dict) -> datetime:
+    created = datetime.fromisoformat(record["created_at"].replace("Z", "+00:00"))
+    return created.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _is_nft_payment(record: dict, tokens: Dict[str, NFTToken]) -> bool:
+    return (record.get("type") == "payment" and
+            f"{record.get('asset_code')}:{record.get('asset_issuer')}" in tokens and
+            Decimal(record.get("amount", "0")) == 1)
+
+
+def apply_operations(db: Session, records: Iterable[dict]) -> Dict[str, str]:
+    """
+    Aplica operações (já ordenadas por paging_token) no banco, sem commit.
+    Retorna as contas que viraram donas de NFT e o token da operação que
+    as tornou donas, para começar a acompanhá-las dali.
+    """
+    payments = [r for r in records if r.get("type") == "payment" and r.get("transaction_successful", True)]
+    if not payments:
+        return {}
+
+    asset_keys = {f"{r.get('asset_code')}:{r.get('asset_issuer')}" for r in payments if r.get("asset_code")}
+    tokens = {t.token_id: t for t in db.query(NFTToken).filter(NFTToken.token_id.in_(asset_keys))} if asset_keys else {}
+    senders = {r["from"] for r in payments}
+    escrows = dict(db.query(Escrow.escrow_stellar_account, Escrow.id).filter(Escrow.escrow_stellar_account.in_(senders)))
+
+    token_updates: Dict[int, dict] = {}
+    new_owners: Dict[str, str] = {}
+    transactions: Dict[str, dict] = {}
+
+    for record in payments:
+        token = None
+        if _is_nft_payment(record, tokens):
+            token = tokens[f"{record['asset_code']}:{record['asset_issuer']}"]
+            minted = record["from"] == token.issuer_account
+            values = token_updates.setdefault(token.id, {"id": token.id})
+            values["current_owner_stellar_key"] = record["to"]
+            values["updated_at"] = _created_at(record)
+            if not minted:
+                values["last_transfer_hash"] = record["transaction_hash"]
+            new_owners.setdefault(record["to"], record["paging_token"])
+            transaction_type = "nft_mint" if minted else "nft_transfer"
+        elif record["from"] in escrows:
+            transaction_type = "escrow_release"
+        else:
+            transaction_type = "payment"
+
+        # Uma linha por transação: a primeira operação de pagamento dela
+        transactions.setdefault(record["transaction_hash"], {
+            "transaction_hash": record["transaction_hash"],
+            "transaction_type": transaction_type,
+            "from_account": record["from"],
+            "to_account": record["to"],
+            "asset_code": record.get("asset_code", "XLM"),
+            "asset_issuer": record.get("asset_issuer"),
+            "amount": record.get("amount"),
+            "watch_id": token.watch_id if token else None,
+            "escrow_id": escrows.get(record["from"]),
+            "status": "success",
+            "created_at": _created_at(record),
+        })
+
+    if token_updates:
+        db.execute(update(NFTToken), list(token_updates.values()))
+    _insert_transactions(db, list(transactions.values()))
+    return new_owners
+
+
+def _insert_transactions(db: Session, rows: List[dict]):
+    if not rows:
+        return
+    table = StellarTransaction.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        db.execute(insert(table).on_conflict_do_nothing(index_elements=[table.c.transaction_hash]), rows)
+        return
+
+    # Outros bancos: só as que ainda não existem
+    existing = {h for (h,) in db.query(StellarTransaction.transaction_hash).filter(
+        StellarTransaction.transaction_hash.in_([row["transaction_hash"] for row in rows]))}
+    rows = [row for row in rows if row["transaction_hash"] not in existing]
+    if rows:
+        db.execute(table.insert(), rows)
+
+
+def ingest_once(db: Session, server, accounts: Iterable[str]) -> int:
+    """
+    Um ciclo: lê as operações novas de cada conta, aplica tudo em ordem de
+    paging_token e avança os cursores na mesma transação. Retorna o número
+    de operações aplicadas.
+    """
+    accounts = list(accounts)
+    cursors = {c.account_id: c for c in db.query(IngestionCursor).filter(IngestionCursor.account_id.in_(accounts))}
+
+    def read(account_id):
+        cursor = cursors[account_id].paging_token if account_id in cursors else ""
+        try:
+            return account_id, fetch_operations(server, account_id, cursor)
+        except Exception as e:
+            # Conta fica para o próximo ciclo, com o cursor onde estava
+            logger.warning("Ingestão: falha ao ler %s: %s", account_id, e)
+            return account_id, None
+
+    records: Dict[str, dict] = {}
+    advanced: Dict[str, str] = {}
+    with ThreadPoolExecutor(max(min(MAX_PARALLEL_READS, len(accounts)), 1)) as pool:
+        for account_id, operations in pool.map(read, accounts):
+            if operations:
+                for record in operations:
+                    records[record["id"]] = record
+                advanced[account_id] = operations[-1]["paging_token"]
+
+    ordered = sorted(records.values(), key=lambda r: int(r["paging_token"]))
+    new_owners = apply_operations(db, ordered)
+
+    # Novos donos: acompanhar a partir da operação que os tornou donos
+    for account_id, paging_token in new_owners.items():
+        if account_id not in cursors and account_id not in advanced:
+            advanced[account_id] = paging_token
+
+    now = datetime.utcnow()
+    for account_id, paging_token in advanced.items():
+        cursor = cursors.get(account_id)
+        if cursor is None:
+            db.add(IngestionCursor(account_id=account_id, paging_token=paging_token, updated_at=now))
+        elif int(paging_token) > int(cursor.paging_token or 0):
+            cursor.paging_token = paging_token
+            cursor.updated_at = now
+    db.commit()
+    return len(ordered)
+
+
+def run(session_factory, server=None, master_account: Optional[str] = None,
+        poll_interval: float = POLL_INTERVAL_SECONDS, once: bool = False):
+    """
+    Loop da ingestão. Com `once=True`, lê até alcançar a ponta do Horizon e retorna.
+    """
+    if server is None:
+        contracts = _contracts()
+        server = contracts.stellar.server
+        master_account = master_account or contracts.stellar.master_account
+
+    total = 0
+    while True:
+        db = session_factory()
+        try:
+            applied = ingest_once(db, server, tracked_accounts(db, master_account))
+        except Exception:
+            db.rollback()
+            logger.exception("Ingestão: ciclo falhou")
+            applied = 0
+        finally:
+            db.close()
+        total += applied
+
+        if not applied:
+            if once:
+                return total
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    init_db()
+    logger.info("Ingestão Stellar iniciada")
+    run(SessionLocal)
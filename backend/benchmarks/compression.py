@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Bytes e tempo economizados pela compressão (brotli/gzip) e pelos 304 nas
+chamadas principais do frontend (frontend/lib/api-client.ts) e nas
+listagens grandes do admin.
+
+Sobe a aplicação em processo contra um SQLite temporário com dados
+variados (descrições e nomes aleatórios, para não comprimir melhor que
+dados reais) e, para cada rota, mede:
+
+    bytes no fio com identity, gzip e br, e numa revalidação 304
+    tempo no servidor (mediana) de cada codificação
+    tempo total estimado = servidor + transferência no link simulado
+
+Uso:
+    python benchmarks/compression.py
+    python benchmarks/compression.py --watches 5000 --mbps 5 --runs 30
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="compression_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ("automático cronógrafo aço ouro safira mostrador azul preto luneta cerâmica pulseira "
+         "couro borracha caixa original revisado garantia edição limitada mergulho GMT calendário "
+         "perpétuo lunar titânio platina vintage manual corda reserva marcha hélio").split()
+BRANDS = ["Rolex", "Omega", "Cartier", "Patek Philippe", "Audemars Piguet", "Zenith", "IWC", "Tudor"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Economia de bytes e tempo com compressão e 304")
+    parser.add_argument("--watches", type=int, default=2000, help="Relógios no banco de teste")
+    parser.add_argument("--users", type=int, default=2000, help="Usuários no banco de teste")
+    parser.add_argument("--transfers", type=int, default=3000, help="Transferências no banco de teste")
+    parser.add_argument("--runs", type=int, default=20, help="Requisições por rota e codificação")
+    parser.add_argument("--mbps", type=float, default=10.0, help="Banda do link simulado (Mbit/s)")
+    return parser.parse_args()
+
+
+def sentence(rnd, words):
+    return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def seed(args):
+    from app.database import SessionLocal
+    from app.models import User, Store, Watch, OwnershipTransfer, Notification, Favorite
+
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    admin = User(full_name="Admin", email="admin@bench.local", password_hash="x", role="admin")
+    store_user = User(full_name="Loja", email="loja@bench.local", password_hash="x", role="store")
+    buyer = User(full_name="Comprador", email="user@bench.local", password_hash="x", role="user")
+    db.add_all([admin, store_user, buyer])
+    db.flush()
+    store = Store(user_id=store_user.id, name="Loja", credentialed=True)
+    db.add(store)
+    db.flush()
+
+    db.add_all([
+        User(full_name=f"{rnd.choice(['Ana', 'Bruno', 'Carla', 'Diego', 'Eva', 'Fábio'])} {rnd.randint(1, 10**6)}",
+             email=f"cliente{i}.{rnd.randint(1, 10**6)}@bench.local", password_hash="x", role="user",
+             stellar_public_key="G" + "".join(rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567") for _ in range(55)))
+        for i in range(args.users)
+    ])
+    watches = [
+        Watch(serial_number=f"{rnd.choice(BRANDS)[:3].upper()}-{rnd.randint(10**7, 10**8)}", brand=rnd.choice(BRANDS),
+              model=sentence(rnd, 2)[:-1], year=rnd.randint(1960, 2025), condition=rnd.choice(["novo", "excelente", "bom"]),
+              description=sentence(rnd, rnd.randint(12, 40)), current_value_brl=rnd.randint(5, 900) * 1000.0,
+              purchase_price_brl=rnd.randint(5, 900) * 1000.0, status="for_sale",
+              current_owner_user_id=store_user.id, store_id=store.id,
+              created_at=now - timedelta(minutes=rnd.randint(0, 10**6)))
+        for _ in range(args.watches)
+    ]
+    db.add_all(watches)
+    db.flush()
+    db.add_all([
+        OwnershipTransfer(watch_id=rnd.choice(watches).id, from_user_id=store_user.id, to_user_id=buyer.id,
+                          type=rnd.choice(["sale", "resale"]), price_brl=rnd.randint(5, 900) * 1000.0,
+                          admin_fee_brl=rnd.randint(100, 9000) * 1.0,
+                          stellar_tx_hash="".join(rnd.choice("0123456789abcdef") for _ in range(64)),
+                          created_at=now - timedelta(minutes=rnd.randint(0, 10**6)))
+        for _ in range(args.transfers)
+    ])
+    db.add_all([Notification(user_id=buyer.id, title=sentence(rnd, 3), message=sentence(rnd, 20), type="info",
+                             created_at=now - timedelta(minutes=i)) for i in range(100)])
+    db.add_all([Favorite(user_id=buyer.id, watch_id=w.id) for w in rnd.sample(watches, 50)])
+    db.commit()
+    ids = (admin.id, buyer.id, watches[0].id)
+    db.close()
+    return ids
+
+
+def main():
+    args = parse_args()
+    from fastapi.testclient import TestClient
+
+    from app.auth import create_access_token
+    from app.compression import brotli
+    from app.database import init_db
+    from app.main import app
+
+    init_db()
+    admin_id, buyer_id, watch_id = seed(args)
+    admin = {"Authorization": "Bearer " + create_access_token({"sub": str(admin_id), "role": "admin"})}
+    buyer = {"Authorization": "Bearer " + create_access_token({"sub": str(buyer_id), "role": "user"})}
+
+    routes = [
+        ("getWatches (marketplace, 200 itens)", "/watches/marketplace?limit=200", {}),
+        ("getWatch", f"/watches/{watch_id}", {}),
+        ("getFavorites", "/watches/favorites", buyer),
+        ("getNotifications", "/notifications/", buyer),
+        ("getProfile", "/auth/profile", buyer),
+        ("admin /transfers", "/admin/transfers", admin),
+        ("admin /users", "/admin/users", admin),
+    ]
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    bytes_per_second = args.mbps * 1_000_000 / 8
+
+    print(f"{args.watches} relógios, {args.users} usuários, {args.transfers} transferências; "
+          f"link de {args.mbps:g} Mbit/s; mediana de {args.runs} requisições")
+    print(f"{'rota':<36} {'codif.':<8} {'bytes':>9} {'servidor':>9} {'total est.':>11}")
+    with TestClient(app) as client:
+        for label, path, headers in routes:
+            identity_total = None
+            etag = None
+            for encoding in encodings:
+                request_headers = {**headers, "Accept-Encoding": encoding}
+                client.get(path, headers=request_headers)  # aquece cache do catálogo e conexões
+                timings = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    response = client.get(path, headers=request_headers)
+                    timings.append(time.perf_counter() - started)
+                wire = len(response.read()) if "content-encoding" not in response.headers else int(response.headers["content-length"])
+                server_ms = statistics.median(timings) * 1000
+                total_ms = server_ms + wire / bytes_per_second * 1000
+                identity_total = identity_total or total_ms
+                etag = response.headers.get("etag", etag)
+                change = f"  ({(total_ms / identity_total - 1) * 100:+.0f}%)" if encoding != "identity" else ""
+                print(f"{label:<36} {encoding:<8} {wire:>9} {server_ms:>7.2f}ms {total_ms:>9.2f}ms{change}")
+            if etag:
+                response = client.get(path, headers={**headers, "Accept-Encoding": encodings[-1], "If-None-Match": etag})
+                print(f"{'':<36} {'304' if response.status_code == 304 else response.status_code!s:<8} "
+                      f"{len(response.content):>9}")
+
+
+if __name__ == "__main__":
+    main()
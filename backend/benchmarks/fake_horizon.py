@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Horizon + Friendbot falsos, em processo, para testes e benchmarks offline.
+
+Implementa o subconjunto da API usado pelos contratos (app/stellar_contracts.py):
+
+    GET  /accounts/{id}                 conta, sequência e saldos
+    GET  /accounts/{id}/transactions    transações da conta (cursor/limit/order)
+    GET  /accounts/{id}/operations      operações da conta (cursor/limit/order)
+    GET  /transactions/{hash}           transação enviada
+    POST /transactions                  submit (valida sequência e assinaturas,
+                                        aplica Payment/ChangeTrust/CreateAccount/
+                                        ManageData de forma atômica)
+    GET  /friendbot?addr=G...           cria e financia a conta
+
+Latência e erros podem ser injetados para medir como a vazão degrada quando
+o Horizon fica lento ou instável (`latency`, `jitter`, `error_rate`).
+
+Uso em processo:
+
+    fake = FakeHorizon(latency=0.05).start()
+    os.environ["STELLAR_HORIZON_URL"] = fake.url
+    os.environ["STELLAR_FRIENDBOT_URL"] = fake.friendbot_url
+
+Uso standalone:
+
+    python benchmarks/fake_horizon.py --port 8001 --latency 0.1 --error-rate 0.02
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from stellar_sdk import Asset, Keypair, TransactionEnvelope, Network
+from stellar_sdk import Payment, ChangeTrust, CreateAccount, ManageData
+from stellar_sdk.exceptions import BadSignatureError
+
+FRIENDBOT_STARTING_BALANCE = Decimal("10000")
+STARTING_SEQUENCE = 1000 << 32  # Sequência inicial no formato ledger << 32, como na rede
+
+
+def _asset_key(asset: Asset) -> str:
+    return "native" if asset.is_native() else f"{asset.code}:{asset.issuer}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TransactionFailed(Exception):
+    def __init__(self, transaction_code: str, operation_codes=None):
+        super().__init__(transaction_code)
+        self.transaction_code = transaction_code
+        self.operation_codes = operation_codes or []
+
+
+class FakeLedger:
+    """Estado em memória: contas, trustlines, saldos, transações e operações"""
+
+    def __init__(self, network_passphrase: str = Network.TESTNET_NETWORK_PASSPHRASE):
+        self.network_passphrase = network_passphrase
+        self.lock = threading.Lock()
+        self.accounts = {}       # id -> {"sequence", "balances": {asset_key: Decimal}, "data": {}}
+        self.transactions = {}   # hash -> registro
+        self.operations = []     # registros em ordem de aplicação (paging_token crescente)
+        self.ledger = 1
+
+    # ---- helpers de setup (atalhos para benchmarks)
+
+    def create_account(self, account_id: str, balance=FRIENDBOT_STARTING_BALANCE) -> bool:
+        with self.lock:
+            if account_id in self.accounts:
+                return False
+            self.accounts[account_id] = {
+                "sequence": STARTING_SEQUENCE,
+                "balances": {"native": Decimal(str(balance))},
+                "data": {},
+            }
+            return True
+
+    def set_trustline(self, account_id: str, asset: Asset):
+        with self.lock:
+            self.accounts[account_id]["balances"].setdefault(_asset_key(asset), Decimal("0"))
+
+    def credit(self, account_id: str, asset: Asset, amount):
+        with self.lock:
+            balances = self.accounts[account_id]["balances"]
+            key = _asset_key(asset)
+            balances[key] = balances.get(key, Decimal("0")) + Decimal(str(amount))
+
+    def balance(self, account_id: str, asset: Asset) -> Decimal:
+        with self.lock:
+            return self.accounts.get(account_id, {}).get("balances", {}).get(_asset_key(asset), Decimal("0"))
+
+    # ---- leitura no formato do Horizon
+
+    def account_json(self, account_id: str):
+        with self.lock:
+            account = self.accounts.get(account_id)
+            if account is None:
+                return None
+            balances = []
+            for key, amount in account["balances"].items():
+                if key == "native":
+                    continue
+                code, issuer = key.split(":")
+                balances.append({
+                    "balance": f"{amount:.7f}",
+                    "limit": "922337203685.4775807",
+                    "asset_type": "credit_alphanum4" if len(code) <= 4 else "credit_alphanum12",
+                    "asset_code": code,
+                    "asset_issuer": issuer,
+                })
+            balances.append({"balance": f"{account['balances']['native']:.7f}", "asset_type": "native"})
+            return {
+                "id": account_id,
+                "account_id": account_id,
+                "sequence": str(account["sequence"]),
+                "subentry_count": len(balances) - 1,
+                "balances": balances,
+                "data": dict(account["data"]),
+                "signers": [{"key": account_id, "weight": 1, "type": "ed25519_public_key"}],
+                "thresholds": {"low_threshold": 0, "med_threshold": 0, "high_threshold": 0},
+                "flags": {"auth_required": False, "auth_revocable": False, "auth_immutable": False},
+            }
+
+    def account_records(self, account_id: str, kind: str, cursor: str, limit: int, order: str):
+        with self.lock:
+            if kind == "operations":
+                records = [op for op in self.operations if account_id in op["_accounts"]]
+            else:
+                records = [tx for tx in self.transactions.values() if account_id in tx["_accounts"]]
+            records.sort(key=lambda r: int(r["paging_token"]), reverse=(order == "desc"))
+            if cursor:
+                token = int(cursor)
+                records = [r for r in records if (int(r["paging_token"]) > token if order != "desc"
+                                                  else int(r["paging_token"]) < token)]
+            return [{k: v for k, v in r.items() if not k.startswith("_")} for r in records[:limit]]
+
+    # ---- submit
+
+    def _check_signatures(self, envelope, required):
+        tx_hash = envelope.hash()
+        for account_id in required:
+            keypair = Keypair.from_public_key(account_id)
+            signed = False
+            for signature in envelope.signatures:
+                if signature.signature_hint != keypair.signature_hint():
+                    continue
+                try:
+                    keypair.verify(tx_hash, signature.signature)
+                    signed = True
+                    break
+                except BadSignatureError:
+                    continue
+            if not signed:
+                raise TransactionFailed("tx_bad_auth")
+
+    def submit(self, envelope_xdr: str):
+        envelope = TransactionEnvelope.from_xdr(envelope_xdr, self.network_passphrase)
+        tx = envelope.transaction
+        source = tx.source.account_id
+        op_sources = [op.source.account_id if op.source else source for op in tx.operations]
+
+        with self.lock:
+            account = self.accounts.get(source)
+            if account is None:
+                raise TransactionFailed("tx_no_source_account")
+            if tx.sequence != account["sequence"] + 1:
+                raise TransactionFailed("tx_bad_seq")
+            self._check_signatures(envelope, set([source] + op_sources))
+
+            # A sequência e a taxa são consumidas mesmo se uma operação falhar
+            account["sequence"] = tx.sequence
+            account["balances"]["native"] -= Decimal(tx.fee) / Decimal(10 ** 7)
+            self.ledger += 1
+
+            tx_hash = envelope.hash_hex()
+            staged = {account_id: {"balances": dict(acc["balances"]), "data": dict(acc["data"])}
+                      for account_id, acc in self.accounts.items()
+                      if account_id in op_sources or account_id in self._destinations(tx)}
+            created = {}
+            codes = []
+            failed = False
+            for operation, op_source in zip(tx.operations, op_sources):
+                code = self._apply(operation, op_source, staged, created)
+                codes.append(code)
+                failed = failed or code != "op_success"
+            if failed:
+                raise TransactionFailed("tx_failed", codes)
+
+            for account_id, changes in staged.items():
+                self.accounts[account_id]["balances"] = changes["balances"]
+                self.accounts[account_id]["data"] = changes["data"]
+            self.accounts.update(created)
+
+            touched = set([source] + op_sources + self._destinations(tx))
+            record = {
+                "id": tx_hash,
+                "hash": tx_hash,
+                "paging_token": str(self.ledger << 12),
+                "ledger": self.ledger,
+                "successful": True,
+                "source_account": source,
+                "source_account_sequence": str(tx.sequence),
+                "fee_charged": str(tx.fee),
+                "operation_count": len(tx.operations),
+                "memo_type": tx.memo.__class__.__name__.replace("Memo", "").lower() or "none",
+                "envelope_xdr": envelope_xdr,
+                "created_at": _now(),
+                "_accounts": touched,
+            }
+            self.transactions[tx_hash] = record
+            for index, (operation, op_source) in enumerate(zip(tx.operations, op_sources), start=1):
+                self.operations.append(self._operation_record(record, index, operation, op_source))
+            return {k: v for k, v in record.items() if not k.startswith("_")}
+
+    @staticmethod
+    def _destinations(tx):
+        return [op.destination.account_id if hasattr(op.destination, "account_id") else op.destination
+                for op in tx.operations if hasattr(op, "destination")]
+
+    def _apply(self, operation, op_source, staged, created) -> str:
+        if isinstance(operation, Payment):
+            destination = operation.destination.account_id
+            if destination not in staged and destination not in created:
+                return "op_no_destination"
+            key = _asset_key(operation.asset)
+            amount = Decimal(operation.amount)
+            sender = staged[op_source]["balances"]
+            receiver = (staged.get(destination) or {"balances": created[destination]["balances"]})["balances"]
+            is_issuer = not operation.asset.is_native() and operation.asset.issuer == op_source
+            if not is_issuer:
+                if key not in sender:
+                    return "op_src_no_trust"
+                if sender[key] < amount:
+                    return "op_underfunded"
+                sender[key] -= amount
+            if operation.asset.issuer != destination:
+                if key not in receiver:
+                    return "op_no_trust"
+                receiver[key] += amount
+            return "op_success"
+        if isinstance(operation, ChangeTrust):
+            staged[op_source]["balances"].setdefault(_asset_key(operation.asset), Decimal("0"))
+            return "op_success"
+        if isinstance(operation, CreateAccount):
+            destination = operation.destination
+            if destination in self.accounts or destination in created:
+                return "op_already_exists"
+            starting = Decimal(operation.starting_balance)
+            if staged[op_source]["balances"]["native"] < starting:
+                return "op_underfunded"
+            staged[op_source]["balances"]["native"] -= starting
+            created[destination] = {"sequence": self.ledger << 32, "balances": {"native": starting}, "data": {}}
+            return "op_success"
+        if isinstance(operation, ManageData):
+            if operation.data_value is None:
+                staged[op_source]["data"].pop(operation.data_name, None)
+            else:
+                staged[op_source]["data"][operation.data_name] = operation.data_value.hex()
+            return "op_success"
+        return "op_not_supported"
+
+    def _operation_record(self, tx_record, index, operation, op_source):
+        record = {
+            "id": str(int(tx_record["paging_token"]) + index),
+            "paging_token": str(int(tx_record["paging_token"]) + index),
+            "transaction_hash": tx_record["hash"],
+            "transaction_successful": True,
+            "source_account": op_source,
+            "created_at": tx_record["created_at"],
+            "_accounts": {op_source},
+        }
+        if isinstance(operation, Payment):
+            asset = operation.asset
+            record.update({
+                "type": "payment",
+                "from": op_source,
+                "to": operation.destination.account_id,
+                "amount": f"{Decimal(operation.amount):.7f}",
+                "asset_type": "native" if asset.is_native() else asset.type,
+            })
+            if not asset.is_native():
+                record.update({"asset_code": asset.code, "asset_issuer": asset.issuer})
+                record["_accounts"].add(asset.issuer)
+            record["_accounts"].add(operation.destination.account_id)
+        elif isinstance(operation, ChangeTrust):
+            record.update({"type": "change_trust", "trustor": op_source,
+                           "asset_code": operation.asset.code, "asset_issuer": operation.asset.issuer})
+            record["_accounts"].add(operation.asset.issuer)
+        elif isinstance(operation, CreateAccount):
+            record.update({"type": "create_account", "funder": op_source, "account": operation.destination,
+                           "starting_balance": f"{Decimal(operation.starting_balance):.7f}"})
+            record["_accounts"].add(operation.destination)
+        else:
+            record["type"] = type(operation).__name__.lower()
+        return record
+
+
+class FakeHorizon:
+    """Servidor HTTP em thread própria servindo um FakeLedger"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        self.ledger = FakeLedger()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.injected_errors = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def friendbot_url(self) -> str:
+        return f"{self.url}/friendbot"
+
+    def start(self) -> "FakeHorizon":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay_and_maybe_fail(self) -> bool:
+        """Aplica a latência configurada; True se esta requisição deve falhar"""
+        self.requests += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.injected_errors += 1
+            return True
+        return False
+
+    def _handler(self):
+        fake = self
+        ledger = self.ledger
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/hal+json" if status < 400 else "application/problem+json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _problem(self, status, title, extras=None):
+                body = {"type": f"https://stellar.org/horizon-errors/{title.lower().replace(' ', '_')}",
+                        "title": title, "status": status}
+                if extras:
+                    body["extras"] = extras
+                self._send(status, body)
+
+            def _page(self, records):
+                self._send(200, {"_links": {}, "_embedded": {"records": records}})
+
+            def do_GET(self):
+                if fake._delay_and_maybe_fail():
+                    return self._problem(503, "Service Unavailable")
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                parts = [p for p in url.path.split("/") if p]
+
+                if parts == ["friendbot"] or (not parts and "addr" in params):
+                    if ledger.create_account(params.get("addr", "")):
+                        return self._send(200, {"successful": True, "hash": hashlib.sha256(params["addr"].encode()).hexdigest()})
+                    return self._problem(400, "Bad Request", {"reason": "createAccountAlreadyExist"})
+
+                if len(parts) == 2 and parts[0] == "accounts":
+                    account = ledger.account_json(parts[1])
+                    return self._send(200, account) if account else self._problem(404, "Resource Missing")
+
+                if len(parts) == 3 and parts[0] == "accounts" and parts[2] in ("transactions", "operations", "payments"):
+                    kind = "transactions" if parts[2] == "transactions" else "operations"
+                    records = ledger.account_records(parts[1], kind, params.get("cursor", ""),
+                                                     int(params.get("limit", 10)), params.get("order", "asc"))
+                    if parts[2] == "payments":
+                        records = [r for r in records if r.get("type") in ("payment", "create_account")]
+                    return self._page(records)
+
+                if len(parts) == 2 and parts[0] == "transactions":
+                    record = ledger.transactions.get(parts[1])
+                    if record is None:
+                        return self._problem(404, "Resource Missing")
+                    return self._send(200, {k: v for k, v in record.items() if not k.startswith("_")})
+
+                if not parts:
+                    return self._send(200, {"horizon_version": "fake", "network_passphrase": ledger.network_passphrase})
+                return self._problem(404, "Resource Missing")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode()
+                if fake._delay_and_maybe_fail():
+                    return self._problem(503, "Service Unavailable")
+                url = urlparse(self.path)
+                if url.path.rstrip("/") != "/transactions":
+                    return self._problem(404, "Resource Missing")
+                envelope_xdr = parse_qs(body).get("tx", [""])[0]
+                try:
+                    return self._send(200, ledger.submit(envelope_xdr))
+                except TransactionFailed as e:
+                    result_codes = {"transaction": e.transaction_code}
+                    if e.operation_codes:
+                        result_codes["operations"] = e.operation_codes
+                    return self._problem(400, "Transaction Failed", {"envelope_xdr": envelope_xdr,
+                                                                     "result_codes": result_codes})
+                except Exception as e:
+                    return self._problem(400, "Transaction Malformed", {"envelope_xdr": envelope_xdr,
+                                                                        "error": str(e)})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Horizon + Friendbot falsos para testes offline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de atraso por requisição")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Atraso extra aleatório (0..jitter)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de requisições que recebem 503")
+    args = parser.parse_args()
+
+    fake = FakeHorizon(args.host, args.port, args.latency, args.jitter, args.error_rate).start()
+    print(f"Fake Horizon em {fake.url} (friendbot: {fake.friendbot_url})")
+    print(f"  STELLAR_HORIZON_URL={fake.url} STELLAR_FRIENDBOT_URL={fake.friendbot_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Linhas/s das listagens de relógios: caminho antigo (objetos do ORM com
+todas as colunas + validação Pydantic de `List[WatchOut]`) contra o
+caminho rápido (projeção das colunas do WatchOut em tuplas + orjson,
+app/serialization.py).
+
+Mede separadamente consulta e serialização, e a rota inteira via HTTP:
+`GET /watches/my` (caminho rápido) contra uma cópia da versão antiga da
+mesma rota registrada só neste processo. A loja dona dos relógios lista
+todos eles de uma vez.
+
+Uso:
+    python benchmarks/list_serialization.py
+    python benchmarks/list_serialization.py --watches 50000 --runs 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="list_serialization_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ("automático cronógrafo aço ouro safira mostrador azul preto luneta cerâmica pulseira "
+         "couro borracha caixa original revisado garantia edição limitada mergulho GMT").split()
+BRANDS = ["Rolex", "Omega", "Cartier", "Patek Philippe", "Audemars Piguet", "Zenith", "IWC", "Tudor"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Linhas/s das listagens: ORM + Pydantic x projeção + orjson")
+    parser.add_argument("--watches", type=int, default=50000, help="Relógios da loja listada")
+    parser.add_argument("--runs", type=int, default=5, help="Repetições por medição (mediana)")
+    return parser.parse_args()
+
+
+def seed(count: int) -> int:
+    from app.database import SessionLocal
+    from app.models import Store, User, Watch
+
+    rnd = random.Random(7)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    owner = User(full_name="Loja", email="loja@bench.local", password_hash="x", role="store")
+    db.add(owner)
+    db.flush()
+    store = Store(user_id=owner.id, name="Loja", credentialed=True)
+    db.add(store)
+    db.flush()
+    db.execute(Watch.__table__.insert(), [
+        {"serial_number": f"SER-{i:07d}", "brand": rnd.choice(BRANDS), "model": rnd.choice(WORDS).capitalize(),
+         "year": rnd.randint(1960, 2025), "condition": rnd.choice(["novo", "excelente", "bom"]),
+         "description": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 60))),
+         "purchase_price_brl": rnd.randint(5, 900) * 1000.0, "current_value_brl": rnd.randint(5, 900) * 1000.0,
+         "current_owner_user_id": owner.id, "store_id": store.id, "status": "for_sale",
+         "laudo_hash": "%064x" % rnd.getrandbits(256), "created_at": now - timedelta(minutes=i),
+         "updated_at": now}
+        for i in range(count)
+    ])
+    db.commit()
+    owner_id = owner.id
+    db.close()
+    return owner_id
+
+
+def median_time(fn, runs: int):
+    timings = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    args = parse_args()
+    from typing import List
+
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+    from pydantic import TypeAdapter
+    from sqlalchemy.orm import Session
+
+    from app.auth import create_access_token, require_role
+    from app.database import SessionLocal, get_read_db, init_db
+    from app.main import app
+    from app.models import Watch
+    from app.routers.watches import WATCH_LIST
+    from app.schemas import WatchOut
+    from app.serialization import FastJSONResponse, orjson
+
+    init_db()
+    owner_id = seed(args.watches)
+    adapter = TypeAdapter(List[WatchOut])
+
+    # Versão anterior de GET /watches/my, só para comparação
+    @app.get("/bench/watches/my-legacy", response_model=List[WatchOut])
+    def legacy_my_watches(current_user=Depends(require_role(["user", "store"])), db: Session = Depends(get_read_db)):
+        return db.query(Watch).filter(Watch.current_owner_user_id == int(current_user["sub"])).all()
+
+    db = SessionLocal()
+    legacy_query = lambda: db.query(Watch).filter(Watch.current_owner_user_id == owner_id).all()
+    fast_query = lambda: db.query(*WATCH_LIST.columns).filter(Watch.current_owner_user_id == owner_id).all()
+
+    results = []
+    query_s, objects = median_time(lambda: (db.expunge_all(), legacy_query())[1], args.runs)
+    serialize_s, body = median_time(lambda: adapter.dump_json(adapter.validate_python(objects, from_attributes=True)), args.runs)
+    results.append(("antes: ORM + Pydantic", query_s, serialize_s, len(body)))
+
+    query_s, rows = median_time(fast_query, args.runs)
+    serialize_s, body = median_time(lambda: FastJSONResponse(WATCH_LIST.to_dicts(rows)).body, args.runs)
+    results.append(("depois: projeção + " + ("orjson" if orjson else "json"), query_s, serialize_s, len(body)))
+    db.close()
+
+    count = len(rows)
+    print(f"{count} relógios em uma listagem; mediana de {args.runs} execuções")
+    print(f"{'caminho':<28} {'consulta':>10} {'serialização':>13} {'linhas/s':>10} {'bytes':>11}")
+    for label, query_s, serialize_s, size in results:
+        print(f"{label:<28} {query_s * 1000:>8.0f}ms {serialize_s * 1000:>11.0f}ms "
+              f"{count / (query_s + serialize_s):>10.0f} {size:>11}")
+
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": str(owner_id), "role": "store"}),
+               "Accept-Encoding": "identity"}
+    print(f"\nRota inteira via HTTP (sem compressão):")
+    with TestClient(app) as client:
+        for label, path in [("antes", "/bench/watches/my-legacy"), ("depois", "/watches/my")]:
+            elapsed, response = median_time(lambda: client.get(path, headers=headers), args.runs)
+            assert response.status_code == 200 and len(response.json()) == count
+            print(f"  {label:<8} GET /watches/my  {elapsed * 1000:>7.0f}ms  {count / elapsed:>8.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API do marketplace contra o banco gerado por
+benchmarks/seed_large_dataset.py.
+
+Gerador de carga local (httpx assíncrono, N clientes concorrentes por um
+tempo fixo) com uma mistura ponderada das rotas mais acessadas:
+
+    marketplace     listagem com ordenação/filtros aleatórios e página seguinte (cursor)
+    search          busca textual por marca/modelo
+    watch_detail    GET /watches/{id} com ids aleatórios
+    favorites, notifications, notifications_unread, transaction_history
+    admin           dashboard, dashboard/detailed, dashboard/sales, reports/monthly
+    resale          fluxo completo de revenda: prepare -> propose-price ->
+                    accept -> pay -> confirm-delivery (cada etapa e o fluxo)
+
+Mostra p50/p95/p99 e requisições/s por rota e grava tudo em JSON (com o
+commit atual), para comparar execuções entre commits com --compare.
+
+Uso:
+    # servidor real (recomendado: mesmo DATABASE_URL do seed, workers de produção)
+    DATABASE_URL=sqlite:///./bench_large.db uvicorn app.main:app --workers 4
+    python benchmarks/load_test.py --manifest bench_large.json --concurrency 50 --duration 60
+
+    # aplicação em processo (sem rede; o gerador divide a CPU com a API)
+    python benchmarks/load_test.py --manifest bench_large.json --in-process
+
+    # comparar com uma execução anterior
+    python benchmarks/load_test.py --manifest bench_large.json --compare load_test_abc1234.json
+
+    # smoke test (tests/test_load_smoke.py): sai com código 1 se houver erros
+    python benchmarks/load_test.py --manifest bench_small.json --in-process --duration 3 --fail-on-errors
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+import httpx
+
+# Peso de cada cenário na mistura
+SCENARIO_WEIGHTS = {
+    "marketplace": 30,
+    "search": 10,
+    "watch_detail": 15,
+    "favorites": 8,
+    "notifications": 8,
+    "notifications_unread": 6,
+    "transaction_history": 5,
+    "admin": 4,
+    "resale": 3,
+}
+MARKETPLACE_SORTS = [None, "price-low", "price-high", "brand", "newest"]
+ADMIN_ROUTES = ["/admin/dashboard", "/admin/dashboard/detailed", "/admin/dashboard/sales", "/admin/reports/monthly"]
+# Clientes logados (o login passa pelo bcrypt; não entra na medição)
+MAX_LOGGED_USERS = 20
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Teste de carga das rotas principais da API")
+    parser.add_argument("--manifest", default="bench_large.json", help="Manifesto gerado pelo seed_large_dataset.py")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="API em execução")
+    parser.add_argument("--in-process", action="store_true", help="Roda a aplicação no próprio processo (ASGI)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Clientes simultâneos")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de medição")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos de aquecimento (não medidos)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIO_WEIGHTS),
+                        help="Cenários, separados por vírgula (padrão: todos)")
+    parser.add_argument("--output", default=None, help="Arquivo JSON do resultado (padrão: load_test_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fail-on-errors", action="store_true",
+                        help="Sai com código 1 se alguma requisição falhar (ou nenhuma for medida)")
+    return parser.parse_args()
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors: int, seconds: float) -> dict:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "mean_ms": round(sum(values) / count * 1000, 2) if count else 0.0,
+        "max_ms": round(values[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=BASE_DIR, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class Recorder:
+    """Latências e erros por nome; desligado durante o aquecimento"""
+
+    def __init__(self):
+        self.enabled = False
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+
+    def add(self, name: str, elapsed: float, error: str = None):
+        if not self.enabled:
+            return
+        self.latencies[name].append(elapsed)
+        if error:
+            self.errors[name] += 1
+            self.error_samples.setdefault(name, error)
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, manifest: dict, recorder: Recorder):
+        self.client = client
+        self.manifest = manifest
+        self.recorder = recorder
+        self.users = []  # (headers, ids dos relógios do usuário)
+        self.admin = None
+        self.stores = []  # (loja, headers da loja, headers do avaliador)
+        self.terms = manifest["brands"] + [model.split()[0] for model in manifest["models"]]
+
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        error = None
+        response = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        self.recorder.add(name, time.perf_counter() - started, error)
+        return response if error is None else None
+
+    async def login(self, email: str) -> dict:
+        response = await self.client.post("/auth/login", data={"username": email, "password": self.manifest["password"]})
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def setup(self, concurrency: int):
+        """Login dos usuários usados na carga e relógios de cada vendedor"""
+        emails = self.manifest["users"][:min(MAX_LOGGED_USERS, max(concurrency, 5))]
+        headers = await asyncio.gather(*(self.login(email) for email in emails))
+        for user_headers in headers:
+            response = await self.client.get("/watches/my", headers=user_headers)
+            response.raise_for_status()
+            self.users.append((user_headers, [w["id"] for w in response.json()]))
+        self.admin = await self.login(self.manifest["admin"])
+        for store in self.manifest["stores"][:5]:
+            store_headers, evaluator_headers = await asyncio.gather(
+                self.login(store["email"]), self.login(store["evaluator_email"]))
+            self.stores.append((store, store_headers, evaluator_headers))
+
+    async def marketplace(self, rnd):
+        params = {"limit": rnd.choice([20, 50])}
+        sort = rnd.choice(MARKETPLACE_SORTS)
+        if sort:
+            params["sort_by"] = sort
+        if rnd.random() < 0.3:
+            params["brand"] = rnd.choice(self.manifest["brands"])
+        response = await self.request("marketplace", "GET", "/watches/marketplace", params=params)
+        cursor = response.headers.get("x-next-cursor") if response is not None else None
+        if cursor and rnd.random() < 0.3:
+            await self.request("marketplace", "GET", "/watches/marketplace", params={**params, "cursor": cursor})
+
+    async def search(self, rnd):
+        await self.request("search", "GET", "/watches/search", params={"q": rnd.choice(self.terms)})
+
+    async def watch_detail(self, rnd):
+        await self.request("watch_detail", "GET", f"/watches/{rnd.randint(1, self.manifest['max_watch_id'])}")
+
+    async def favorites(self, rnd):
+        await self.request("favorites", "GET", "/watches/favorites", headers=rnd.choice(self.users)[0])
+
+    async def notifications(self, rnd):
+        await self.request("notifications", "GET", "/notifications/", headers=rnd.choice(self.users)[0])
+
+    async def notifications_unread(self, rnd):
+        await self.request("notifications_unread", "GET", "/notifications/unread", headers=rnd.choice(self.users)[0])
+
+    async def transaction_history(self, rnd):
+        await self.request("transaction_history", "GET", "/auth/transaction-history", headers=rnd.choice(self.users)[0])
+
+    async def admin_routes(self, rnd):
+        path = rnd.choice(ADMIN_ROUTES)
+        await self.request(f"admin {path}", "GET", path, headers=self.admin)
+
+    async def resale(self, rnd):
+        """Fluxo de revenda completo; cada etapa medida e o fluxo inteiro em 'resale'"""
+        seller_headers, watch_ids = rnd.choice([u for u in self.users if u[1]])
+        store, store_headers, evaluator_headers = rnd.choice(self.stores)
+        started = time.perf_counter()
+        response = await self.request("resale 1.prepare", "POST", "/resell/prepare", headers=seller_headers, json={
+            "watch_id": rnd.choice(watch_ids), "store_id": store["store_id"], "evaluator_id": store["evaluator_id"],
+            "proposed_price_brl": rnd.randint(5, 400) * 1000.0,
+        })
+        if response is None:
+            self.recorder.add("resale", time.perf_counter() - started, "prepare falhou")
+            return
+        offer_id = response.json()["id"]
+        steps = [
+            ("resale 2.propose-price", f"/resell/{offer_id}/propose-price", evaluator_headers,
+             {"proposed_price_brl": rnd.randint(5, 400) * 1000.0}),
+            ("resale 3.accept", f"/resell/{offer_id}/accept", seller_headers, None),
+            ("resale 4.pay", f"/resell/{offer_id}/pay", store_headers, None),
+            ("resale 5.confirm-delivery", f"/resell/{offer_id}/confirm-delivery", store_headers, None),
+        ]
+        for name, path, headers, payload in steps:
+            if await self.request(name, "POST", path, headers=headers, json=payload) is None:
+                self.recorder.add("resale", time.perf_counter() - started, f"{name} falhou")
+                return
+        self.recorder.add("resale", time.perf_counter() - started)
+
+    async def worker(self, scenarios, weights, deadline: float, rnd):
+        handlers = {"admin": self.admin_routes}
+        while time.perf_counter() < deadline:
+            name = rnd.choices(scenarios, weights)[0]
+            await handlers.get(name, getattr(self, name))(rnd)
+
+    async def run(self, scenarios, seconds: float, concurrency: int, seed: int):
+        weights = [SCENARIO_WEIGHTS[name] for name in scenarios]
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(
+            self.worker(scenarios, weights, deadline, random.Random(seed * 1000 + i)) for i in range(concurrency)
+        ))
+
+
+def make_client(args, manifest):
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    if not args.in_process:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits)
+    os.environ.setdefault("DATABASE_URL", manifest["database_url"])
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=60)
+
+
+def print_report(result, previous=None):
+    rows = sorted(result["scenarios"].items(), key=lambda item: -item[1]["requests"])
+    print(f"\n{'rota':<34} {'req':>7} {'erros':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+          + ("   Δreq/s    Δp95" if previous else ""))
+    for name, stats in rows + [("TOTAL", result["total"])]:
+        line = (f"{name:<34} {stats['requests']:>7} {stats['errors']:>6} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>6.1f}ms {stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms")
+        old = (previous["scenarios"].get(name) if name != "TOTAL" else previous["total"]) if previous else None
+        if old and old["rps"] and old["p95_ms"]:
+            line += (f" {(stats['rps'] / old['rps'] - 1) * 100:>+8.0f}%"
+                     f" {(stats['p95_ms'] / old['p95_ms'] - 1) * 100:>+6.0f}%")
+        print(line)
+
+
+async def main_async(args):
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIO_WEIGHTS)
+    if unknown:
+        sys.exit(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    recorder = Recorder()
+    async with make_client(args, manifest) as client:
+        test = LoadTest(client, manifest, recorder)
+        await test.setup(args.concurrency)
+        print(f"{'em processo' if args.in_process else args.base_url}: {args.concurrency} clientes, "
+              f"{args.warmup:g}s de aquecimento + {args.duration:g}s medidos; cenários: {', '.join(scenarios)}")
+        if args.warmup > 0:
+            await test.run(scenarios, args.warmup, args.concurrency, args.seed + 1)
+        recorder.enabled = True
+        started = time.perf_counter()
+        await test.run(scenarios, args.duration, args.concurrency, args.seed)
+        elapsed = time.perf_counter() - started
+        recorder.enabled = False
+
+    # "resale" é o fluxo inteiro; o total conta só requisições HTTP
+    http_names = [name for name in recorder.latencies if name != "resale"]
+    commit, dirty = git_commit()
+    return {
+        "meta": {
+            "commit": commit, "dirty": dirty, "started_at": datetime.utcnow().isoformat(),
+            "target": "in-process" if args.in_process else args.base_url,
+            "concurrency": args.concurrency, "duration_s": round(elapsed, 2), "warmup_s": args.warmup,
+            "scenarios": scenarios, "python": platform.python_version(), "cpus": os.cpu_count(),
+            "dataset": manifest.get("counts"),
+        },
+        "total": summarize([v for name in http_names for v in recorder.latencies[name]],
+                           sum(recorder.errors[name] for name in http_names), elapsed),
+        "scenarios": {name: summarize(values, recorder.errors[name], elapsed)
+                      for name, values in sorted(recorder.latencies.items())},
+        "error_samples": recorder.error_samples,
+    }
+
+
+def main():
+    args = parse_args()
+    result = asyncio.run(main_async(args))
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(result, previous)
+    for name, sample in result["error_samples"].items():
+        print(f"  erro em {name}: {sample}")
+
+    output = args.output or f"load_test_{result['meta']['commit'] or 'local'}.json"
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResultado: {output}")
+
+    if args.fail_on_errors:
+        errors = sum(stats["errors"] for stats in result["scenarios"].values())
+        if errors or not result["total"]["requests"]:
+            sys.exit(f"❌ {errors} erros em {result['total']['requests']} requisições")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tempo de inicialização da API: importação de app.main, startup (init_db)
+e primeiro uso dos contratos Stellar, cada medição em um interpretador novo
+(como um worker do uvicorn/gunicorn recém-criado).
+
+Também confere que importar a aplicação não carrega módulos que só os
+contratos Stellar usam (stellar_sdk, boto3/botocore): se carregar, alguém
+voltou a importar ou inicializar algo no topo de um módulo.
+
+Uso:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10 --max-import-ms 1500   # falha (exit 1) acima do limite
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Não devem ser importados por `import app.main`
+LAZY_MODULES = ["boto3", "botocore", "stellar_sdk"]
+
+PROBE = r"""
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+
+started = time.perf_counter()
+import app.main
+import_ms = (time.perf_counter() - started) * 1000
+loaded = [name for name in LAZY_MODULES if name in sys.modules]
+
+from app.database import init_db
+started = time.perf_counter()
+init_db()
+init_db_ms = (time.perf_counter() - started) * 1000
+
+started = time.perf_counter()
+from app.stellar_contracts import get_stellar_contracts
+get_stellar_contracts()
+contracts_ms = (time.perf_counter() - started) * 1000
+
+print(json.dumps({"import_ms": import_ms, "init_db_ms": init_db_ms,
+                  "contracts_ms": contracts_ms, "loaded": loaded}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tempo de importação e startup da API")
+    parser.add_argument("--runs", type=int, default=5, help="Interpretadores novos por medição")
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="Falha se a mediana de `import app.main` passar deste valor")
+    return parser.parse_args()
+
+
+def probe(db_path: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{db_path}"
+    env.setdefault("STELLAR_MASTER_SECRET", "SBPQUZ6G4FZNWFHKUWC5BEYWF6R52E3SEP7R3GWYSM2XTKGF5LNTWW4R")
+    code = f"LAZY_MODULES = {LAZY_MODULES!r}\n{PROBE}"
+    output = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="startup_time_")
+
+    # Primeira execução fora da conta: compila .pyc e cria o banco
+    probe(os.path.join(workdir, "warm.db"))
+
+    runs = [probe(os.path.join(workdir, "warm.db")) for _ in range(args.runs)]
+    fresh = [probe(os.path.join(workdir, f"fresh{i}.db")) for i in range(args.runs)]
+
+    def median(rows, key):
+        return statistics.median(row[key] for row in rows)
+
+    print(f"Interpretadores novos por medição: {args.runs}")
+    print(f"  import app.main            {median(runs, 'import_ms'):>8.1f}ms")
+    print(f"  init_db (banco existente)  {median(runs, 'init_db_ms'):>8.1f}ms")
+    print(f"  init_db (banco novo)       {median(fresh, 'init_db_ms'):>8.1f}ms")
+    print(f"  contratos Stellar (1º uso) {median(runs, 'contracts_ms'):>8.1f}ms")
+
+    failed = False
+    loaded = sorted({name for row in runs for name in row["loaded"]})
+    if loaded:
+        print(f"❌ Importar app.main carregou módulos que deveriam ser lazy: {', '.join(loaded)}")
+        failed = True
+    if args.max_import_ms is not None and median(runs, "import_ms") > args.max_import_ms:
+        print(f"❌ Importação acima do limite de {args.max_import_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print("✅ Inicialização dentro do esperado")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Teste de carga dos fluxos Stellar reais (EscrowContract e NFTContract)
+contra o Horizon falso em processo (benchmarks/fake_horizon.py).
+
+Fluxos medidos, cada iteração de ponta a ponta:
+
+    nft     mint (friendbot + trustline/pagamento em lote) + transferência
+    escrow  criação do escrow (friendbot + trustline + banco) + liberação
+            dos fundos (comissão e vendedor em uma transação + banco)
+
+Para cada latência injetada roda os dois fluxos e mostra vazão e
+percentis, para ver como a plataforma degrada quando o Horizon fica lento.
+
+Uso:
+    python benchmarks/stellar_load.py
+    python benchmarks/stellar_load.py --latencies 0,0.05,0.2 --error-rate 0.01 \\
+        --iterations 200 --concurrency 20 --channels 10
+"""
+
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stellar_sdk import Asset, Keypair
+
+from fake_horizon import FakeHorizon
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Carga dos contratos Stellar contra Horizon falso")
+    parser.add_argument("--latencies", default="0,0.05,0.2", help="Latências do Horizon em segundos, separadas por vírgula")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de requisições com 503")
+    parser.add_argument("--iterations", type=int, default=100, help="Execuções de cada fluxo por cenário")
+    parser.add_argument("--concurrency", type=int, default=20, help="Threads simultâneas")
+    parser.add_argument("--channels", type=int, default=0, help="Contas de canal para a conta master")
+    return parser.parse_args()
+
+
+def setup_environment(fake: FakeHorizon, channels: int):
+    """Variáveis de ambiente lidas na importação de app.database e app.stellar_contracts"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='stellar_load_'), 'load.db')}"
+    os.environ["STELLAR_HORIZON_URL"] = fake.url
+    os.environ["STELLAR_FRIENDBOT_URL"] = fake.friendbot_url
+
+    master = Keypair.random()
+    os.environ["STELLAR_MASTER_SECRET"] = master.secret
+    fake.ledger.create_account(master.public_key)
+
+    channel_keys = [Keypair.random() for _ in range(channels)]
+    for channel in channel_keys:
+        fake.ledger.create_account(channel.public_key)
+    os.environ["STELLAR_CHANNEL_SECRETS"] = ",".join(k.secret for k in channel_keys)
+    return master
+
+
+def nft_flow(contracts, fake: FakeHorizon, i: int):
+    """Mint do NFT para o dono e transferência para o comprador"""
+    owner, buyer = Keypair.random(), Keypair.random()
+    fake.ledger.create_account(owner.public_key)
+    fake.ledger.create_account(buyer.public_key)
+    serial = f"LOAD{i:06d}"
+    report_hash = hashlib.sha256(serial.encode()).hexdigest()
+
+    started = time.perf_counter()
+    asset_code, issuer, _ = contracts.get_watch_registration().mint_watch_nft(
+        serial, owner.public_key, report_hash, owner_secret=owner.secret
+    )
+    nft_asset = Asset(asset_code, issuer)
+    # _ensure_trustline ainda é responsabilidade da carteira do comprador
+    fake.ledger.set_trustline(buyer.public_key, nft_asset)
+    contracts.get_nft()._execute_nft_transfer(owner.public_key, owner.secret, buyer.public_key, nft_asset, serial)
+    elapsed = time.perf_counter() - started
+
+    assert fake.ledger.balance(buyer.public_key, nft_asset) == 1
+    return elapsed
+
+
+def escrow_flow(contracts, fake: FakeHorizon, offer_id: int, depositor: Keypair, amount: Decimal):
+    """Criação do escrow, depósito do comprador e liberação com split"""
+    escrow_contract = contracts.get_escrow()
+
+    started = time.perf_counter()
+    created = escrow_contract.deposit_to_escrow(offer_id, amount, depositor.public_key)
+    # Depósito do comprador em USDC (fora do contrato, vem da carteira dele)
+    fake.ledger.credit(created["escrow_account"], escrow_contract.usdc_asset, amount)
+    escrow_contract._release_escrow_funds(created["escrow_id"])
+    return time.perf_counter() - started
+
+
+def run_scenario(name, flow, iterations, concurrency):
+    durations, errors = [], []
+
+    def attempt(i):
+        try:
+            durations.append(flow(i))
+        except Exception as e:
+            errors.append(str(e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(attempt, range(iterations)))
+    wall = time.perf_counter() - started
+
+    durations.sort()
+    if durations:
+        p50 = statistics.median(durations) * 1000
+        p95 = durations[max(int(len(durations) * 0.95) - 1, 0)] * 1000
+    else:
+        p50 = p95 = 0.0
+    per_minute = len(durations) / wall * 60 if wall else 0.0
+    print(f"  {name:<7} ok={len(durations):>4}/{iterations:<4} erros={len(errors):>3}  "
+          f"{per_minute:>8.0f}/min  p50={p50:>7.1f}ms  p95={p95:>7.1f}ms")
+    if errors:
+        print(f"          ex.: {errors[0][:140]}")
+
+
+def main():
+    args = parse_args()
+    fake = FakeHorizon(seed=42).start()
+    master = setup_environment(fake, args.channels)
+
+    from app.database import SessionLocal, init_db
+    from app.models import ResellOffer
+    from app.stellar_contracts import StellarContractsManager
+
+    init_db()
+    contracts = StellarContractsManager()
+    usdc = contracts.get_escrow().usdc_asset
+    fake.ledger.set_trustline(master.public_key, usdc)
+
+    # Ofertas de revenda com vendedores que já têm trustline de USDC
+    db = SessionLocal()
+    offers = []
+    for _ in range(args.iterations):
+        seller = Keypair.random()
+        fake.ledger.create_account(seller.public_key)
+        fake.ledger.set_trustline(seller.public_key, usdc)
+        offer = ResellOffer(status="accepted", seller_stellar_key=seller.public_key)
+        db.add(offer)
+        offers.append(offer)
+    db.commit()
+    offer_ids = [offer.id for offer in offers]
+    db.close()
+    depositor = Keypair.random()
+
+    print(f"Fake Horizon: {fake.url}  iterações={args.iterations}  concorrência={args.concurrency}  "
+          f"canais={args.channels}  taxa de erro={args.error_rate:.1%}")
+    counter = [0]
+    for latency in [float(x) for x in args.latencies.split(",")]:
+        fake.latency = latency
+        fake.error_rate = args.error_rate
+        print(f"\nLatência do Horizon: {latency * 1000:.0f}ms")
+
+        base = counter[0]
+        counter[0] += args.iterations
+        run_scenario("nft", lambda i: nft_flow(contracts, fake, base + i), args.iterations, args.concurrency)
+        run_scenario("escrow", lambda i: escrow_flow(contracts, fake, offer_ids[i], depositor, Decimal("1000")),
+                     args.iterations, args.concurrency)
+
+        # Cada oferta é liberada uma vez por cenário; limpar para o próximo
+        db = SessionLocal()
+        from app.models import Escrow
+        db.query(Escrow).delete()
+        db.commit()
+        db.close()
+
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
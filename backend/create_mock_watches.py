@@ -8,7 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
-from app.database import get_db, engine
+from app.database import get_db, init_db
 from app.models import Watch, Store, User
 from datetime import datetime
 
@@ -198,5 +198,6 @@ def create_mock_watches():
         db.close()
 
 if __name__ == "__main__":
+    init_db()
     print("🔧 Criando relógios de mock na base de dados...")
     create_mock_watches()
\ No newline at end of file
@@ -0,0 +1,14 @@
+import argparse
+
+from app.database import SessionLocal, init_db
+from app.stellar_ingest import run
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão das operações Stellar (NFTs, escrows) para o banco")
+    parser.add_argument("--once", action="store_true", help="Lê até alcançar o Horizon e sai")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Segundos entre ciclos sem operações novas")
+    args = parser.parse_args()
+
+    init_db()
+    print("Ingestão Stellar iniciada")
+    run(SessionLocal, poll_interval=args.poll_interval, once=args.once)
@@ -0,0 +1,14 @@
+import argparse
+
+from app.database import SessionLocal, init_db
+from app.jobs import work
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker da fila de jobs (mint, transferência, escrow)")
+    parser.add_argument("--once", action="store_true", help="Processa os jobs pendentes e sai")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Segundos entre consultas à fila vazia")
+    args = parser.parse_args()
+
+    init_db()
+    print("Worker de jobs iniciado")
+    work(SessionLocal, poll_interval=args.poll_interval, once=args.once)
@@ -0,0 +1,91 @@
+"""
+Fixtures compartilhadas dos testes.
+
+A aplicação lê DATABASE_URL na importação, então cada execução do pytest
+aponta para um SQLite temporário próprio antes de importar `app` (nunca
+para o marketplace.db de desenvolvimento). Cada módulo de teste começa com
+o banco vazio e o cache do catálogo limpo. Os contratos Stellar rodam
+contra o Horizon falso de benchmarks/fake_horizon.py.
+
+Uso (na pasta backend):
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))  # fake_horizon
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='aurum_tests_'), 'tests.db')}"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app.auth import create_access_token
+from app.cache import invalidate_catalog
+from app.database import engine, init_db
+from app.models import Base
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
+    yield engine
+
+
+@pytest.fixture(scope="module", autouse=True)
+def empty_database(database):
+    """Apaga as linhas de todas as tabelas (o índice de busca acompanha por trigger)"""
+    with database.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+    invalidate_catalog()
+    yield
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    """auth_headers(user) -> header Authorization com um token do usuário"""
+
+    def make(user):
+        token = create_access_token({"sub": str(user.id), "role": user.role})
+        return {"Authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def fake_horizon():
+    from fake_horizon import FakeHorizon
+
+    with FakeHorizon() as fake:
+        yield fake
+
+
+@pytest.fixture
+def stellar(fake_horizon, monkeypatch):
+    """Contratos Stellar apontando para o Horizon falso, com conta master criada"""
+    from stellar_sdk import Keypair
+
+    from app import stellar_contracts
+
+    master = Keypair.random()
+    fake_horizon.ledger.create_account(master.public_key)
+    monkeypatch.setenv("STELLAR_MASTER_SECRET", master.secret)
+    monkeypatch.delenv("STELLAR_CHANNEL_SECRETS", raising=False)
+    manager = stellar_contracts.StellarContractsManager(
+        stellar_contracts.StellarContracts(fake_horizon.url, fake_horizon.friendbot_url)
+    )
+    monkeypatch.setattr(stellar_contracts, "_manager", manager)
+    yield manager
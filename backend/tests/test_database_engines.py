@@ -0,0 +1,115 @@
+"""
+Engine de create_db_engine nos dois bancos suportados: SQLite em arquivo
+(WAL) e Postgres. O caso Postgres só roda com TEST_POSTGRES_URL apontando
+para um banco descartável, por exemplo:
+
+    TEST_POSTGRES_URL=postgresql+psycopg://postgres@localhost/aurum_test python -m pytest -q
+"""
+
+import os
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app import search
+from app.database import DB_POOL_SIZE, create_db_engine, normalize_database_url
+from app.migrations import run_migrations
+from app.models import User, Watch
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="module", params=[
+    "sqlite",
+    pytest.param("postgres", marks=pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL não definido")),
+])
+def engine(request, tmp_path_factory):
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path_factory.mktemp('engine') / 'engine.db'}"
+    else:
+        url = TEST_POSTGRES_URL
+    engine = create_db_engine(url)
+    backend = search._backend
+    run_migrations(engine)
+    run_migrations(engine)  # idempotente a cada start
+    yield engine
+    engine.dispose()
+    search._backend = backend  # run_migrations escolhe o backend de busca do processo
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_engine_profile(engine):
+    assert engine.pool.size() == DB_POOL_SIZE
+    assert engine.pool._pre_ping
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    else:
+        assert engine.dialect.name == "postgresql"
+
+
+def test_concurrent_writes_and_reads(session_factory):
+    stamp = time.time_ns()
+    errors = []
+
+    def write(n):
+        db = session_factory()
+        try:
+            user = User(full_name=f"Engine {n}", email=f"engine-{stamp}-{n}@engines.example.com",
+                        password_hash="x", role="user")
+            db.add(user)
+            db.flush()
+            db.add(Watch(serial_number=f"ENG-{stamp}-{n}", brand="Tudor", model="Black Bay",
+                         current_owner_user_id=user.id, status="available"))
+            db.commit()
+            # Leitura logo depois da escrita, concorrente com as escritas dos outros threads
+            db.execute(select(func.count(Watch.id))).scalar_one()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    db = session_factory()
+    try:
+        watches = db.query(Watch).filter(Watch.serial_number.like(f"ENG-{stamp}-%")).all()
+        assert len(watches) == 8
+        # session.delete mantém marketplace_stats em dia (DELETE em massa é recusado)
+        for row in watches + db.query(User).filter(User.email.like(f"engine-{stamp}-%")).all():
+            db.delete(row)
+            db.flush()
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_sqlite_without_fts5_falls_back_to_like(tmp_path, monkeypatch, caplog):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sem_fts.db'}")
+    monkeypatch.setattr(search, "_backend", search._backend)
+    # Mesmo erro de um SQLite compilado sem FTS5: "no such module"
+    monkeypatch.setattr(search, "_SQLITE_FTS_DDL", ["CREATE VIRTUAL TABLE watches_fts USING sem_fts5(brand)"])
+    try:
+        with caplog.at_level("WARNING", logger="app.search"):
+            assert search.ensure_search_index(engine) == "like"
+    finally:
+        engine.dispose()
+    assert "FTS5 indisponível" in caplog.text
+
+
+def test_postgres_scheme_is_normalized():
+    assert normalize_database_url("postgres://u:p@host/db") == "postgresql://u:p@host/db"
+    assert normalize_database_url("sqlite:///x.db") == "sqlite:///x.db"
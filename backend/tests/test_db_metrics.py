@@ -0,0 +1,55 @@
+"""
+Log de consultas lentas: parâmetros fora por padrão e nunca os de colunas
+sensíveis, nem no log nem em GET /admin/db-stats.
+"""
+
+import time
+
+import pytest
+
+from app import db_metrics
+from app.database import SessionLocal
+from app.models import User
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    monkeypatch.setattr(db_metrics, "SLOW_QUERY_MS", 1e-6)
+    db_metrics.recent_slow_queries.clear()
+    yield db_metrics.recent_slow_queries
+    db_metrics.recent_slow_queries.clear()
+
+
+def _create_user(secret: str) -> User:
+    db = SessionLocal()
+    user = User(full_name="Cliente", email=f"cliente-{time.time_ns()}@metrics.example.com",
+                password_hash=secret, stellar_secret=secret, role="admin")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    return user
+
+
+def test_parameters_are_omitted_by_default(log_everything):
+    assert not db_metrics.SLOW_QUERY_LOG_PARAMS
+    _create_user("segredo-padrao")
+    assert log_everything
+    assert all(entry["parameters"] == "(omitidos)" for entry in log_everything)
+
+
+def test_sensitive_parameters_are_never_logged(log_everything, monkeypatch, client, auth_headers):
+    monkeypatch.setattr(db_metrics, "SLOW_QUERY_LOG_PARAMS", True)
+    admin = _create_user("SBSEGREDO-NAO-LOGAR")
+
+    response = client.get("/admin/db-stats", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert "SBSEGREDO-NAO-LOGAR" not in response.text
+    assert not any("SBSEGREDO-NAO-LOGAR" in entry["parameters"] for entry in log_everything)
+    assert any(entry["parameters"] == "(omitidos: colunas sensíveis)" for entry in log_everything)
+
+    # Consultas sem colunas sensíveis continuam com os parâmetros
+    db = SessionLocal()
+    db.query(User.id).filter(User.email == admin.email).all()
+    db.close()
+    assert any(admin.email in entry["parameters"] for entry in log_everything)
@@ -0,0 +1,255 @@
+"""
+Fila de jobs: idempotência por usuário, reenvio de jobs falhos, lease com
+heartbeat e retomada sem repetir o efeito na rede.
+"""
+
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from stellar_sdk import Asset, Keypair
+
+from app import jobs
+from app.database import SessionLocal
+from app.models import Escrow, Job, NFTToken, ResellOffer, User, Watch
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture
+def users(db):
+    stamp = time.time_ns()
+    created = [User(full_name=name, email=f"{name}-{stamp}@jobs.example.com", password_hash="x", role="user")
+               for name in ("a", "b")]
+    db.add_all(created)
+    db.commit()
+    return created
+
+
+@pytest.fixture
+def noop(monkeypatch):
+    calls = []
+
+    def handler(payload, checkpoint):
+        calls.append(payload)
+        return {"ok": True}
+
+    monkeypatch.setitem(jobs.HANDLERS, "test.noop", handler)
+    return calls
+
+
+def _work():
+    return jobs.work(SessionLocal, worker_id="test-worker", once=True)
+
+
+def test_idempotency_key_is_scoped_per_user(db, users, noop):
+    user_a, user_b = users
+    first = jobs.enqueue(db, "test.noop", {"n": 1}, idempotency_key="k1", created_by_user_id=user_a.id)
+    assert jobs.enqueue(db, "test.noop", {"n": 1}, idempotency_key="k1", created_by_user_id=user_a.id).id == first.id
+
+    # Outro usuário com a mesma chave ganha um job próprio
+    other = jobs.enqueue(db, "test.noop", {"n": 1}, idempotency_key="k1", created_by_user_id=user_b.id)
+    assert other.id != first.id and other.created_by_user_id == user_b.id
+
+    with pytest.raises(jobs.IdempotencyConflict):
+        jobs.enqueue(db, "test.noop", {"n": 2}, idempotency_key="k1", created_by_user_id=user_a.id)
+
+    # Chaves compartilhadas identificam o recurso, não quem enfileira
+    shared = jobs.enqueue(db, "test.noop", {"n": 3}, idempotency_key="recurso", created_by_user_id=user_a.id, shared=True)
+    assert jobs.enqueue(db, "test.noop", {"n": 3}, idempotency_key="recurso", created_by_user_id=user_b.id,
+                        shared=True).id == shared.id
+
+
+def test_conflicting_key_returns_409(db, client, auth_headers, users):
+    user_a, _ = users
+    headers = {**auth_headers(user_a), "Idempotency-Key": "transfer-1"}
+    body = {"watch_id": 1, "from_user_id": user_a.id, "to_user_id": 2}
+    response = client.post("/jobs/nft/transfer", headers=headers, json=body)
+    assert response.status_code == 202
+    assert client.post("/jobs/nft/transfer", headers=headers, json={**body, "to_user_id": 3}).status_code == 409
+    db.query(Job).filter(Job.id == response.json()["id"]).delete()  # Não deixar para o worker dos outros testes
+    db.commit()
+
+
+def test_failed_job_is_requeued_by_its_key(db, users, monkeypatch):
+    attempts = []
+
+    def flaky(payload, checkpoint):
+        attempts.append(checkpoint.get("step"))
+        checkpoint.save(step="started")
+        if len(attempts) == 1:
+            raise RuntimeError("Horizon fora do ar")
+        return {"ok": True}
+
+    monkeypatch.setitem(jobs.HANDLERS, "test.flaky", flaky)
+    job = jobs.enqueue(db, "test.flaky", {}, idempotency_key="flaky", max_attempts=1,
+                       created_by_user_id=users[0].id)
+    _work()
+    db.refresh(job)
+    assert job.status == "failed"
+
+    again = jobs.enqueue(db, "test.flaky", {}, idempotency_key="flaky", max_attempts=1,
+                         created_by_user_id=users[0].id)
+    assert again.id == job.id and again.status == "pending" and again.attempts == 0
+    _work()
+    db.refresh(job)
+    assert job.status == "succeeded"
+    assert attempts == [None, "started"]  # checkpoint mantido entre as execuções
+
+
+def test_heartbeat_extends_lease(db, noop, database):
+    job = jobs.enqueue(db, "test.noop", {})
+    claimed = jobs.claim_next(db, "heartbeat-worker", lease_seconds=1)
+    assert claimed.id == job.id
+    with jobs.LeaseHeartbeat(database, job.id, "heartbeat-worker", lease_seconds=600, interval=0.05):
+        time.sleep(0.3)
+    db.refresh(job)
+    assert job.locked_until > datetime.utcnow() + timedelta(seconds=500)
+
+    # Lease de outro worker não é renovado
+    assert not jobs.LeaseHeartbeat(database, job.id, "outro-worker").extend()
+    jobs.complete(db, job, None)
+
+
+def test_expired_exhausted_job_fails_on_claim(db, noop):
+    job = jobs.enqueue(db, "test.noop", {}, max_attempts=1)
+    job.status, job.attempts = "running", 1
+    job.locked_by, job.locked_until = "worker-morto", datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert _work() == 0
+    db.refresh(job)
+    assert job.status == "failed" and "Lease expirado" in job.last_error
+    assert noop == []
+
+
+def test_mint_retry_does_not_mint_twice(stellar, fake_horizon):
+    owner = Keypair.random()
+    fake_horizon.ledger.create_account(owner.public_key)
+    registration = stellar.get_watch_registration()
+    checkpoint = jobs.Checkpoint()
+
+    asset_code, issuer, tx_hash = registration.mint_watch_nft("RETRY-1", owner.public_key, "", owner.secret,
+                                                              checkpoint=checkpoint)
+    submitted = len(fake_horizon.ledger.transactions)
+    # Worker caiu depois do envio: a nova tentativa acha a transação gravada no ledger
+    assert registration.mint_watch_nft("RETRY-1", owner.public_key, "", owner.secret,
+                                       checkpoint=checkpoint) == (asset_code, issuer, tx_hash)
+    assert len(fake_horizon.ledger.transactions) == submitted
+    assert fake_horizon.ledger.balance(owner.public_key, Asset(asset_code, issuer)) == 1
+
+
+def test_pending_transaction_is_not_resubmitted(stellar, fake_horizon):
+    owner = Keypair.random()
+    fake_horizon.ledger.create_account(owner.public_key)
+    checkpoint = jobs.Checkpoint()
+    # Transação montada e gravada, mas o envio não chegou ao Horizon (ainda dentro do time bound)
+    checkpoint.save(mint_tx={"hash": "0" * 64, "max_time": int(time.time()) + 30})
+    with pytest.raises(Exception, match="ainda pode entrar no ledger"):
+        stellar.get_watch_registration().mint_watch_nft("RETRY-2", owner.public_key, "", owner.secret,
+                                                        checkpoint=checkpoint)
+
+    checkpoint.save(mint_tx={"hash": "0" * 64, "max_time": int(time.time()) - 1})
+    stellar.get_watch_registration().mint_watch_nft("RETRY-2", owner.public_key, "", owner.secret,
+                                                    checkpoint=checkpoint)
+    assert checkpoint.get("mint_tx")["hash"] != "0" * 64
+
+
+def test_release_after_crash_does_not_pay_twice(db, stellar, fake_horizon, monkeypatch):
+    escrow_contract = stellar.get_escrow()
+    usdc = escrow_contract.usdc_asset
+    fake_horizon.ledger.set_trustline(stellar.stellar.master_account, usdc)
+    seller = Keypair.random()
+    fake_horizon.ledger.create_account(seller.public_key)
+    fake_horizon.ledger.set_trustline(seller.public_key, usdc)
+    offer = ResellOffer(status="accepted", seller_stellar_key=seller.public_key)
+    db.add(offer)
+    db.commit()
+    created = escrow_contract.deposit_to_escrow(offer.id, Decimal("100"), seller.public_key)
+    fake_horizon.ledger.credit(created["escrow_account"], usdc, "100")
+
+    # Primeira tentativa paga na rede e cai antes de gravar no banco
+    record_release = escrow_contract._record_release
+    monkeypatch.setattr(escrow_contract, "_record_release",
+                        lambda *args: (_ for _ in ()).throw(RuntimeError("worker caiu")))
+    job = jobs.enqueue(db, "escrow.release", {"escrow_id": created["escrow_id"]},
+                       idempotency_key=f"escrow.release:{created['escrow_id']}", shared=True)
+    _work()
+    db.refresh(job)
+    assert job.status == "pending" and job.checkpoint["release_tx"]
+    assert fake_horizon.ledger.balance(seller.public_key, usdc) == Decimal("92")
+
+    monkeypatch.setattr(escrow_contract, "_record_release", record_release)
+    job.run_after = datetime.utcnow()
+    db.commit()
+    _work()
+    db.refresh(job)
+    assert job.status == "succeeded", job.last_error
+    assert fake_horizon.ledger.balance(seller.public_key, usdc) == Decimal("92")
+    assert db.get(Escrow, created["escrow_id"]).admin_tx_hash == job.checkpoint["release_tx"]["hash"]
+
+
+def test_stellar_endpoints_enqueue_jobs(db, stellar, fake_horizon, client, auth_headers):
+    owner, buyer = Keypair.random(), Keypair.random()
+    for keypair in (owner, buyer):
+        fake_horizon.ledger.create_account(keypair.public_key)
+    stamp = time.time_ns()
+    seller = User(full_name="Dono", email=f"dono-{stamp}@jobs.example.com", password_hash="x", role="user",
+                  stellar_public_key=owner.public_key, stellar_secret=owner.secret)
+    receiver = User(full_name="Destino", email=f"destino-{stamp}@jobs.example.com", password_hash="x", role="user",
+                    stellar_public_key=buyer.public_key, stellar_secret=buyer.secret)
+    db.add_all([seller, receiver])
+    db.flush()
+    watch = Watch(serial_number=f"JOB-{stamp}", brand="Omega", model="Speedmaster", current_owner_user_id=seller.id)
+    db.add(watch)
+    db.commit()
+
+    response = client.post("/stellar/watches/register", headers=auth_headers(seller),
+                           json={"watch_id": watch.id, "serial_number": watch.serial_number,
+                                 "brand": "Omega", "model": "Speedmaster"})
+    assert response.status_code == 202, response.text
+    assert response.json()["type"] == "nft.tokenize"
+    assert _work() == 1
+    token = db.query(NFTToken).filter(NFTToken.watch_id == watch.id).one()
+    nft_asset = Asset(token.asset_code, token.issuer_account)
+    assert fake_horizon.ledger.balance(owner.public_key, nft_asset) == 1
+
+    fake_horizon.ledger.set_trustline(buyer.public_key, nft_asset)
+    response = client.post("/stellar/nft/transfer", headers=auth_headers(seller),
+                           json={"from_watch_id": watch.id, "to_address": buyer.public_key})
+    assert response.status_code == 202, response.text
+    assert _work() == 1
+    assert db.get(Job, response.json()["id"]).status == "succeeded"
+    assert fake_horizon.ledger.balance(buyer.public_key, nft_asset) == 1
+
+
+def test_upgrade_table_scopes_existing_keys(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE jobs (id INTEGER PRIMARY KEY, type VARCHAR NOT NULL, payload JSON NOT NULL, "
+            "idempotency_key VARCHAR UNIQUE, created_by_user_id INTEGER, status VARCHAR NOT NULL, "
+            "attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, run_after DATETIME NOT NULL, "
+            "locked_by VARCHAR, locked_until DATETIME, result JSON, last_error TEXT, created_at DATETIME, "
+            "updated_at DATETIME, finished_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO jobs (id, type, payload, idempotency_key, created_by_user_id, status, attempts, "
+            "max_attempts, run_after) VALUES (7, 'escrow.release', '{\"escrow_id\": 3}', 'escrow.release:3', "
+            "2, 'pending', 0, 5, '2025-01-01 00:00:00')"
+        ))
+
+    jobs.upgrade_table(engine)
+    columns = {column["name"] for column in inspect(engine).get_columns("jobs")}
+    assert {"idempotency_scope", "payload_hash", "checkpoint"} <= columns
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT id, idempotency_scope, payload_hash FROM jobs")).one()
+    assert row == (7, jobs.SHARED_SCOPE, jobs.payload_hash({"escrow_id": 3}))
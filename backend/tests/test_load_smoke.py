@@ -0,0 +1,38 @@
+"""
+Smoke test de carga: um banco pequeno gerado por seed_large_dataset.py e
+alguns segundos de load_test.py em processo, com todas as rotas da
+mistura (incluindo o fluxo de revenda). Qualquer requisição com erro falha
+o teste. Roda em subprocessos, cada um com o seu DATABASE_URL.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+SEED_ARGS = ["--watches", "300", "--users", "100", "--stores", "5", "--transfers", "500",
+             "--notifications", "500", "--favorites", "100", "--resell-offers", "20"]
+
+
+def _run(script, args, env, cwd):
+    completed = subprocess.run([sys.executable, os.path.join(BENCHMARKS_DIR, script), *args],
+                               env=env, cwd=cwd, capture_output=True, text=True, timeout=300)
+    assert completed.returncode == 0, f"{script} falhou:\n{completed.stdout}\n{completed.stderr}"
+    return completed
+
+
+def test_load_smoke(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'smoke.db'}"
+    manifest, output = tmp_path / "smoke.json", tmp_path / "load.json"
+    env = {**os.environ, "DATABASE_URL": database_url}
+
+    _run("seed_large_dataset.py", ["--database-url", database_url, "--manifest", str(manifest), *SEED_ARGS],
+         env, tmp_path)
+    _run("load_test.py", ["--manifest", str(manifest), "--in-process", "--concurrency", "4", "--duration", "3",
+                          "--warmup", "0", "--output", str(output), "--fail-on-errors"], env, tmp_path)
+
+    result = json.loads(output.read_text())
+    assert result["total"]["requests"] > 0 and result["total"]["errors"] == 0
+    assert result["scenarios"]["resale"]["requests"] > 0
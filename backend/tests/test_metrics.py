@@ -0,0 +1,64 @@
+"""
+GET /metrics só responde com o Bearer METRICS_TOKEN; sem token configurado
+o endpoint fica desligado. A liberação de escrow aparece como usdc_payment.
+"""
+
+from app import metrics
+
+
+def test_metrics_is_off_without_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer qualquer"}).status_code == 404
+
+
+def test_metrics_requires_bearer_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "token-de-scrape")
+
+    response = client.get("/metrics")
+    assert response.status_code == 401 and response.headers["WWW-Authenticate"] == "Bearer"
+    assert client.get("/metrics", headers={"Authorization": "Bearer errado"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Basic token-de-scrape"}).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer token-de-scrape"})
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_escrow_release_records_usdc_payment(stellar, fake_horizon, client, monkeypatch):
+    from decimal import Decimal
+
+    from prometheus_client import REGISTRY
+    from stellar_sdk import Keypair
+
+    from app import jobs
+    from app.database import SessionLocal
+    from app.models import ResellOffer
+
+    def payments():
+        return REGISTRY.get_sample_value("stellar_call_duration_seconds_count",
+                                         {"operation": "usdc_payment", "outcome": "ok"}) or 0
+
+    escrow_contract = stellar.get_escrow()
+    usdc = escrow_contract.usdc_asset
+    fake_horizon.ledger.set_trustline(stellar.stellar.master_account, usdc)
+    seller = Keypair.random()
+    fake_horizon.ledger.create_account(seller.public_key)
+    fake_horizon.ledger.set_trustline(seller.public_key, usdc)
+    db = SessionLocal()
+    offer = ResellOffer(status="accepted", seller_stellar_key=seller.public_key)
+    db.add(offer)
+    db.commit()
+    created = escrow_contract.deposit_to_escrow(offer.id, Decimal("50"), seller.public_key)
+    fake_horizon.ledger.credit(created["escrow_account"], usdc, "50")
+
+    before = payments()
+    jobs.enqueue(db, "escrow.release", {"escrow_id": created["escrow_id"]}, shared=True,
+                 idempotency_key=f"escrow.release:{created['escrow_id']}")
+    db.close()
+    assert jobs.work(SessionLocal, worker_id="test-worker", once=True) == 1
+    assert payments() == before + 1
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "token-de-scrape")
+    response = client.get("/metrics", headers={"Authorization": "Bearer token-de-scrape"})
+    assert 'operation="usdc_payment"' in response.text
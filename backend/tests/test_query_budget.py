@@ -0,0 +1,87 @@
+"""
+Orçamento de consultas SQL por endpoint.
+
+Com um vendedor de muito volume (milhares de transferências), cada endpoint
+listado deve caber num número fixo de consultas (app/query_counter.py). O
+orçamento não depende do volume de dados: um N+1 (lazy load por item)
+estoura na hora e a falha lista as consultas emitidas.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import Favorite, Notification, OwnershipTransfer, Store, User, Watch
+from app.query_counter import assert_max_queries
+
+TRANSFERS = 2000
+
+# (descrição, caminho, papel do usuário, orçamento de consultas)
+BUDGETS = [
+    ("GET /auth/transaction-history (vendedor)", "/auth/transaction-history", "store", 3),
+    ("GET /auth/transaction-history (comprador)", "/auth/transaction-history", "user", 3),
+    ("GET /auth/transaction-history (período)",
+     "/auth/transaction-history?start_date=2024-01-01&end_date=2024-12-31&limit=200", "store", 3),
+    ("GET /auth/transaction-history (página 3)", "/auth/transaction-history?limit=50&offset=100", "store", 3),
+    ("GET /auth/me", "/auth/me", "user", 1),
+    ("GET /watches/marketplace", "/watches/marketplace?limit=200", None, 1),
+    ("GET /watches/my", "/watches/my", "store", 1),
+    ("GET /watches/favorites", "/watches/favorites", "user", 1),
+    ("GET /watches/{id}/history", "/watches/{watch_id}/history", None, 3),
+    ("GET /notifications/", "/notifications/", "user", 1),
+    ("GET /admin/transfers", "/admin/transfers", "admin", 1),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    db = SessionLocal()
+    now = datetime(2025, 6, 1)
+    admin = User(full_name="Admin", email="admin@budget.example.com", password_hash="x", role="admin")
+    seller = User(full_name="Vendedor", email="loja@budget.example.com", password_hash="x", role="store")
+    buyer = User(full_name="Comprador", email="user@budget.example.com", password_hash="x", role="user")
+    db.add_all([admin, seller, buyer])
+    db.flush()
+    store = Store(user_id=seller.id, name="Loja", credentialed=True)
+    db.add(store)
+    db.flush()
+
+    watches = [
+        Watch(serial_number=f"BUDGET-{i:05d}", brand="Rolex" if i % 2 else "Omega", model="Submariner",
+              current_value_brl=1000.0 * i, current_owner_user_id=seller.id if i % 3 else buyer.id,
+              store_id=store.id, status="for_sale", created_at=now - timedelta(days=i))
+        for i in range(TRANSFERS // 10)
+    ]
+    db.add_all(watches)
+    db.flush()
+    db.add_all([
+        OwnershipTransfer(watch_id=watches[i % len(watches)].id, from_user_id=seller.id, to_user_id=buyer.id,
+                          type="sale", price_brl=1000.0, created_at=now - timedelta(hours=6 * i))
+        for i in range(TRANSFERS)
+    ])
+    db.add_all([Notification(user_id=buyer.id, title="t", message="m", type="info") for _ in range(50)])
+    db.add_all([Favorite(user_id=buyer.id, watch_id=w.id) for w in watches[:20]])
+    db.commit()
+
+    seeded = {"users": {u.role: u for u in (admin, seller, buyer)}, "watch_id": watches[1].id}
+    db.close()
+    return seeded
+
+
+@pytest.mark.parametrize("name, path, role, budget", BUDGETS, ids=[b[0] for b in BUDGETS])
+def test_endpoint_stays_within_query_budget(seeded, client, auth_headers, name, path, role, budget):
+    headers = auth_headers(seeded["users"][role]) if role else {}
+    with assert_max_queries(budget, name):
+        response = client.get(path.format(watch_id=seeded["watch_id"]), headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_transaction_history_without_limit_is_complete(seeded, client, auth_headers):
+    headers = auth_headers(seeded["users"]["user"])
+    history = client.get("/auth/transaction-history", headers=headers).json()
+    assert len(history["purchases"]) == TRANSFERS
+    assert not any(history["has_more"].values())
+
+    page = client.get("/auth/transaction-history?limit=50", headers=headers).json()
+    assert len(page["purchases"]) == 50 and page["has_more"]["purchases"]
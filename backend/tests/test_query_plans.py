@@ -0,0 +1,133 @@
+"""
+Planos de execução das consultas dos endpoints mais usados.
+
+Chama cada endpoint, captura as consultas emitidas (rotas síncronas e
+assíncronas) e roda EXPLAIN QUERY PLAN em cada SELECT. Falha se alguma
+fizer full scan em uma das tabelas vigiadas.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import (
+    User, Store, Evaluator, Watch, Evaluation, ResellOffer,
+    OwnershipTransfer, Notification, Favorite
+)
+from app.cache import invalidate_catalog
+from app.database import SessionLocal
+from app.query_counter import count_queries
+
+WATCHED_TABLES = {
+    "watches", "notifications", "resell_offers", "ownership_transfers",
+    "evaluations", "stores", "evaluators", "favorites",
+}
+
+# "SCAN watches" sem índice = full scan; "SEARCH ... USING INDEX" e
+# "SCAN ... USING COVERING INDEX" (varredura ordenada do índice) são aceitos
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+MARKETPLACE_SORTS = (None, "price-low", "price-high", "brand", "newest")
+
+
+@pytest.fixture(scope="module")
+def users():
+    db = SessionLocal()
+    now = datetime.utcnow()
+    admin = User(full_name="Admin", email="admin@plans.example.com", password_hash="x", role="admin")
+    store_user = User(full_name="Loja", email="loja@plans.example.com", password_hash="x", role="store")
+    buyer = User(full_name="Comprador", email="user@plans.example.com", password_hash="x", role="user")
+    evaluator_user = User(full_name="Avaliador", email="aval@plans.example.com", password_hash="x", role="evaluator")
+    db.add_all([admin, store_user, buyer, evaluator_user])
+    db.flush()
+
+    store = Store(user_id=store_user.id, name="Loja", credentialed=True)
+    db.add(store)
+    db.flush()
+    evaluator = Evaluator(user_id=evaluator_user.id, store_id=store.id, name="Avaliador", cpf="000.000.000-00")
+    db.add(evaluator)
+    db.flush()
+
+    for i in range(50):
+        watch = Watch(
+            serial_number=f"PLAN-{i:04d}", brand="Rolex" if i % 2 else "Omega", model="Submariner",
+            description="Relógio de teste", current_value_brl=1000.0 * i if i % 7 else None,
+            current_owner_user_id=store_user.id if i % 3 else buyer.id, store_id=store.id,
+            status="for_sale" if i % 4 else "sold", created_at=now - timedelta(days=i),
+        )
+        db.add(watch)
+        db.flush()
+        db.add(Evaluation(watch_id=watch.id, evaluator_id=evaluator.id, status="completed"))
+        db.add(OwnershipTransfer(watch_id=watch.id, from_user_id=store_user.id, to_user_id=buyer.id,
+                                 type="sale", price_brl=1000.0 * i, created_at=now - timedelta(days=i)))
+        db.add(ResellOffer(watch_id=watch.id, seller_user_id=buyer.id, store_id=store.id,
+                           evaluator_id=evaluator.id, status="pending"))
+        db.add(Notification(user_id=buyer.id, title="t", message="m", type="info", read=bool(i % 2),
+                            created_at=now - timedelta(hours=i)))
+        if i % 5 == 0:
+            db.add(Favorite(user_id=buyer.id, watch_id=watch.id))
+    db.commit()
+
+    seeded = {u.role: u for u in (admin, store_user, buyer, evaluator_user)}
+    db.close()
+    return seeded
+
+
+def _marketplace(sort_by, next_page=False):
+    params = {"limit": 5, **({"sort_by": sort_by} if sort_by else {})}
+
+    def call(client, headers):
+        response = client.get("/watches/marketplace", params=params)
+        if next_page:
+            invalidate_catalog()
+            cursor = response.headers["X-Next-Cursor"]
+            response = client.get("/watches/marketplace", params={**params, "cursor": cursor})
+        return response
+
+    return call
+
+
+ENDPOINTS = [
+    *[(f"GET /watches/marketplace sort_by={sort_by}{' (next page)' if next_page else ''}", None,
+       _marketplace(sort_by, next_page))
+      for sort_by in MARKETPLACE_SORTS for next_page in (False, True)],
+    ("GET /watches/search", None, lambda c, h: c.get("/watches/search", params={"q": "rolex"})),
+    ("GET /watches/{id}", None, lambda c, h: c.get("/watches/1")),
+    ("GET /watches/{id}/history", None, lambda c, h: c.get("/watches/1/history")),
+    ("GET /watches/my", "store", lambda c, h: c.get("/watches/my", headers=h)),
+    ("GET /watches/favorites", "user", lambda c, h: c.get("/watches/favorites", headers=h)),
+    ("GET /notifications/", "user", lambda c, h: c.get("/notifications/", headers=h)),
+    ("GET /notifications/unread", "user", lambda c, h: c.get("/notifications/unread", headers=h)),
+    ("GET /resell/my-offers (user)", "user", lambda c, h: c.get("/resell/my-offers", headers=h)),
+    ("GET /resell/my-offers (store)", "store", lambda c, h: c.get("/resell/my-offers", headers=h)),
+    ("GET /resell/my-offers (evaluator)", "evaluator", lambda c, h: c.get("/resell/my-offers", headers=h)),
+    ("GET /evaluations/watch/{id}", "user", lambda c, h: c.get("/evaluations/watch/1", headers=h)),
+    ("GET /auth/transaction-history", "user", lambda c, h: c.get("/auth/transaction-history", headers=h)),
+    ("GET /admin/transfers", "admin", lambda c, h: c.get("/admin/transfers", headers=h)),
+]
+
+
+def explain(conn, statement, parameters):
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("name,role,call", ENDPOINTS, ids=[name for name, _, _ in ENDPOINTS])
+def test_no_full_scan(database, client, auth_headers, users, name, role, call):
+    headers = auth_headers(users[role]) if role else None
+    invalidate_catalog()  # resposta do cache não chegaria ao banco
+    with count_queries() as counter:
+        response = call(client, headers)
+    assert response.status_code < 400, response.text
+
+    full_scans = []
+    with database.connect() as conn:
+        for statement, parameters in zip(counter.statements, counter.parameters):
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            for detail in explain(conn, statement, parameters):
+                match = FULL_SCAN.match(detail)
+                if match and match.group(1) in WATCHED_TABLES:
+                    full_scans.append(f"{detail}: {' '.join(statement.split())}")
+    assert not full_scans, "\n".join(full_scans)
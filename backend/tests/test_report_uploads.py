@@ -0,0 +1,184 @@
+"""
+Uploads de laudos e evidências para o S3 (moto): deduplicação por hash do
+laudo, do PDF e das fotos (registro em evaluation_reports ou objeto já no
+bucket) e consultas ao banco no pool de upload, nunca no event loop.
+"""
+
+import asyncio
+import hashlib
+import io
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app import report_uploads
+from app.database import SessionLocal
+from app.models import EvaluationReport, Job, User
+from app.report_uploads import ReportUploader
+
+BUCKET = "laudos-teste"
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def uploader(s3):
+    uploader = ReportUploader(s3, BUCKET, max_workers=2)
+    yield uploader
+    uploader.shutdown()
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _keys(s3):
+    return {obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET).get("Contents", [])}
+
+
+def _report(db, photos=(), pdf=None, report_hash=None):
+    stamp = time.time_ns()
+    report = EvaluationReport(report_hash=report_hash or f"laudo-{stamp}", s3_bucket=BUCKET,
+                              s3_key=f"laudos/EXISTENTE/{stamp}.json", condition="excellent",
+                              authenticity="authentic", photos_hashes=list(photos), pdf_hash=pdf)
+    db.add(report)
+    db.commit()
+    return report
+
+
+def test_registered_photo_and_pdf_are_not_uploaded_again(db, s3, uploader):
+    photo, pdf, new_photo = b"foto registrada", b"%PDF registrado", b"foto nova"
+    report = _report(db, photos=["outro", _sha256(photo)], pdf=_sha256(pdf))
+    assert report_uploads.find_existing(db, _sha256(photo)).id == report.id
+
+    skipped = uploader.upload_file(io.BytesIO(photo), "photo", "image/jpeg", db)
+    assert skipped["skipped"] and skipped["sha256"] == _sha256(photo)
+    assert uploader.upload_file(io.BytesIO(pdf), "pdf", "application/pdf", db)["skipped"]
+    assert _keys(s3) == set()
+
+    uploaded = uploader.upload_file(io.BytesIO(new_photo), "photo", "image/jpeg", db)
+    assert not uploaded["skipped"]
+    head = s3.head_object(Bucket=BUCKET, Key=uploaded["key"])
+    assert head["Metadata"]["sha256"] == _sha256(new_photo)
+    assert uploaded["key"] == f"evidencias/photo/{_sha256(new_photo)}.jpg"
+
+
+def test_registered_report_is_not_uploaded_again(db, s3, uploader):
+    data = {"serial": "UP-1", "evaluator_id": 1, "timestamp": "2025-01-01T00:00:00"}
+    report_hash = _sha256(report_uploads.serialize_report(data))
+    report = _report(db, report_hash=report_hash)
+
+    result = uploader.upload_report(data, "UP-1", db)
+    assert result["skipped"] and result["key"] == report.s3_key
+    assert _keys(s3) == set()
+
+    uploaded = uploader.upload_report({**data, "serial": "UP-2"}, "UP-2", db)
+    assert not uploaded["skipped"] and _keys(s3) == {uploaded["key"]}
+
+
+def test_async_uploads_query_the_database_in_the_pool(db, s3, uploader, monkeypatch):
+    photo = b"foto assincrona registrada"
+    _report(db, photos=[_sha256(photo)])
+    lookups = []
+    find_existing = report_uploads.find_existing
+
+    def tracked(session, content_hash):
+        lookups.append((threading.current_thread(), session))
+        return find_existing(session, content_hash)
+
+    monkeypatch.setattr(report_uploads, "find_existing", tracked)
+
+    async def main():
+        return await asyncio.gather(
+            uploader.upload_file_async(io.BytesIO(photo), "photo", "image/png"),
+            uploader.upload_file_async(io.BytesIO(b"%PDF novo"), "pdf", "application/pdf"),
+            uploader.upload_report_async({"serial": "UP-3", "evaluator_id": 1,
+                                          "timestamp": "2025-01-01T00:00:00"}, "UP-3"),
+        )
+
+    photo_result, pdf_result, report_result = asyncio.run(main())
+    assert photo_result["skipped"]
+    assert not pdf_result["skipped"] and not report_result["skipped"]
+    assert _keys(s3) == {pdf_result["key"], report_result["key"]}
+    # Consulta no thread do pool, cada uma com a sua Session
+    assert len(lookups) == 3
+    assert all(thread.name.startswith("s3-upload") for thread, _ in lookups)
+    assert len({id(session) for _, session in lookups}) == 3
+
+
+def test_evidence_and_registration_dedupe_end_to_end(db, stellar, fake_horizon, client, auth_headers, monkeypatch):
+    """Evidências pelo endpoint, registro pelo worker: nada é enviado duas vezes"""
+    from stellar_sdk import Keypair
+
+    from app import jobs
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        s3 = boto3.client("s3")
+        bucket = stellar.stellar.bucket_name
+        s3.create_bucket(Bucket=bucket)
+        keypair = Keypair.random()
+        fake_horizon.ledger.create_account(keypair.public_key)
+        stamp = time.time_ns()
+        store = User(full_name="Loja", email=f"loja-{stamp}@uploads.example.com", password_hash="x", role="store",
+                     stellar_public_key=keypair.public_key, stellar_secret=keypair.secret)
+        evaluator = User(full_name="Avaliador", email=f"avaliador-{stamp}@uploads.example.com",
+                         password_hash="x", role="evaluator")
+        db.add_all([store, evaluator])
+        db.commit()
+
+        def send(content, kind, content_type):
+            response = client.post("/evaluations/evidence", headers=auth_headers(evaluator), data={"kind": kind},
+                                   files={"file": ("evidencia", content, content_type)})
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        photo, pdf = b"foto do relogio " + str(stamp).encode(), b"%PDF laudo " + str(stamp).encode()
+        first_photo, first_pdf = send(photo, "photo", "image/jpeg"), send(pdf, "pdf", "application/pdf")
+        assert not first_photo["skipped"] and not first_pdf["skipped"]
+        # Já no bucket, ainda sem laudo registrado: HEAD evita o reenvio
+        assert send(photo, "photo", "image/jpeg")["skipped"]
+
+        report = {
+            "serial": f"UP-E2E-{stamp}", "brand": "Rolex", "model": "Daytona", "condition": "excellent",
+            "evaluator_id": 1, "timestamp": "2025-01-01T00:00:00", "photos_hashes": [first_photo["sha256"]],
+            "pdf_hash": first_pdf["sha256"], "estimated_value_brl": 90000.0,
+        }
+        response = client.post("/jobs/nft/mint", headers=auth_headers(store),
+                               json={"report": report, "owner_user_id": store.id})
+        assert response.status_code == 202, response.text
+        assert jobs.work(SessionLocal, worker_id="test-worker", once=True) == 1
+        job = db.get(Job, response.json()["id"])
+        assert job.status == "succeeded", job.last_error
+
+        registered = db.query(EvaluationReport).filter(EvaluationReport.pdf_hash == first_pdf["sha256"]).one()
+        assert registered.photos_hashes == [first_photo["sha256"]]
+        assert registered.report_hash == job.result["laudo_hash"]
+        assert s3.head_object(Bucket=bucket, Key=registered.s3_key)
+
+        # Mesmo sem o objeto no bucket, o registro no banco basta para pular o envio
+        s3.delete_object(Bucket=bucket, Key=first_photo["key"])
+        assert send(photo, "photo", "image/jpeg")["skipped"]
+        assert first_photo["key"] not in {obj["Key"] for obj in s3.list_objects_v2(Bucket=bucket)["Contents"]}
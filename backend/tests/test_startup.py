@@ -0,0 +1,36 @@
+"""
+Importar app.main não carrega o que só os contratos Stellar e os uploads
+usam (stellar_sdk, boto3/botocore). Roda em um interpretador novo, como um
+worker recém-criado; benchmarks/startup_time.py mede os tempos em detalhe.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ["stellar_sdk", "boto3", "botocore"]
+
+# Teto folgado: só pega importações pesadas que voltaram para o topo de um módulo
+MAX_IMPORT_SECONDS = 10
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def test_import_does_not_load_lazy_modules(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}"}
+    completed = subprocess.run([sys.executable, "-c", PROBE], cwd=BASE_DIR, env=env,
+                               capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    assert result["seconds"] < MAX_IMPORT_SECONDS
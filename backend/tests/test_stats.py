@@ -0,0 +1,139 @@
+"""
+Rollup marketplace_stats: atualização incremental, fatias e escritas em massa.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app import stats
+from app.database import SessionLocal
+from app.models import Commission, MarketplaceStat, Notification, OwnershipTransfer, User, Watch
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _snapshot(db):
+    return {
+        "totals": stats.read_totals(db),
+        # Buckets zerados (evento que mudou de mês) equivalem a ausentes
+        "months": {key: value for key, value in stats.read_buckets(
+            db, "month", ["transfers.sale", "transfers.mint", "watches.new", "users.new", "commissions"],
+            since="2000-01").items() if any(value)},
+        "brands": stats.top_sales_brands(db, limit=10),
+    }
+
+
+def test_incremental_matches_rebuild(db):
+    seller = User(full_name="Vendedor", email="vendedor@stats.example.com", password_hash="x", role="store",
+                  balance_brl=1000.0)
+    buyer = User(full_name="Comprador", email="comprador@stats.example.com", password_hash="x", role="user")
+    db.add_all([seller, buyer])
+    db.flush()
+    watches = [
+        Watch(serial_number=f"STATS-{i}", brand="Rolex" if i % 2 else "Omega", model="m", status="for_sale",
+              current_owner_user_id=seller.id, created_at=datetime(2025, 1 + i % 3, 10))
+        for i in range(6)
+    ]
+    db.add_all(watches)
+    db.commit()
+
+    for watch in watches[:3]:
+        watch.status = "sold"
+        watch.current_owner_user_id = buyer.id
+        db.add(OwnershipTransfer(watch_id=watch.id, from_user_id=seller.id, to_user_id=buyer.id,
+                                 type="sale", price_brl=500.0, created_at=datetime(2025, 3, 1)))
+    buyer.balance_brl = 250.0
+    db.commit()
+    db.delete(watches[-1])
+    db.commit()
+
+    incremental = _snapshot(db)
+    stats.rebuild(db)
+    assert _snapshot(db) == incremental
+    assert incremental["totals"]["watches.status.sold"][0] == 3
+    assert incremental["totals"]["transfers.sale"] == (3, 1500.0)
+
+
+def test_updates_match_rebuild(db):
+    seller = User(full_name="Vendedor", email="vendedor-edicao@stats.example.com", password_hash="x", role="store")
+    buyer = User(full_name="Comprador", email="comprador-edicao@stats.example.com", password_hash="x", role="user")
+    db.add_all([seller, buyer])
+    db.flush()
+    watches = [
+        Watch(serial_number=f"STATS-EDIT-{i}", brand=brand, model="m", status="sold",
+              current_owner_user_id=buyer.id, created_at=datetime(2025, 2, 1))
+        for i, brand in enumerate(["Cartier", "Cartier", "Breitling"])
+    ]
+    db.add_all(watches)
+    db.flush()
+    sales = [
+        OwnershipTransfer(watch_id=watch.id, from_user_id=seller.id, to_user_id=buyer.id, type="sale",
+                          price_brl=1000.0 * (i + 1), created_at=datetime(2025, 3, 5))
+        for i, watch in enumerate(watches)
+    ]
+    commission = Commission(recipient_user_id=seller.id, transaction_type="sale", amount_brl=30.0,
+                            created_at=datetime(2025, 3, 5))
+    db.add_all(sales + [commission])
+    db.commit()
+
+    # Depois do commit os objetos estão expirados: o valor antigo vem do active_history
+    watches[0].brand = "Panerai"
+    watches[1].created_at = datetime(2024, 12, 1)
+    sales[1].price_brl = 2500.0
+    sales[1].created_at = datetime(2025, 4, 9)
+    sales[2].type = "mint"
+    commission.amount_brl = 45.0
+    commission.created_at = datetime(2025, 4, 9)
+    buyer.created_at = datetime(2024, 11, 1)
+    db.commit()
+
+    # Marca e venda do mesmo relógio alteradas no mesmo flush
+    watches[1].brand = "IWC"
+    sales[0].watch_id = watches[1].id
+    db.add(OwnershipTransfer(watch_id=watches[1].id, from_user_id=buyer.id, to_user_id=seller.id,
+                             type="sale", price_brl=800.0, created_at=datetime(2025, 5, 1)))
+    db.commit()
+
+    incremental = _snapshot(db)
+    stats.rebuild(db)
+    assert _snapshot(db) == incremental
+    brands = dict(incremental["brands"])
+    assert brands["IWC"] == 3 and "Panerai" not in brands and "Cartier" not in brands
+
+
+def test_readers_sum_all_shards(db):
+    before = stats.read_totals(db).get("transfers.sale", (0, 0.0))
+    for shard in (1, 5, 7):
+        delta = stats.StatsDelta()
+        delta.flow("transfers.sale", datetime(2025, 4, 2), 1, 100.0)
+        delta.gauge(f"{stats.SALES_BRAND_PREFIX}Zenith", 1, 100.0)
+        delta.apply(db.connection(), shard)
+    db.commit()
+
+    count, amount = stats.read_totals(db)["transfers.sale"]
+    assert (count - before[0], amount - before[1]) == (3, 300.0)
+    assert stats.read_buckets(db, "day", ["transfers.sale"], since="2025-04-02")[("transfers.sale", "2025-04-02")] == (3, 300.0)
+    assert ("Zenith", 3) in stats.top_sales_brands(db, limit=10)
+    assert db.query(MarketplaceStat).filter(MarketplaceStat.metric == "transfers.sale",
+                                            MarketplaceStat.period == "total").count() >= 3
+
+
+def test_bulk_writes_on_tracked_columns_are_refused(db):
+    with pytest.raises(stats.UntrackedBulkWrite):
+        db.query(Watch).filter(Watch.status == "for_sale").update({"status": "sold"})
+    with pytest.raises(stats.UntrackedBulkWrite):
+        db.execute(update(User).values(balance_brl=0))
+    with pytest.raises(stats.UntrackedBulkWrite):
+        db.query(OwnershipTransfer).delete()
+
+    # Colunas e tabelas fora do rollup continuam liberadas
+    db.query(Watch).filter(Watch.id == -1).update({"description": "x"})
+    db.query(Notification).filter(Notification.read == False).update({"read": True})
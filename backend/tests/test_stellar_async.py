@@ -0,0 +1,152 @@
+"""
+Caminhos assíncronos dos contratos Stellar (sessão aiohttp) e o worker de
+jobs executando mint, transferência e escrow contra o Horizon falso.
+"""
+
+import asyncio
+import hashlib
+from decimal import Decimal
+
+import boto3
+import pytest
+from moto import mock_aws
+from stellar_sdk import Asset, Keypair
+
+from app import jobs
+from app.database import SessionLocal
+from app.models import Escrow, Job, NFTToken, OwnershipTransfer, ResellOffer, User, Watch
+
+
+def run(stellar, coro):
+    """Executa a corrotina e fecha a sessão aiohttp no mesmo event loop"""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await stellar.stellar.close_async()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def s3(stellar, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=stellar.stellar.bucket_name)
+        yield client
+
+
+def _user(db, fake_horizon, email, role="user"):
+    keypair = Keypair.random()
+    fake_horizon.ledger.create_account(keypair.public_key)
+    user = User(full_name=email, email=email, password_hash="x", role=role,
+                stellar_public_key=keypair.public_key, stellar_secret=keypair.secret)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _report(serial):
+    return {
+        "serial": serial, "brand": "Rolex", "model": "Submariner", "condition": "excellent",
+        "evaluator_id": 1, "timestamp": "2025-01-01T00:00:00", "photos_hashes": [],
+        "pdf_hash": hashlib.sha256(serial.encode()).hexdigest(), "estimated_value_brl": 50000.0,
+    }
+
+
+def _work():
+    return jobs.work(SessionLocal, worker_id="test-worker", once=True)
+
+
+def test_async_mint_and_transfer(stellar, fake_horizon):
+    owner, buyer = Keypair.random(), Keypair.random()
+    fake_horizon.ledger.create_account(owner.public_key)
+    fake_horizon.ledger.create_account(buyer.public_key)
+    report_hash = hashlib.sha256(b"ASYNC-1").hexdigest()
+
+    asset_code, issuer, mint_tx = run(stellar, stellar.get_watch_registration().mint_watch_nft_async(
+        "ASYNC-1", owner.public_key, report_hash, owner_secret=owner.secret
+    ))
+    nft_asset = Asset(asset_code, issuer)
+    assert fake_horizon.ledger.balance(owner.public_key, nft_asset) == 1
+    assert mint_tx in fake_horizon.ledger.transactions
+
+    fake_horizon.ledger.set_trustline(buyer.public_key, nft_asset)
+    transfer_tx = run(stellar, stellar.get_nft().execute_nft_transfer_async(
+        owner.public_key, owner.secret, buyer.public_key, nft_asset, "ASYNC-1"
+    ))
+    assert fake_horizon.ledger.balance(buyer.public_key, nft_asset) == 1
+    assert fake_horizon.ledger.balance(owner.public_key, nft_asset) == 0
+    assert transfer_tx in fake_horizon.ledger.transactions
+
+
+def test_worker_mints_and_transfers(stellar, fake_horizon, s3, client, auth_headers):
+    db = SessionLocal()
+    store = _user(db, fake_horizon, "loja@async.example.com", role="store")
+    buyer = _user(db, fake_horizon, "comprador@async.example.com")
+
+    response = client.post("/jobs/nft/mint", headers=auth_headers(store),
+                           json={"report": _report("ASYNC-2"), "owner_user_id": store.id})
+    assert response.status_code == 202, response.text
+    mint_job_id = response.json()["id"]
+    assert _work() == 1
+
+    job = client.get(f"/jobs/{mint_job_id}", headers=auth_headers(store)).json()
+    assert job["status"] == "succeeded", job["last_error"]
+    watch = db.query(Watch).filter(Watch.serial_number == "ASYNC-2").one()
+    token = db.query(NFTToken).filter(NFTToken.watch_id == watch.id).one()
+    assert token.mint_transaction_hash == job["result"]["mint_tx"]
+    nft_asset = Asset(token.asset_code, token.issuer_account)
+    assert fake_horizon.ledger.balance(store.stellar_public_key, nft_asset) == 1
+
+    fake_horizon.ledger.set_trustline(buyer.stellar_public_key, nft_asset)
+    response = client.post("/jobs/nft/transfer", headers=auth_headers(store),
+                           json={"watch_id": watch.id, "from_user_id": store.id, "to_user_id": buyer.id})
+    assert response.status_code == 202, response.text
+    assert _work() == 1
+
+    job = db.get(Job, response.json()["id"])
+    assert job.status == "succeeded", job.last_error
+    assert fake_horizon.ledger.balance(buyer.stellar_public_key, nft_asset) == 1
+    transfer = db.query(OwnershipTransfer).filter(OwnershipTransfer.watch_id == watch.id).one()
+    assert transfer.stellar_tx_hash == job.result["transaction_hash"]
+    db.close()
+
+
+def test_worker_creates_and_releases_escrow(stellar, fake_horizon, client, auth_headers):
+    db = SessionLocal()
+    usdc = stellar.get_escrow().usdc_asset
+    fake_horizon.ledger.set_trustline(stellar.stellar.master_account, usdc)
+    seller, buyer = Keypair.random(), _user(db, fake_horizon, "escrow@async.example.com")
+    fake_horizon.ledger.create_account(seller.public_key)
+    fake_horizon.ledger.set_trustline(seller.public_key, usdc)
+    admin = User(full_name="Admin", email="admin@async.example.com", password_hash="x", role="admin")
+    offer = ResellOffer(status="accepted", seller_stellar_key=seller.public_key)
+    db.add_all([admin, offer])
+    db.commit()
+
+    response = client.post("/jobs/escrow", headers=auth_headers(buyer),
+                           json={"offer_id": offer.id, "amount_usdc": "1000",
+                                 "depositor_stellar_key": buyer.stellar_public_key})
+    assert response.status_code == 202, response.text
+    assert _work() == 1
+    created = db.get(Job, response.json()["id"])
+    assert created.status == "succeeded", created.last_error
+    escrow_account = created.result["escrow_account"]
+    assert fake_horizon.ledger.balance(escrow_account, usdc) == 0  # trustline criada
+
+    # Depósito do comprador em USDC (vem da carteira dele, fora do contrato)
+    fake_horizon.ledger.credit(escrow_account, usdc, "1000")
+    escrow_id = created.result["escrow_id"]
+    response = client.post(f"/jobs/escrow/{escrow_id}/release", headers=auth_headers(admin))
+    assert response.status_code == 202, response.text
+    assert _work() == 1
+
+    released = db.get(Job, response.json()["id"])
+    assert released.status == "succeeded", released.last_error
+    assert fake_horizon.ledger.balance(seller.public_key, usdc) == Decimal("920")
+    assert fake_horizon.ledger.balance(stellar.stellar.master_account, usdc) == Decimal("80")
+    assert db.get(Escrow, escrow_id).status == "released"
+    db.close()
@@ -0,0 +1,83 @@
+"""
+Contas de canal e sequências locais nos fluxos de negócio (mint, escrow),
+contra o Horizon falso.
+"""
+
+from decimal import Decimal
+
+import pytest
+from stellar_sdk import Asset, Keypair
+from stellar_sdk.exceptions import BadRequestError
+
+from app import stellar_contracts
+from app.stellar_contracts import TransactionBatch
+
+
+@pytest.fixture
+def channels(fake_horizon):
+    keypairs = [Keypair.random() for _ in range(3)]
+    for keypair in keypairs:
+        fake_horizon.ledger.create_account(keypair.public_key)
+    return keypairs
+
+
+@pytest.fixture
+def contracts(fake_horizon, channels, monkeypatch):
+    master = Keypair.random()
+    fake_horizon.ledger.create_account(master.public_key)
+    monkeypatch.setenv("STELLAR_MASTER_SECRET", master.secret)
+    monkeypatch.setenv("STELLAR_CHANNEL_SECRETS", ",".join(k.secret for k in channels))
+    return stellar_contracts.StellarContractsManager(
+        stellar_contracts.StellarContracts(fake_horizon.url, fake_horizon.friendbot_url)
+    )
+
+
+def _source(fake_horizon, tx_hash):
+    return fake_horizon.ledger.transactions[tx_hash]["source_account"]
+
+
+def test_business_flows_go_out_through_channels(contracts, channels, fake_horizon):
+    channel_keys = {k.public_key for k in channels}
+    owner = Keypair.random()
+    fake_horizon.ledger.create_account(owner.public_key)
+
+    asset_code, issuer, mint_tx = contracts.get_watch_registration().mint_watch_nft(
+        "CHAN-1", owner.public_key, "", owner.secret
+    )
+    assert _source(fake_horizon, mint_tx) in channel_keys
+    assert fake_horizon.ledger.balance(owner.public_key, Asset(asset_code, issuer)) == 1
+    # A sequência da emissora nunca foi carregada: quem fornece é o canal
+    assert issuer not in contracts.stellar.sequences._sequences
+
+    escrow = contracts.get_escrow()
+    escrow_account, escrow_secret = escrow.create_escrow_account()
+    fake_horizon.ledger.credit(escrow_account, escrow.usdc_asset, "10")
+    payee = Keypair.random()
+    fake_horizon.ledger.create_account(payee.public_key)
+    fake_horizon.ledger.set_trustline(payee.public_key, escrow.usdc_asset)
+    batch = TransactionBatch(contracts.stellar, Keypair.from_secret(escrow_secret), memo="CHAN")
+    tx_hash = batch.payment(payee.public_key, escrow.usdc_asset, "10").submit()["hash"]
+    assert _source(fake_horizon, tx_hash) in channel_keys
+    assert fake_horizon.ledger.balance(payee.public_key, escrow.usdc_asset) == Decimal("10")
+
+
+def test_only_bad_sequence_invalidates_the_local_sequence(contracts, fake_horizon):
+    payer = Keypair.random()
+    fake_horizon.ledger.create_account(payer.public_key)
+    usdc = contracts.get_escrow().usdc_asset
+    batch = TransactionBatch(contracts.stellar, payer, use_channels=False)
+    sequences = contracts.stellar.sequences
+
+    # Falha na operação (sem trustline): a sequência foi consumida e o cache continua válido
+    with pytest.raises(BadRequestError):
+        batch.payment(Keypair.random().public_key, usdc, "1").submit()
+    assert payer.public_key in sequences._sequences
+
+    # Alguém usou a conta fora do gerenciador: tx_bad_seq invalida, recarrega e reenvia
+    fake_horizon.ledger.accounts[payer.public_key]["sequence"] += 5
+    receiver = Keypair.random()
+    fake_horizon.ledger.create_account(receiver.public_key)
+    tx_hash = TransactionBatch(contracts.stellar, payer, use_channels=False).payment(
+        receiver.public_key, Asset.native(), "1"
+    ).submit()["hash"]
+    assert tx_hash in fake_horizon.ledger.transactions
@@ -0,0 +1,76 @@
+"""
+Ingestão do Horizon: só donos, escrows em aberto e master são acompanhados,
+as duas rotas de verificação leem o mesmo espelho local e
+uma conta que falha na leitura fica para o próximo ciclo.
+"""
+
+import time
+
+import pytest
+from stellar_sdk import Asset, Keypair
+
+from app import stellar_ingest
+from app.database import SessionLocal
+from app.models import IngestionCursor, NFTToken, User, Watch
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def test_ingest_follows_owners_and_verification_uses_the_mirror(db, stellar, fake_horizon, client, auth_headers):
+    owner, buyer = Keypair.random(), Keypair.random()
+    for keypair in (owner, buyer):
+        fake_horizon.ledger.create_account(keypair.public_key)
+    stamp = time.time_ns()
+    user = User(full_name="Dono", email=f"dono-{stamp}@ingest.example.com", password_hash="x", role="user",
+                stellar_public_key=buyer.public_key)
+    db.add(user)
+    db.flush()
+
+    asset_code, issuer, mint_tx = stellar.get_watch_registration().mint_watch_nft(
+        f"ING-{stamp}", owner.public_key, "", owner.secret
+    )
+    watch = Watch(serial_number=f"ING-{stamp}", brand="Omega", model="Seamaster", current_owner_user_id=user.id)
+    db.add(watch)
+    db.flush()
+    db.add(NFTToken(watch_id=watch.id, token_id=f"{asset_code}:{issuer}", asset_code=asset_code,
+                    issuer_account=issuer, current_owner_stellar_key=owner.public_key,
+                    metadata_hash="", mint_transaction_hash=mint_tx))
+    db.commit()
+
+    accounts = stellar_ingest.tracked_accounts(db, stellar.stellar.master_account)
+    assert owner.public_key in accounts and issuer not in accounts
+
+    # Transferência feita direto pela carteira, fora da plataforma
+    nft_asset = Asset(asset_code, issuer)
+    fake_horizon.ledger.set_trustline(buyer.public_key, nft_asset)
+    stellar.get_nft()._execute_nft_transfer(owner.public_key, owner.secret, buyer.public_key, nft_asset, "WALLET")
+    stellar_ingest.run(SessionLocal, server=stellar.stellar.server,
+                       master_account=stellar.stellar.master_account, once=True)
+    db.expire_all()
+    assert buyer.public_key in stellar_ingest.tracked_accounts(db)
+
+    single = client.get(f"/stellar/nft/{watch.id}/verify", headers=auth_headers(user)).json()
+    bulk = client.post("/stellar/nft/verify", headers=auth_headers(user),
+                       json={"watch_ids": [watch.id, -1]}).json()["results"]
+    assert single["nft_valid"] and single["current_owner_stellar_key"] == buyer.public_key
+    assert bulk[0] == single
+    assert bulk[1]["watch_id"] == -1 and not bulk[1]["nft_valid"]
+
+
+def test_failed_read_is_logged_and_cursor_kept(db, monkeypatch, caplog):
+    account = Keypair.random().public_key
+
+    def unavailable(server, account_id, cursor):
+        raise ConnectionError("Horizon fora do ar")
+
+    monkeypatch.setattr(stellar_ingest, "fetch_operations", unavailable)
+    with caplog.at_level("WARNING", logger="app.stellar_ingest"):
+        assert stellar_ingest.ingest_once(db, server=None, accounts=[account]) == 0
+    assert f"falha ao ler {account}: Horizon fora do ar" in caplog.text
+    assert db.query(IngestionCursor).filter(IngestionCursor.account_id == account).first() is None
@@ -35,43 +35,50 @@ export default function MarketplacePage() {
   const [watches, setWatches] = useState<Watch[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
+  // Cursor da próxima página (X-Next-Cursor); null quando não há mais
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
-  // Fetch watches from our FastAPI backend or use mock data
+  const apiFilters = useMemo(() => ({
+    brand: filters.selectedBrands.length > 0 ? filters.selectedBrands.join(',') : undefined,
+    category: filters.selectedCategories.length > 0 ? filters.selectedCategories.join(',') : undefined,
+    condition: filters.selectedConditions.length > 0 ? filters.selectedConditions.join(',') : undefined,
+    price_min: filters.priceRange[0] > 0 ? filters.priceRange[0] : undefined,
+    price_max: filters.priceRange[1] < 100000 ? filters.priceRange[1] : undefined,
+    search: filters.search || undefined,
+    sort_by: sortBy !== "newest" ? sortBy : undefined // Only send if not default
+  }), [filters, sortBy])
+
+  // Filter out any error objects that might be in the response
+  const validWatchesOf = (data: any[]) => data.filter((watch: any, index: number) => {
+    const isValid = watch && 
+      typeof watch === 'object' && 
+      !(watch.type && watch.loc && watch.msg) && // Not an error object
+      (watch.id || watch.brand || watch.model || watch.name)
+    
+    if (!isValid) {
+      console.error(`Invalid watch at index ${index}:`, watch)
+    }
+    return isValid
+  })
+
+  // Fetch the first page from our FastAPI backend or use mock data
   useEffect(() => {
     const loadWatches = async () => {
       try {
         setLoading(true)
         setError(null)
+        setNextCursor(null)
 
-        const apiFilters = {
-          brand: filters.selectedBrands.length > 0 ? filters.selectedBrands.join(',') : undefined,
-          category: filters.selectedCategories.length > 0 ? filters.selectedCategories.join(',') : undefined,
-          condition: filters.selectedConditions.length > 0 ? filters.selectedConditions.join(',') : undefined,
-          price_min: filters.priceRange[0] > 0 ? filters.priceRange[0] : undefined,
-          price_max: filters.priceRange[1] < 100000 ? filters.priceRange[1] : undefined,
-          search: filters.search || undefined,
-          sort_by: sortBy !== "newest" ? sortBy : undefined // Only send if not default
-        }
-
-        const response = await getApiClient().getWatches(apiFilters)
+        const response = await getApiClient().getWatchesPage(apiFilters)
         console.log('Raw API response:', response)
         
         if (response.data && Array.isArray(response.data)) {
           console.log('Processing', response.data.length, 'items from API')
-          // Filter out any error objects that might be in the response
-          const validWatches = response.data.filter((watch: any, index: number) => {
-            const isValid = watch && 
-              typeof watch === 'object' && 
-              !(watch.type && watch.loc && watch.msg) && // Not an error object
-              (watch.id || watch.brand || watch.model || watch.name)
-            
-            if (!isValid) {
-              console.error(`Invalid watch at index ${index}:`, watch)
-            }
-            return isValid
-          })
+          const validWatches = validWatchesOf(response.data)
           console.log('Valid watches after filtering:', validWatches.length)
           setWatches(validWatches)
+          setNextCursor(response.nextCursor ?? null)
         } else {
           console.log('No valid data from API, using mock data')
           // Fallback to mock data if API fails or returns no data
@@ -103,7 +110,27 @@ export default function MarketplacePage() {
     }
 
     loadWatches()
-  }, [filters, sortBy])
+  }, [apiFilters])
+
+  // Próxima página sob demanda ("Load more"), com os mesmos filtros
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    try {
+      const response = await getApiClient().getWatchesPage(apiFilters, nextCursor)
+      if (response.data && Array.isArray(response.data)) {
+        const page = validWatchesOf(response.data)
+        setWatches(prev => [...prev, ...page])
+        setNextCursor(response.nextCursor ?? null)
+      } else if (response.error) {
+        console.error('API Error:', response.error)
+      }
+    } catch (err) {
+      console.error('Exception loading more watches:', err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   // Process and filter watches - client-side filtering is now removed as filters are sent to backend
   const filteredAndSortedWatches = useMemo(() => {
@@ -220,7 +247,7 @@ export default function MarketplacePage() {
                     Loading...
                   </div>
                 ) : (
-                  `${filteredAndSortedWatches.length} watches found`
+                  `${filteredAndSortedWatches.length}${nextCursor ? '+' : ''} watches found`
                 )}
               </div>
             </div>
@@ -319,6 +346,21 @@ export default function MarketplacePage() {
                     .filter(Boolean)} {/* Remove null values */}
                 </div>
               )}
+
+              {!loading && nextCursor && (
+                <div className="flex justify-center mt-8">
+                  <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                    {loadingMore ? (
+                      <>
+                        <Loader2 className="h-4 w-4 mr-2 animate-spin" />
+                        Loading...
+                      </>
+                    ) : (
+                      'Load more'
+                    )}
+                  </Button>
+                </div>
+              )}
             </div>
           </div>
         </div>
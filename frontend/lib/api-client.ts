@@ -7,8 +7,12 @@ interface ApiResponse<T = any> {
   data?: T
   error?: string
   detail?: string
+  nextCursor?: string | null
 }
 
+// Tamanho de página pedido ao marketplace (máximo aceito pelo backend)
+const MARKETPLACE_PAGE_SIZE = 200
+
 class ApiClient {
   private baseURL: string
   private token: string | null = null
@@ -77,7 +81,8 @@ class ApiClient {
         }
       }
 
-      return { data }
+      // Listagens paginadas devolvem o cursor da próxima página neste header
+      return { data, nextCursor: response.headers.get('X-Next-Cursor') }
     } catch (error) {
       return {
         error: error instanceof Error ? error.message : 'Erro de conexão',
@@ -141,7 +146,8 @@ class ApiClient {
   }
 
   // Watches endpoints
-  async getWatches(params?: any) {
+  // Uma página do marketplace; passe `nextCursor` da resposta para pedir a seguinte
+  async getWatchesPage(params?: any, cursor?: string | null) {
     const queryParams = new URLSearchParams()
     if (params) {
       // Map frontend filter params to backend expected params
@@ -158,9 +164,31 @@ class ApiClient {
         }
       });
     }
-    
-    const query = queryParams.toString()
-    return this.request<Watch[]>(`/watches/marketplace${query ? `?${query}` : ''}`)
+    if (!queryParams.has('limit')) {
+      queryParams.set('limit', String(MARKETPLACE_PAGE_SIZE))
+    }
+    if (cursor) {
+      queryParams.set('cursor', cursor)
+    }
+
+    return this.request<Watch[]>(`/watches/marketplace?${queryParams.toString()}`)
+  }
+
+  // Marketplace inteiro: segue o cursor (X-Next-Cursor) até a última página.
+  // Só para diagnóstico (test-api); telas paginam com getWatchesPage
+  async getWatches(params?: any) {
+    const watches: Watch[] = []
+    let cursor: string | null | undefined = null
+    do {
+      const page: ApiResponse<Watch[]> = await this.getWatchesPage(params, cursor)
+      if (page.error) {
+        return page
+      }
+      watches.push(...(page.data || []))
+      cursor = page.nextCursor
+    } while (cursor)
+
+    return { data: watches }
   }
 
   async getWatch(id: string) {